@@ -0,0 +1,24 @@
+"""ETags for conditional GETs: a matching If-None-Match gets an empty 304."""
+from fastapi import Request, Response
+import hashlib
+from typing import Any
+
+def make_etag(kind: str, version: int, *params: Any) -> str:
+    """Weak ETag for `kind` at `version`; query parameters are folded into a short hash."""
+    tag = f"{kind}-{version}"
+    if params:
+        tag += "-" + hashlib.sha1(repr(params).encode()).hexdigest()[:16]
+    return f'W/"{tag}"'
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored on both sides
+    candidates = {candidate.strip().removeprefix("W/") for candidate in header.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
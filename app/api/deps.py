@@ -1,11 +1,48 @@
-from core.db.session import SessionLocal
-from typing import Generator, Optional
+from core.config import READ_YOUR_WRITES_SECONDS
+from core.db.idempotency import IdempotentRequest
+from core.db.routing import read_router
+from core.db.session import AsyncSessionLocal
+from fastapi import Header, Request
+import hashlib
+from sqlalchemy.ext.asyncio import AsyncSession
+import time
+from typing import AsyncGenerator, Optional
 
-def get_db() -> Generator:
-    db: Optional[SessionLocal] = None
+# set on responses to successful writes; holds the epoch until which the client reads from the primary
+READ_YOUR_WRITES_COOKIE = "read_primary_until"
+
+def wants_primary(request: Request) -> bool:
     try:
-        db = SessionLocal()
+        until = float(request.cookies.get(READ_YOUR_WRITES_COOKIE, "0"))
+    except ValueError:
+        return False
+    return until > time.time()
+
+def read_your_writes_cookie() -> str:
+    return str(int(time.time()) + READ_YOUR_WRITES_SECONDS)
+
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        if db:
-            db.close()
+
+async def get_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    async with read_router.read_session(prefer_primary=wants_primary(request)) as db:
+        yield db
+
+async def get_idempotent_request(
+    request: Request,
+    idempotency_key: Optional[str] = Header(
+        None,
+        alias="Idempotency-Key",
+        min_length=1,
+        max_length=255,
+        description="Client-chosen unique key; a retry with the same key gets the first successful response replayed",
+    ),
+) -> Optional[IdempotentRequest]:
+    if idempotency_key is None:
+        return None
+    fingerprint = hashlib.sha256()
+    for part in (request.method.encode(), request.url.path.encode(), await request.body()):
+        fingerprint.update(part)
+        fingerprint.update(b"\0")
+    return IdempotentRequest(idempotency_key, fingerprint.hexdigest())
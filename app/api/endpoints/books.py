@@ -1,14 +1,26 @@
+from core import metrics
+from core.changes import change_feed
+from core.db.idempotency import IdempotentRequest
 from core.db.services import book_service
-from api.deps import get_db
+from core.db.routing import read_router
+from api.conditional import is_not_modified, make_etag, not_modified
+from api.deps import get_db, get_idempotent_request, get_read_db, wants_primary
+from api.responses import ORJSONResponse
+from api.streaming import iter_json_array, iter_ndjson
 from schemas.books import (
-    BookCreateResponse200, BookCreateResponse409, BookCreatePayload, BookDetailResponse200,
-    BookItem, BookDeleteResponse200, BooksListResponse200, BookNotFound404, BookUpdatePayload,
-    BookReturnResponse, BookReturnResponse409, BorrowCreateResponse200, BorrowCreateResponse409)
-from fastapi import APIRouter, Depends, Path, Query
-from sqlalchemy.orm import Session
+    BookBulkResponse200, BookBulkResponse400, BookCreateResponse200, BookCreateResponse409, BookCreatePayload, BookDetailResponse200,
+    BookBorrowingsResponse200, BookItem, BookDeleteResponse200, BooksListResponse200, BookNotFound404, BookUpdatePayload,
+    BookReturnResponse, BookReturnResponse409, BookSearchResponse200, BorrowCreateResponse200,
+    BorrowCreateResponse409)
+from fastapi import APIRouter, Depends, Header, Path, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
 
 router = APIRouter(prefix="/books", tags=["Books"])
 
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
 @router.post(
         '/',
         description="Create a new book (6-digit string ID allowed, including leading zeros).",
@@ -23,9 +35,54 @@ router = APIRouter(prefix="/books", tags=["Books"])
 )
 async def add_book(
     payload: BookCreatePayload,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    idempotency: Optional[IdempotentRequest] = Depends(get_idempotent_request),
 ):
-    return book_service.add_book(payload, db)
+    return await book_service.add_book(payload, db, idempotency)
+
+@router.post(
+    '/bulk',
+    description=(
+        "Create many books at once. Send a JSON array or newline-delimited JSON "
+        "(`Content-Type: application/x-ndjson`) of book records; the body is read as a stream "
+        "and inserted in batches of 1000, each committed on its own. The response counts the created, "
+        "duplicate and invalid records and lists the rejected ones. A body that turns out malformed "
+        "gets a 400 with the number of books committed before that point."
+    ),
+    response_description="Outcome counts and rejected records",
+    response_model=BookBulkResponse200,
+    responses={
+        400: {"description": "Body is not a JSON array", "model": BookBulkResponse400},
+    },
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": {"type": "array", "items": {"$ref": "#/components/schemas/BookCreatePayload"}}
+                },
+                "application/x-ndjson": {"schema": {"type": "string"}},
+            },
+        }
+    },
+)
+async def add_books_bulk(
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        records = iter_ndjson(request.stream())
+    else:
+        records = iter_json_array(request.stream())
+    try:
+        return await book_service.add_books_bulk(records, db)
+    except book_service.BulkBodyError as e:
+        metrics.record_api_error(400)
+        return ORJSONResponse(
+            status_code=400,
+            content=BookBulkResponse400(code=400, error=e.error, created=e.created).model_dump(),
+        )
 
 @router.post(
     '/{book_id}/borrow/{card_id}',
@@ -40,9 +97,10 @@ async def add_book(
 async def borrow_book(
     book_id: str = Path(..., pattern=r"^\d{6}$", description="6-digit book id", example="000001"),
     card_id: str = Path(..., pattern=r"^\d{6}$", description="6-digit card id", example="245781"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    idempotency: Optional[IdempotentRequest] = Depends(get_idempotent_request),
 ):
-    return book_service.borrow_book(book_id=book_id, card_id=card_id, db=db)
+    return await book_service.borrow_book(book_id=book_id, card_id=card_id, db=db, idempotency=idempotency)
 
 @router.delete(
     '/{book_id}',
@@ -55,22 +113,137 @@ async def borrow_book(
 )
 async def delete_book(
     book_id: str = Path(..., pattern=r"^\d{6}$", description="6-digit book id", example="000001"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    return book_service.delete_book(book_id=book_id, db=db)
+    return await book_service.delete_book(book_id=book_id, db=db)
 
 @router.get(
     '/',
-    description="List all books (non-deleted) with pagination. Max 1000 items per request.",
+    description=(
+        "List all books (non-deleted) with pagination. Max 1000 items per request. "
+        "Pass `after` (the `next_cursor` of the previous page) for keyset pagination, "
+        "which stays fast on deep pages; `page` is ignored then. "
+        "`count=estimated` takes the total from planner statistics and `count=none` skips it. "
+        "Send the `ETag` back in `If-None-Match` to get a 304 while the catalogue is unchanged. "
+        "`fields` (e.g. `id,borrowed`) limits every item to the listed fields; `id` is always included."
+    ),
     response_description="Paginated list of books",
-    response_model=BooksListResponse200
+    response_model=BooksListResponse200,
+    responses={304: {"description": "Not modified"}},
 )
 async def get_books(
+    request: Request,
     page: int = Query(1, ge=1, description="Page number (starts from 1)"),
     size: int = Query(50, ge=1, le=1000, description="Page size (max 1000)"),
-    db: Session = Depends(get_db)
+    after: Optional[str] = Query(None, pattern=r"^\d{6}$", description="Return books with id greater than this cursor"),
+    count: book_service.TotalMode = Query("exact", description="How to compute `total`: exact, estimated or none"),
+    fields: Optional[str] = Query(
+        None,
+        description="Comma-separated item fields to return: id, title, author, created_at, borrowed, borrowCardId",
+        example="id,borrowed",
+    ),
+    db: AsyncSession = Depends(get_read_db)
+):
+    selected = book_service.list_fields(fields)
+    etag = make_etag("books", await book_service.catalogue_version(db), page, size, after, count, selected)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    # already shaped like BooksListResponse200; skip response_model validation and encode directly
+    return ORJSONResponse(
+        await book_service.list_books(db=db, page=page, size=size, after=after, total_mode=count, fields=selected),
+        headers={"ETag": etag},
+    )
+
+@router.get(
+    '/export',
+    description=(
+        "Stream the whole catalogue (non-deleted books with their current borrow card) "
+        "as NDJSON or CSV. Rows are sent while they are read, so the response can be "
+        "consumed incrementally."
+    ),
+    response_description="One line per book",
+    response_class=StreamingResponse,
+    responses={
+        200: {"content": {"application/x-ndjson": {}, "text/csv": {}}},
+        304: {"description": "Not modified"},
+    },
+)
+async def export_books(
+    request: Request,
+    format: book_service.ExportFormat = Query("ndjson", description="Output format: ndjson or csv"),
+):
+    # the session lives as long as the stream, independent of the request dependencies;
+    # closing it only returns the connection, the stream reads from the same database
+    db = await read_router.open_session(prefer_primary=wants_primary(request))
+    try:
+        etag = make_etag("export", await book_service.catalogue_version(db), format)
+    finally:
+        await db.close()
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    async def body():
+        async with db:
+            async for chunk in book_service.export_books(db=db, fmt=format):
+                yield chunk
+
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="books.{format}"', "ETag": etag},
+    )
+
+@router.get(
+    '/changes',
+    description=(
+        "Server-Sent Events stream of book changes (add, update, borrow, return, delete). "
+        "Each `change` event carries the book id, its new version (also the event id) and the borrowed flag. "
+        "Reconnect with `Last-Event-ID` to receive the events missed meanwhile; a `reset` event means "
+        "they are no longer available and the client should reload the books it shows."
+    ),
+    response_description="Event stream",
+    response_class=StreamingResponse,
+    responses={
+        200: {"content": {"text/event-stream": {}}},
+        503: {"description": "Change feed unavailable or too many subscribers"},
+    },
+)
+async def book_changes(
+    last_event_id: Optional[int] = Header(
+        None, alias="Last-Event-ID", description="Id of the last event received before reconnecting"
+    ),
+):
+    return StreamingResponse(
+        await change_feed.open_stream(last_event_id),
+        media_type="text/event-stream",
+        # keep proxies from buffering or caching the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get(
+    '/search',
+    description=(
+        "Full-text search over title and author (case-insensitive, word-prefix matching). "
+        "Non-deleted books only, best match first. Pass `cursor` (the `next_cursor` of the "
+        "previous page) to continue."
+    ),
+    response_description="Matching books",
+    response_model=BookSearchResponse200,
+    responses={304: {"description": "Not modified"}},
+)
+async def search_books(
+    request: Request,
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200, description="Words to look for", example="sienkiewicz"),
+    size: int = Query(20, ge=1, le=100, description="Page size (max 100)"),
+    cursor: Optional[str] = Query(None, max_length=200, description="Cursor returned by the previous page"),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    return book_service.list_books(db=db, page=page, size=size)
+    etag = make_etag("search", await book_service.catalogue_version(db), q, size, cursor)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    return await book_service.search_books(db=db, q=q, size=size, cursor=cursor)
 
 @router.get(
     '/{book_id}',
@@ -78,14 +251,54 @@ async def get_books(
     response_description = 'Book details',
     response_model = BookDetailResponse200,
     responses = {
+        304: {"description": "Not modified"},
         404: {"description": "Book not found", "model": BookNotFound404},
     }
 )
 async def get_book(
+    request: Request,
+    response: Response,
+    book_id: str = Path(..., pattern=r"^\d{6}$", description="6-digit book id", example="000001"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    if request.headers.get("if-none-match"):
+        # revalidation needs only the version (from the cache or a primary key lookup)
+        version = await book_service.get_book_version(book_id=book_id, db=db)
+        if version is not None and is_not_modified(request, make_etag("book", version)):
+            return not_modified(make_etag("book", version))
+    book, version = await book_service.get_book_by_id(book_id=book_id, db=db)
+    response.headers["ETag"] = make_etag("book", version)
+    return book
+
+@router.get(
+    '/{book_id}/borrowings',
+    description=(
+        "Borrowing history of a book, newest first. Pass `cursor` (the `next_cursor` "
+        "of the previous page) to continue."
+    ),
+    response_description="Borrowings of the book",
+    response_model=BookBorrowingsResponse200,
+    responses={
+        304: {"description": "Not modified"},
+        404: {"description": "Book not found", "model": BookNotFound404},
+    }
+)
+async def get_book_borrowings(
+    request: Request,
+    response: Response,
     book_id: str = Path(..., pattern=r"^\d{6}$", description="6-digit book id", example="000001"),
-    db: Session = Depends(get_db)
+    size: int = Query(20, ge=1, le=100, description="Page size (max 100)"),
+    cursor: Optional[str] = Query(None, max_length=200, description="Cursor returned by the previous page"),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    return book_service.get_book_by_id(book_id=book_id, db=db)
+    # borrow and return bump the book's version, so it also versions the history
+    version = await book_service.get_book_version(book_id=book_id, db=db)
+    if version is not None:
+        etag = make_etag("borrowings", version, book_id, size, cursor)
+        if is_not_modified(request, etag):
+            return not_modified(etag)
+        response.headers["ETag"] = etag
+    return await book_service.get_book_borrowings(db=db, book_id=book_id, size=size, cursor=cursor)
 
 @router.post(
     '/{book_id}/return/{card_id}',
@@ -100,9 +313,10 @@ async def get_book(
 async def return_book(
     book_id: str = Path(..., pattern=r"^\d{6}$", description="6-digit book id", example="000001"),
     card_id: str = Path(..., pattern=r"^\d{6}$", description="6-digit card id", example="245781"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    idempotency: Optional[IdempotentRequest] = Depends(get_idempotent_request),
 ):
-    return book_service.return_book(book_id=book_id, card_id=card_id, db=db)
+    return await book_service.return_book(book_id=book_id, card_id=card_id, db=db, idempotency=idempotency)
 
 @router.put(
     "/{book_id}",
@@ -116,7 +330,7 @@ async def return_book(
 async def update_book(
     book_id: str = Path(..., pattern=r"^\d{6}$", description="Current 6-digit book id", example="000001"),
     payload: BookUpdatePayload = ...,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    return book_service.update_book(db=db, book_id=book_id, payload=payload)
+    return await book_service.update_book(db=db, book_id=book_id, payload=payload)
 
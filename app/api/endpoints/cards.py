@@ -0,0 +1,84 @@
+from core.db.services import card_service
+from api.deps import get_db, get_read_db
+from schemas.books import (
+    CardBatchResponse200, CardBooksPayload, CardHistoryResponse200, CardLoansResponse200, CardNotFound404
+)
+from fastapi import APIRouter, Depends, Path, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+router = APIRouter(prefix="/cards", tags=["Cards"])
+
+@router.post(
+    '/{card_id}/borrow',
+    description=(
+        "Borrow several books for one library card in a single transaction. "
+        "Each book gets its own result code: 200, 404 (book not found) or 409 (already borrowed)."
+    ),
+    response_description="Per-book outcomes",
+    response_model=CardBatchResponse200,
+    responses={
+        404: {"description": "Card not found", "model": CardNotFound404},
+    }
+)
+async def borrow_books(
+    payload: CardBooksPayload,
+    card_id: str = Path(..., pattern=r"^\d{6}$", description="6-digit card id", example="245781"),
+    db: AsyncSession = Depends(get_db)
+):
+    return await card_service.borrow_books(card_id=card_id, book_ids=payload.bookIds, db=db)
+
+@router.post(
+    '/{card_id}/return',
+    description=(
+        "Return several books with one library card in a single transaction. "
+        "Each book gets its own result code: 200, 404 (book not found) or 409 "
+        "(not borrowed, or borrowed by another card)."
+    ),
+    response_description="Per-book outcomes",
+    response_model=CardBatchResponse200,
+    responses={
+        404: {"description": "Card not found", "model": CardNotFound404},
+    }
+)
+async def return_books(
+    payload: CardBooksPayload,
+    card_id: str = Path(..., pattern=r"^\d{6}$", description="6-digit card id", example="245781"),
+    db: AsyncSession = Depends(get_db)
+):
+    return await card_service.return_books(card_id=card_id, book_ids=payload.bookIds, db=db)
+
+@router.get(
+    '/{card_id}/loans',
+    description="Books currently borrowed on a library card, oldest loan first.",
+    response_description="Active loans of the card",
+    response_model=CardLoansResponse200,
+    responses={
+        404: {"description": "Card not found", "model": CardNotFound404},
+    }
+)
+async def get_card_loans(
+    card_id: str = Path(..., pattern=r"^\d{6}$", description="6-digit card id", example="245781"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    return await card_service.get_card_loans(db=db, card_id=card_id)
+
+@router.get(
+    '/{card_id}/history',
+    description=(
+        "Borrowing history of a library card with book titles, newest first. Pass `cursor` "
+        "(the `next_cursor` of the previous page) to continue."
+    ),
+    response_description="Borrowings of the card",
+    response_model=CardHistoryResponse200,
+    responses={
+        404: {"description": "Card not found", "model": CardNotFound404},
+    }
+)
+async def get_card_history(
+    card_id: str = Path(..., pattern=r"^\d{6}$", description="6-digit card id", example="245781"),
+    size: int = Query(20, ge=1, le=100, description="Page size (max 100)"),
+    cursor: Optional[str] = Query(None, max_length=200, description="Cursor returned by the previous page"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    return await card_service.get_card_history(db=db, card_id=card_id, size=size, cursor=cursor)
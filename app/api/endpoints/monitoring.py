@@ -0,0 +1,91 @@
+import asyncio
+from core import admission, metrics
+from core.cache import book_cache
+from core.changes import change_feed
+from core.config import WEB_CONCURRENCY
+from core.db.routing import read_router
+from core.db.session import async_engine, pool_status
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+HEALTH_CHECK_TIMEOUT = 2.0
+
+router = APIRouter(tags=["Monitoring"])
+
+async def _ping(api_engine) -> bool:
+    try:
+        async with api_engine.connect() as conn:
+            await asyncio.wait_for(conn.execute(text("SELECT 1")), HEALTH_CHECK_TIMEOUT)
+        return True
+    except (SQLAlchemyError, OSError, asyncio.TimeoutError):
+        return False
+
+@router.get(
+    '/health',
+    description="Database reachability and live connection pool statistics (503 when the database is down)",
+    response_description="Health report",
+)
+async def health():
+    database_ok = await _ping(async_engine)
+    databases = {"primary": {"reachable": database_ok, "pool": pool_status(async_engine)}}
+    # replicas only degrade the report: reads fall back to the primary when they are unusable
+    degraded = False
+    for i, replica in enumerate(read_router.replicas):
+        reachable = await _ping(replica)
+        degraded = degraded or not reachable or read_router.is_down(replica)
+        databases[f"replica{i}"] = {
+            "reachable": reachable,
+            "skipped": read_router.is_down(replica),
+            "lag_seconds": read_router.lag(replica),
+            "pool": pool_status(replica),
+        }
+    content = {
+        "status": ("degraded" if degraded else "ok") if database_ok else "unavailable",
+        "workers": WEB_CONCURRENCY,
+        "databases": databases,
+    }
+    return JSONResponse(status_code=200 if database_ok else 503, content=content)
+
+@router.get(
+    '/cache/stats',
+    description="Hit, miss and eviction counters of the single-book response cache",
+    response_description="Cache counters",
+)
+async def cache_stats():
+    return {"books": book_cache.stats()}
+
+@router.get(
+    '/changes/stats',
+    description="Subscribers and buffered events of this worker's book change feed",
+    response_description="Change feed counters",
+)
+async def change_feed_stats():
+    return change_feed.stats()
+
+@router.get(
+    '/admission/stats',
+    description="In-flight and queued requests per route class, shed and rate-limited counters of this worker",
+    response_description="Admission control counters",
+)
+async def admission_stats():
+    return admission.stats()
+
+@router.get(
+    '/metrics',
+    description="Prometheus metrics: per-route request counts, latency histograms, DB time, pool usage",
+    response_class=PlainTextResponse,
+)
+async def prometheus_metrics():
+    cache = book_cache.stats()
+    extra = [
+        ("library_book_cache_hits_total", "counter", "Book cache hits", cache["hits"]),
+        ("library_book_cache_misses_total", "counter", "Book cache misses", cache["misses"]),
+        ("library_book_cache_stale_total", "counter", "Book cache entries older than an announced change", cache["stale"]),
+    ]
+    if "evictions" in cache:
+        extra.append(("library_book_cache_evictions_total", "counter", "Book cache evictions", cache["evictions"]))
+        extra.append(("library_book_cache_entries", "gauge", "Entries in the book cache", cache["size"]))
+    extra.extend(admission.prometheus_samples())
+    return PlainTextResponse(metrics.render_prometheus(extra), media_type="text/plain; version=0.0.4")
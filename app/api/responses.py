@@ -0,0 +1,9 @@
+from fastapi.responses import JSONResponse
+import orjson
+from typing import Any
+
+class ORJSONResponse(JSONResponse):
+    """JSON response encoded with orjson; datetimes are written as ISO 8601."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
@@ -0,0 +1,90 @@
+import codecs
+import re
+from typing import AsyncIterator, List
+
+_STRUCTURAL = re.compile(r'[\[\]{}",\\]')
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Yield non-empty lines of a newline-delimited JSON body as they arrive."""
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if pending.strip():
+        yield pending
+
+async def iter_json_array(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Yield the raw text of each element of a top-level JSON array as it arrives.
+
+    Only the element being read is buffered, so arbitrarily large arrays can be
+    consumed in constant memory. Elements are not parsed here.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    depth = 0
+    in_string = False
+    escaped = False
+    finished = False
+    elements = 0
+    element: List[str] = []
+
+    async for chunk in chunks:
+        text = decoder.decode(chunk)
+        if finished or not text:
+            continue
+        start = 0
+        skip = 1 if escaped else 0  # position of a character escaped in the previous chunk
+        escaped = False
+
+        for match in _STRUCTURAL.finditer(text):
+            pos, char = match.start(), match.group()
+            if pos < skip:
+                continue
+            if in_string:
+                if char == "\\":
+                    skip = pos + 2
+                    escaped = pos + 1 == len(text)
+                elif char == '"':
+                    in_string = False
+                continue
+
+            if char == '"':
+                if depth == 0:
+                    raise ValueError("Request body must be a JSON array")
+                in_string = True
+            elif char in "[{":
+                if depth == 0:
+                    if char != "[" or text[start:pos].strip():
+                        raise ValueError("Request body must be a JSON array")
+                    start = pos + 1
+                depth += 1
+            elif char in "]}":
+                depth -= 1
+                if depth == 0:
+                    if char != "]":
+                        raise ValueError("Request body must be a JSON array")
+                    raw = "".join(element) + text[start:pos]
+                    element.clear()
+                    if raw.strip():
+                        yield raw
+                    elif elements:
+                        # trailing comma: "[{...},]"
+                        raise ValueError("Request body must be a JSON array")
+                    finished = True
+                    break
+            elif char == "," and depth == 1:
+                raw = "".join(element) + text[start:pos]
+                element.clear()
+                if not raw.strip():
+                    raise ValueError("Request body must be a JSON array")
+                elements += 1
+                yield raw
+                start = pos + 1
+
+        if not finished and depth > 0:
+            element.append(text[start:])
+
+    if not finished:
+        raise ValueError("Request body must be a JSON array")
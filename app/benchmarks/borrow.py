@@ -0,0 +1,66 @@
+"""Latency of POST /books/{id}/borrow/{card} and POST /books/{id}/return/{card}.
+
+Every client owns one book and borrows/returns it in a loop, so the numbers show
+per-request cost without lock contention. Books `start-id .. start-id + concurrency`
+are created through /books/bulk if missing; the card must exist.
+
+Example:
+    python -m benchmarks.borrow --url http://localhost:8000 --concurrency 16 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.load import summarize
+
+async def run_borrow_return(base_url: str, card_id: str, first_id: int, concurrency: int, duration: float) -> Dict:
+    book_ids = [f"{first_id + i:06d}" for i in range(concurrency)]
+    borrow_latencies: List[float] = []
+    return_latencies: List[float] = []
+    errors = {"borrow": 0, "return": 0}
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        records = [{"id": book_id, "title": "Borrow benchmark", "author": "Benchmark"} for book_id in book_ids]
+        (await client.post("/books/bulk", json=records)).raise_for_status()
+        for book_id in book_ids:  # start from a clean state if a previous run was interrupted
+            await client.post(f"/books/{book_id}/return/{card_id}")
+
+        deadline = time.perf_counter() + duration
+
+        async def worker(book_id: str) -> None:
+            while time.perf_counter() < deadline:
+                for action, latencies in (("borrow", borrow_latencies), ("return", return_latencies)):
+                    start = time.perf_counter()
+                    response = await client.post(f"/books/{book_id}/{action}/{card_id}")
+                    latencies.append(time.perf_counter() - start)
+                    if response.status_code != 200:
+                        errors[action] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(book_id) for book_id in book_ids))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "borrow": summarize("POST /books/{id}/borrow/{card}", borrow_latencies, errors["borrow"], elapsed),
+        "return": summarize("POST /books/{id}/return/{card}", return_latencies, errors["return"], elapsed),
+    }
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--card-id", default="245781")
+    parser.add_argument("--start-id", type=int, default=990000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run_borrow_return(args.url, args.card_id, args.start_id, args.concurrency, args.duration))
+    print(json.dumps(result))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Compare rows/second of POST /books/bulk (streamed NDJSON) with one POST /books per row.
+
+The ids `start-id .. start-id + 2*rows` must be free; the single-insert run uses the
+second half of that range.
+
+Example:
+    python -m benchmarks.bulk --url http://localhost:8000 --rows 20000 --start-id 500000
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+
+def book_record(book_id: int) -> Dict[str, str]:
+    return {"id": f"{book_id:06d}", "title": f"Bulk title {book_id}", "author": f"Author {book_id % 997}"}
+
+async def ndjson_body(first_id: int, rows: int) -> AsyncIterator[bytes]:
+    batch: List[str] = []
+    for book_id in range(first_id, first_id + rows):
+        batch.append(json.dumps(book_record(book_id)))
+        if len(batch) == 500:
+            yield ("\n".join(batch) + "\n").encode()
+            batch = []
+    if batch:
+        yield ("\n".join(batch) + "\n").encode()
+
+async def run_bulk(base_url: str, first_id: int, rows: int) -> Dict:
+    async with httpx.AsyncClient(base_url=base_url, timeout=600) as client:
+        started = time.perf_counter()
+        response = await client.post(
+            "/books/bulk", content=ndjson_body(first_id, rows), headers={"Content-Type": "application/x-ndjson"}
+        )
+        elapsed = time.perf_counter() - started
+    response.raise_for_status()
+    return {
+        "name": "POST /books/bulk",
+        "rows": rows,
+        "created": response.json()["created"],
+        "elapsed_s": round(elapsed, 3),
+        "rows_per_s": round(rows / elapsed, 1),
+    }
+
+async def run_single(base_url: str, first_id: int, rows: int, concurrency: int) -> Dict:
+    ids = iter(range(first_id, first_id + rows))
+    created = 0
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+
+        async def worker() -> None:
+            nonlocal created
+            for book_id in ids:
+                response = await client.post("/books/", json=book_record(book_id))
+                created += response.status_code == 200
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return {
+        "name": "POST /books",
+        "rows": rows,
+        "created": created,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "rows_per_s": round(rows / elapsed, 1),
+    }
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--start-id", type=int, default=500000)
+    parser.add_argument("--concurrency", type=int, default=16, help="clients for the single-insert run")
+    args = parser.parse_args(argv)
+
+    bulk = asyncio.run(run_bulk(args.url, args.start_id, args.rows))
+    single = asyncio.run(run_single(args.url, args.start_id + args.rows, args.rows, args.concurrency))
+    print(json.dumps({"bulk": bulk, "single": single, "speedup": round(bulk["rows_per_s"] / single["rows_per_s"], 1)}))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""Print per-scenario differences between two benchmarks.suite JSON results.
+
+Example:
+    python -m benchmarks.compare results/before.json results/after.json
+"""
+import argparse
+import json
+from typing import List, Optional
+
+METRICS = ("rps", "p50_ms", "p95_ms", "p99_ms", "rows_per_s")
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args(argv)
+
+    with open(args.before) as f:
+        before = json.load(f)["results"]
+    with open(args.after) as f:
+        after = json.load(f)["results"]
+
+    print(f"{'scenario':<28}{'metric':<12}{'before':>12}{'after':>12}{'change':>10}")
+    for name in sorted(set(before) & set(after)):
+        for metric in METRICS:
+            if metric not in before[name] or metric not in after[name]:
+                continue
+            old, new = before[name][metric], after[name][metric]
+            change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+            print(f"{name:<28}{metric:<12}{old:>12}{new:>12}{change:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Concurrent HTTP load driver for a running Library API instance.
+
+Example:
+    python -m benchmarks.load --url http://localhost:8000 --path /books/000001 \
+        --concurrency 64 --duration 10
+"""
+import argparse
+import asyncio
+from collections import defaultdict
+import json
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def summarize(name: str, latencies: List[float], errors: int, elapsed: float) -> Dict:
+    return {
+        "name": name,
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+async def run_load(
+    base_url: str,
+    request_factory: Callable[[int], httpx.Request],
+    concurrency: int = 32,
+    duration: float = 10.0,
+    name: str = "load",
+    ok_statuses: tuple = (200,),
+) -> Dict:
+    """Keep `concurrency` requests in flight for `duration` seconds.
+
+    `request_factory` gets a running request number and returns the request to send,
+    so scenarios can rotate ids. Statuses outside `ok_statuses` are counted as errors.
+    """
+    latencies: List[float] = []
+    errors = 0
+    counter = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker() -> None:
+            nonlocal errors, counter
+            while time.perf_counter() < deadline:
+                counter += 1
+                request = request_factory(counter)
+                start = time.perf_counter()
+                try:
+                    response = await client.send(request)
+                    ok = response.status_code in ok_statuses
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append(time.perf_counter() - start)
+                if not ok:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return summarize(name, latencies, errors, elapsed)
+
+Recorder = Callable[[str, float, bool], None]
+
+async def run_workers(
+    base_url: str,
+    worker: Callable[[httpx.AsyncClient, int, Recorder], Awaitable[None]],
+    concurrency: int = 32,
+    duration: float = 10.0,
+) -> Dict[str, Dict]:
+    """Run `concurrency` copies of a scripted `worker` for `duration` seconds.
+
+    `worker(client, index, record)` performs one iteration (it may send several
+    requests) and reports each one with `record(name, seconds, ok)`; results are
+    summarized per name.
+    """
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+
+    def record(name: str, seconds: float, ok: bool) -> None:
+        latencies[name].append(seconds)
+        if not ok:
+            errors[name] += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        deadline = time.perf_counter() + duration
+
+        async def loop(index: int) -> None:
+            while time.perf_counter() < deadline:
+                await worker(client, index, record)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(loop(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return {name: summarize(name, samples, errors[name], elapsed) for name, samples in latencies.items()}
+
+async def timed(client: httpx.AsyncClient, record: Recorder, name: str, method: str, url: str,
+                ok_statuses: tuple = (200,), **kwargs) -> httpx.Response:
+    """Send one request and record its latency under `name`."""
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+    except httpx.HTTPError:
+        record(name, time.perf_counter() - start, False)
+        raise
+    record(name, time.perf_counter() - start, response.status_code in ok_statuses)
+    return response
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--method", default="GET")
+    parser.add_argument("--path", default="/books/?page=1&size=50")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args(argv)
+
+    def factory(_: int) -> httpx.Request:
+        return httpx.Request(args.method, args.url.rstrip("/") + args.path)
+
+    result = asyncio.run(run_load(args.url, factory, args.concurrency, args.duration, name=f"{args.method} {args.path}"))
+    print(json.dumps(result))
+
+if __name__ == "__main__":
+    main()
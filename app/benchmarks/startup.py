@@ -0,0 +1,84 @@
+"""Measure how long the API takes to start: module import and time to the first served request.
+
+Run from the app directory against a migrated database (startup itself does no DDL):
+    python -m benchmarks.startup --runs 5 --workers 4
+
+`import_s` is `import main` in a fresh interpreter. `ready_s` is the time from
+spawning uvicorn to the first 200 from /health, `first_query_s` to the first
+200 from GET /books (includes opening a database connection).
+"""
+import argparse
+from benchmarks.load import percentile
+from benchmarks.suite import _git_commit
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+POLL_INTERVAL = 0.01
+
+def measure_import() -> float:
+    out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+def _wait_for(client: httpx.Client, path: str, started: float, timeout: float) -> float:
+    while time.perf_counter() - started < timeout:
+        try:
+            if client.get(path).status_code == 200:
+                return time.perf_counter() - started
+        except httpx.TransportError:
+            pass
+        time.sleep(POLL_INTERVAL)
+    raise TimeoutError(f"{path} not ready after {timeout}s")
+
+def measure_ready(port: int, workers: int, timeout: float) -> Dict[str, float]:
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        env=dict(os.environ, PYTHONPATH="."),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=timeout) as client:
+            ready = _wait_for(client, "/health", started, timeout)
+            first_query = _wait_for(client, "/books/?size=1&count=none", started, timeout)
+    finally:
+        server.terminate()
+        server.wait()
+    return {"ready_s": ready, "first_query_s": first_query}
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    return {
+        "median": round(statistics.median(values), 4),
+        "p95": round(percentile(values, 95), 4),
+        "max": round(max(values), 4),
+    }
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for readiness")
+    args = parser.parse_args(argv)
+
+    imports = [measure_import() for _ in range(args.runs)]
+    starts = [measure_ready(args.port, args.workers, args.timeout) for _ in range(args.runs)]
+    print(json.dumps({
+        "meta": {"commit": _git_commit(), "python": platform.python_version(), "workers": args.workers},
+        "import_s": _summary(imports),
+        "ready_s": _summary([run["ready_s"] for run in starts]),
+        "first_query_s": _summary([run["first_query_s"] for run in starts]),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Benchmark every endpoint of a running Library API against a seeded database.
+
+Seed first with `python -m benchmarks.seed` and pass the same --books/--cards/--reserved.
+Write endpoints change the data, so re-seed (`--reset`) before runs you want to compare.
+Results are written as JSON (one summary per scenario with rps and p50/p95/p99);
+compare two runs with `python -m benchmarks.compare before.json after.json`.
+
+Example:
+    python -m benchmarks.suite --url http://localhost:8000 --concurrency 32 --duration 15 \
+        --output results/$(git rev-parse --short HEAD).json
+"""
+import argparse
+import asyncio
+from benchmarks.load import run_workers, timed
+from benchmarks.seed import (
+    AUTHOR_WORDS, BOOK_ID_SPACE, DEFAULT_BOOKS, DEFAULT_CARDS, DEFAULT_RESERVED, TITLE_WORDS, book_id, card_id
+)
+from datetime import datetime, timezone
+import json
+import platform
+import random
+import subprocess
+import time
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+class Dataset:
+    def __init__(self, books: int, cards: int, reserved: int, hot_books: int, seed: int):
+        self.books = books
+        self.cards = cards
+        self.reserved_start = books - reserved  # ids >= this are never borrowed by the seed
+        self.hot_books = hot_books
+        self.random = random.Random(seed)
+
+    def any_book(self) -> str:
+        return book_id(self.random.randrange(self.books))
+
+    def any_card(self) -> str:
+        return card_id(self.random.randrange(self.cards))
+
+    def own_book(self, worker: int, slot: int = 0, per_worker: int = 1) -> str:
+        """A reserved book used by one worker only (no lock contention)."""
+        return book_id(self.reserved_start + self.hot_books + worker * per_worker + slot)
+
+    def hot_book(self) -> str:
+        return book_id(self.reserved_start + self.random.randrange(self.hot_books))
+
+def _scenarios(data: Dataset, free_id_start: int) -> Dict[str, Callable]:
+    async def list_books_offset(client, worker, record):
+        page = data.random.randrange(1, max(data.books // 50, 1) + 1)
+        await timed(client, record, "list_books_offset", "GET", f"/books/?page={page}&size=50")
+
+    async def list_books_keyset(client, worker, record):
+        await timed(client, record, "list_books_keyset", "GET", f"/books/?after={data.any_book()}&size=50&count=none")
+
+    async def list_books_page1000(client, worker, record):
+        await timed(client, record, "list_books_page1000", "GET", f"/books/?after={data.any_book()}&size=1000&count=none")
+
+    async def get_book(client, worker, record):
+        await timed(client, record, "get_book", "GET", f"/books/{data.any_book()}")
+
+    async def search_books(client, worker, record):
+        q = f"{data.random.choice(TITLE_WORDS)} {data.random.choice(AUTHOR_WORDS)}"
+        await timed(client, record, "search_books", "GET", "/books/search", params={"q": q})
+
+    async def update_book(client, worker, record):
+        payload = {"title": f"Updated {data.random.randrange(10**6)}"}
+        await timed(client, record, "update_book", "PUT", f"/books/{data.own_book(worker)}", json=payload)
+
+    async def borrow_return(client, worker, record):
+        book, card = data.own_book(worker), card_id(worker)
+        await timed(client, record, "borrow_book", "POST", f"/books/{book}/borrow/{card}")
+        await timed(client, record, "return_book", "POST", f"/books/{book}/return/{card}")
+
+    async def borrow_return_contended(client, worker, record):
+        book, card = data.hot_book(), card_id(worker)
+        response = await timed(client, record, "borrow_book_contended", "POST", f"/books/{book}/borrow/{card}",
+                               ok_statuses=(200, 409))
+        if response.status_code == 200:
+            await timed(client, record, "return_book_contended", "POST", f"/books/{book}/return/{card}")
+
+    async def batch_borrow_return(client, worker, record):
+        payload = {"bookIds": [data.own_book(worker, slot, per_worker=10) for slot in range(10)]}
+        card = card_id(worker)
+        await timed(client, record, "batch_borrow_10", "POST", f"/cards/{card}/borrow", json=payload)
+        await timed(client, record, "batch_return_10", "POST", f"/cards/{card}/return", json=payload)
+
+    # deleted books keep their id, so every iteration needs an id that was never used
+    next_free = iter(range(free_id_start, BOOK_ID_SPACE))
+
+    async def add_delete_book(client, worker, record):
+        new_id = next(next_free, None)
+        if new_id is None:
+            raise RuntimeError(f"add_delete_book used up the free book ids {free_id_start}..{BOOK_ID_SPACE - 1}")
+        new_id = book_id(new_id)
+        payload = {"id": new_id, "title": "Benchmark addition", "author": "Benchmark"}
+        await timed(client, record, "add_book", "POST", "/books/", json=payload)
+        await timed(client, record, "delete_book", "DELETE", f"/books/{new_id}")
+
+    return {
+        "list_books_offset": list_books_offset,
+        "list_books_keyset": list_books_keyset,
+        "list_books_page1000": list_books_page1000,
+        "get_book": get_book,
+        "search_books": search_books,
+        "update_book": update_book,
+        "borrow_return": borrow_return,
+        "borrow_return_contended": borrow_return_contended,
+        "batch_borrow_return": batch_borrow_return,
+        "add_delete_book": add_delete_book,
+    }
+
+SCENARIOS = (
+    "list_books_offset", "list_books_keyset", "list_books_page1000", "get_book", "search_books", "update_book",
+    "borrow_return", "borrow_return_contended", "batch_borrow_return", "add_delete_book", "export_books",
+)
+
+async def export_books(base_url: str) -> Dict:
+    rows = 0
+    async with httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+        started = time.perf_counter()
+        async with client.stream("GET", "/books/export") as response:
+            async for line in response.aiter_lines():
+                rows += bool(line)
+        elapsed = time.perf_counter() - started
+    return {"name": "export_books", "rows": rows, "elapsed_s": round(elapsed, 3), "rows_per_s": round(rows / elapsed, 1)}
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def run_suite(args: argparse.Namespace) -> Dict:
+    data = Dataset(args.books, args.cards, args.reserved, args.hot_books, args.seed)
+    scenarios = _scenarios(data, args.free_id_start)
+
+    results: Dict[str, Dict] = {}
+    for name in args.scenario:
+        # a failing scenario is reported in the results; the others still run
+        try:
+            if name == "export_books":
+                results[name] = await export_books(args.url)
+            else:
+                results.update(await run_workers(args.url, scenarios[name], args.concurrency, args.duration))
+        except Exception as e:
+            results[name] = {"name": name, "error": f"{type(e).__name__}: {e}"}
+            print(f"{name}: failed: {e}", flush=True)
+        else:
+            print(f"{name}: done", flush=True)
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "url": args.url,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "dataset": {"books": args.books, "cards": args.cards, "reserved": args.reserved, "hot_books": args.hot_books},
+            "python": platform.python_version(),
+        },
+        "results": results,
+    }
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per scenario")
+    parser.add_argument("--books", type=int, default=DEFAULT_BOOKS)
+    parser.add_argument("--cards", type=int, default=DEFAULT_CARDS)
+    parser.add_argument("--reserved", type=int, default=DEFAULT_RESERVED)
+    parser.add_argument("--hot-books", type=int, default=4, help="books shared by all clients in the contended scenario")
+    parser.add_argument("--free-id-start", type=int, default=None,
+                        help=f"first unused book id for add_book, below {BOOK_ID_SPACE} (default: --books)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for picking ids")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="run only this scenario (repeatable)")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+    if args.hot_books + args.concurrency * 10 > args.reserved:
+        parser.error("--reserved must cover --hot-books plus 10 books per client")
+    args.scenario = args.scenario or list(SCENARIOS)
+    if args.free_id_start is None:
+        args.free_id_start = args.books
+    if args.free_id_start < args.books:
+        parser.error("--free-id-start must not be below --books: those ids are seeded")
+    if "add_delete_book" in args.scenario and args.free_id_start >= BOOK_ID_SPACE:
+        parser.error(
+            f"add_delete_book needs unused book ids below {BOOK_ID_SPACE} and --free-id-start is "
+            f"{args.free_id_start}; seed fewer books or leave the scenario out with --scenario"
+        )
+
+    result = asyncio.run(run_suite(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    else:
+        print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
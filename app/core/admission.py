@@ -0,0 +1,237 @@
+"""Admission control: bounded concurrency and early load shedding per route class.
+
+Requests are either "read" (GET/HEAD) or "write". Each class runs a limited
+number of requests at once, and an optional "total" limiter caps both classes
+together at what the pool can serve. Each limiter queues a limited number more for a short time;
+everything beyond that is answered right away with 503 and Retry-After instead
+of piling up behind a saturated connection pool. A class whose recent pool
+wait is above its budget sheds new requests the same way until the wait drops.
+Borrow/return requests are additionally limited per card by a token bucket
+(429 with Retry-After).
+
+All state is per worker process. Monitoring routes and the change feed are never limited.
+"""
+import asyncio
+from collections import OrderedDict, defaultdict, deque
+from core import metrics
+from core.config import (
+    ADMISSION_POOL_WAIT_BUDGET, ADMISSION_QUEUE_DEPTH, ADMISSION_QUEUE_TIMEOUT, ADMISSION_READ_CONCURRENCY,
+    ADMISSION_RETRY_AFTER, ADMISSION_TOTAL_CONCURRENCY, ADMISSION_WRITE_CONCURRENCY, CARD_RATE_BURST, CARD_RATE_LIMIT
+)
+import math
+import re
+from starlette.responses import JSONResponse
+import time
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# monitoring, and the change feed: its streams are long-lived and hold no pool connection
+EXEMPT_PATHS = {"/health", "/metrics", "/cache/stats", "/admission/stats", "/changes/stats", "/books/changes"}
+READ_METHODS = {"GET", "HEAD"}
+LOAN_PATH = re.compile(r"^/(?:books/\d{6}/(?:borrow|return)/(\d{6})|cards/(\d{6})/(?:borrow|return))/?$")
+# weight of the newest request in the pool wait average; the average also halves every
+# second without new requests, so a class that sheds everything recovers by itself
+POOL_WAIT_WEIGHT = 0.2
+MAX_TRACKED_CARDS = 100_000
+
+def route_class(method: str) -> str:
+    return "read" if method in READ_METHODS else "write"
+
+def loan_card(method: str, path: str) -> Optional[str]:
+    """Card id of a borrow/return request, None for every other request."""
+    if method != "POST":
+        return None
+    match = LOAN_PATH.match(path)
+    return (match.group(1) or match.group(2)) if match else None
+
+class ClassLimiter:
+    """At most `concurrency` requests in flight; up to `queue_depth` more wait `queue_timeout` seconds."""
+
+    def __init__(self, name: str, concurrency: int, queue_depth: int, queue_timeout: float, pool_wait_budget: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_depth = queue_depth
+        self.queue_timeout = queue_timeout
+        self.pool_wait_budget = pool_wait_budget
+        self.in_flight = 0
+        self.shed: Dict[str, int] = defaultdict(int)
+        self.pool_wait_total = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._pool_wait = 0.0
+        self._pool_wait_at = time.monotonic()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def recent_pool_wait(self) -> float:
+        return self._pool_wait * 0.5 ** (time.monotonic() - self._pool_wait_at)
+
+    def record_pool_wait(self, seconds: float) -> None:
+        self.pool_wait_total += seconds
+        self._pool_wait = self.recent_pool_wait() * (1 - POOL_WAIT_WEIGHT) + seconds * POOL_WAIT_WEIGHT
+        self._pool_wait_at = time.monotonic()
+
+    async def acquire(self) -> Optional[str]:
+        """Take a slot; returns None when admitted, otherwise the reason the request is shed."""
+        if self.pool_wait_budget > 0 and self.recent_pool_wait() > self.pool_wait_budget:
+            return "pool_wait"
+        if self.in_flight < self.concurrency and not self._waiters:
+            self.in_flight += 1
+            return None
+        if len(self._waiters) >= self.queue_depth:
+            return "queue_full"
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            return "queue_timeout"
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # the slot was handed over just before the request was cancelled
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        return None
+
+    def release(self) -> None:
+        # hand the slot straight to the oldest waiter, so new arrivals cannot overtake the queue
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "concurrency": self.concurrency,
+            "queue_depth": self.queue_depth,
+            "recent_pool_wait": round(self.recent_pool_wait(), 6),
+            "shed": dict(self.shed),
+        }
+
+class CardRateLimiter:
+    """Token bucket per card: `rate` requests per second with bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: int, max_cards: int = MAX_TRACKED_CARDS):
+        self.rate = rate
+        self.burst = burst
+        self.max_cards = max_cards
+        self.limited = 0
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, card_id: str) -> float:
+        """Spend a token; returns 0 when allowed, otherwise the seconds until the next token."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(card_id, (float(self.burst), now))
+        tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+        if tokens < 1:
+            self.limited += 1
+            self._buckets[card_id] = (tokens, now)
+            return (1 - tokens) / self.rate
+        self._buckets[card_id] = (tokens - 1, now)
+        self._buckets.move_to_end(card_id)
+        # an evicted card starts again with a full bucket
+        while len(self._buckets) > self.max_cards:
+            self._buckets.popitem(last=False)
+        return 0.0
+
+def _rejection(code: int, error: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        status_code=code,
+        content={"code": code, "error": error},
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+class AdmissionControl:
+    """ASGI middleware; the slot is held until the response body is sent, streamed ones included."""
+
+    def __init__(
+        self,
+        app,
+        limiters: Optional[Dict[str, ClassLimiter]] = None,
+        card_limiter: Optional[CardRateLimiter] = None,
+        retry_after: int = ADMISSION_RETRY_AFTER,
+    ):
+        self.app = app
+        self.limiters = limiters if limiters is not None else default_limiters
+        self.card_limiter = card_limiter if card_limiter is not None else default_card_limiter
+        self.retry_after = retry_after
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        card_id = loan_card(scope["method"], scope["path"])
+        if card_id is not None and self.card_limiter is not None:
+            wait = self.card_limiter.take(card_id)
+            if wait > 0:
+                await _rejection(429, "Too many requests for this library card", wait)(scope, receive, send)
+                return
+
+        limiter = self.limiters[route_class(scope["method"])]
+        held: List[ClassLimiter] = []
+        admitted = False
+        try:
+            # class first, then the shared cap; always in this order
+            for candidate in (limiter, self.limiters.get("total")):
+                if candidate is None:
+                    continue
+                reason = await candidate.acquire()
+                if reason is not None:
+                    candidate.shed[reason] += 1
+                    await _rejection(503, "Server is overloaded, retry later", self.retry_after)(scope, receive, send)
+                    return
+                held.append(candidate)
+            admitted = True
+            await self.app(scope, receive, send)
+        finally:
+            stats = metrics.current_request()
+            if admitted and stats is not None:
+                limiter.record_pool_wait(stats.pool_wait)
+            for acquired in reversed(held):
+                acquired.release()
+
+def stats() -> Dict[str, Any]:
+    report: Dict[str, Any] = {name: limiter.stats() for name, limiter in default_limiters.items()}
+    if default_card_limiter is not None:
+        report["cards"] = {"rate": default_card_limiter.rate, "burst": default_card_limiter.burst,
+                           "limited": default_card_limiter.limited}
+    return report
+
+def prometheus_samples() -> List[Tuple[str, str, str, Any]]:
+    limiters = sorted(default_limiters.items())
+    samples: List[Tuple[str, str, str, Any]] = [
+        ("library_admission_in_flight", "gauge", "Admitted requests in progress",
+         [({"class": name}, limiter.in_flight) for name, limiter in limiters]),
+        ("library_admission_queued", "gauge", "Requests waiting for an admission slot",
+         [({"class": name}, limiter.queued) for name, limiter in limiters]),
+        ("library_admission_pool_wait_seconds_total", "counter", "Pool wait of admitted requests",
+         [({"class": name}, limiter.pool_wait_total) for name, limiter in limiters]),
+        ("library_admission_shed_total", "counter", "Requests rejected with 503",
+         [({"class": name, "reason": reason}, count)
+          for name, limiter in limiters for reason, count in sorted(limiter.shed.items())]),
+    ]
+    if default_card_limiter is not None:
+        samples.append(("library_card_rate_limited_total", "counter", "Borrow/return requests rejected with 429",
+                        default_card_limiter.limited))
+    return samples
+
+default_limiters = {
+    "read": ClassLimiter("read", ADMISSION_READ_CONCURRENCY, ADMISSION_QUEUE_DEPTH, ADMISSION_QUEUE_TIMEOUT,
+                         ADMISSION_POOL_WAIT_BUDGET),
+    "write": ClassLimiter("write", ADMISSION_WRITE_CONCURRENCY, ADMISSION_QUEUE_DEPTH, ADMISSION_QUEUE_TIMEOUT,
+                          ADMISSION_POOL_WAIT_BUDGET),
+}
+if ADMISSION_TOTAL_CONCURRENCY > 0:
+    # the pool wait is judged per class
+    default_limiters["total"] = ClassLimiter(
+        "total", ADMISSION_TOTAL_CONCURRENCY, ADMISSION_QUEUE_DEPTH, ADMISSION_QUEUE_TIMEOUT, 0
+    )
+default_card_limiter = CardRateLimiter(CARD_RATE_LIMIT, CARD_RATE_BURST) if CARD_RATE_LIMIT > 0 else None
@@ -0,0 +1,190 @@
+from abc import ABC, abstractmethod
+import asyncio
+from collections import OrderedDict
+from core.changes import ChangeFeed, change_feed
+from core.config import BOOK_CACHE_SIZE, BOOK_CACHE_TTL, BOOK_CACHE_URL
+import json
+import time
+from typing import Any, Dict, Optional, Set
+
+# books whose latest announced version is remembered, per worker
+MAX_TRACKED_VERSIONS = 100_000
+
+class CacheBackend(ABC):
+    """Storage used by ResponseCache. Values are JSON-serializable dicts."""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    async def clear(self, prefix: str) -> None:
+        """Drop what this process may hold stale after missing change notifications."""
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+class LocalLRUBackend(CacheBackend):
+    """In-process LRU with a per-entry TTL; the default backend and the stand-in for a shared one."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.evictions = 0
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    async def clear(self, prefix: str) -> None:
+        for key in [key for key in self._data if key.startswith(prefix)]:
+            del self._data[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._data), "maxsize": self.maxsize, "evictions": self.evictions}
+
+class RedisBackend(CacheBackend):
+    """Shared cache for several workers/hosts. Needs the optional `redis` package."""
+
+    def __init__(self, url: str, ttl: float):
+        import redis.asyncio as redis
+
+        self.ttl = ttl
+        self._client = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = await self._client.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        await self._client.set(key, json.dumps(value), px=int(self.ttl * 1000))
+
+    async def delete(self, key: str) -> None:
+        await self._client.delete(key)
+
+    async def clear(self, prefix: str) -> None:
+        # writers delete shared entries themselves, and a worker that missed
+        # notifications stores nothing until it is listening again
+        pass
+
+class ResponseCache:
+    """Payloads of rows keyed by id; every value carries the row `version`.
+
+    With a change feed, a worker also honours writes handled by other workers:
+    the feed announces the new version of every changed row, and an entry older
+    than that is a miss (and is dropped). Entries are only served and stored
+    while the feed is connected and has not missed notifications since the
+    entries were stored. Take a fill_token() before reading a row to cache, so
+    a read that raced with a change cannot store the old version afterwards.
+    """
+
+    def __init__(self, backend: CacheBackend, prefix: str, feed: Optional[ChangeFeed] = None):
+        self.backend = backend
+        self.prefix = prefix
+        self.feed = feed
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self._latest: "OrderedDict[str, int]" = OrderedDict()
+        # feed connection the cached entries are consistent with
+        self._synced = 0
+        self._clearing: Optional[asyncio.Task] = None
+        self._pending: Set[asyncio.Task] = set()
+        if feed is not None:
+            feed.watchers.append(self._on_change)
+
+    def fill_token(self) -> Optional[int]:
+        """Token for set(); None while entries cannot be trusted."""
+        if self.feed is None:
+            return 0
+        if not self.feed.connected:
+            return None
+        if self.feed.connections != self._synced:
+            self._start_clear()
+            return None
+        return self._synced
+
+    def _start_clear(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._clearing is None or self._clearing.done() or self._clearing.get_loop() is not loop:
+            self._clearing = loop.create_task(self._clear(self.feed.connections))
+
+    async def _clear(self, connection: int) -> None:
+        # notifications sent while the feed was reconnecting are gone
+        await self.backend.clear(self.prefix)
+        self._latest.clear()
+        self._synced = connection
+
+    def _on_change(self, event: Dict[str, Any]) -> None:
+        keys = [key for key in (event.get("id"), event.get("previousId")) if key is not None]
+        for key in keys:
+            self._latest[key] = max(event["version"], self._latest.get(key, 0))
+            self._latest.move_to_end(key)
+        while len(self._latest) > MAX_TRACKED_VERSIONS:
+            self._latest.popitem(last=False)
+        # drop the entries too, so they cannot outlive their tracked version
+        task = asyncio.get_running_loop().create_task(self.invalidate(*keys))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = None
+        if self.fill_token() is not None:
+            value = await self.backend.get(self.prefix + key)
+            if value is not None and value["version"] < self._latest.get(key, 0):
+                self.stale += 1
+                value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Dict[str, Any], token: Optional[int]) -> None:
+        if token is None or token != self.fill_token():
+            return
+        if value["version"] < self._latest.get(key, 0):
+            # read before a change that was announced in the meantime
+            return
+        await self.backend.set(self.prefix + key, value)
+
+    async def invalidate(self, *keys: str) -> None:
+        for key in keys:
+            await self.backend.delete(self.prefix + key)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "stale": self.stale, **self.backend.stats()}
+
+def _make_backend() -> CacheBackend:
+    if BOOK_CACHE_URL:
+        return RedisBackend(BOOK_CACHE_URL, BOOK_CACHE_TTL)
+    return LocalLRUBackend(BOOK_CACHE_SIZE, BOOK_CACHE_TTL)
+
+# BookDetailResponse200 payloads keyed by book id; coherent across workers through the change feed
+book_cache = ResponseCache(_make_backend(), prefix="book:", feed=change_feed)
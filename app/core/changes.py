@@ -0,0 +1,227 @@
+"""Live feed of book changes: pg_notify in the write transactions, LISTEN once per worker, SSE to clients.
+
+Every write that changes a book publishes a compact event on the `book_changes`
+channel inside its transaction, so it is delivered exactly when (and if) the
+transaction commits:
+    {"id": "000123", "version": 4711, "op": "borrow", "borrowed": true}
+`op` is add, update, borrow, return or delete; a renamed book's update event
+also carries `previousId`. `version` is the new Books.version and doubles as the
+SSE event id. A bulk import publishes one coarse event per inserted chunk
+instead of one per book, so a large import does not overflow the queues:
+    {"op": "bulk_add", "count": 1000, "version": 5711}
+where `version` is the highest version of the chunk; reload the list if needed.
+
+Each worker keeps one LISTEN connection (opened by the first subscriber) and
+fans the events out to its subscribers. Postgres delivers notifications in
+commit order to every listener, so all workers see the same sequence and keep
+the last CHANGES_BUFFER_SIZE events for clients resuming with Last-Event-ID.
+A client whose id is no longer buffered gets a `reset` event and should reload
+what it displays. A subscriber that falls CHANGES_QUEUE_SIZE events behind is
+disconnected; it reconnects and resumes from the buffer.
+
+In-process consumers (the book cache) register a watcher, which is called with
+every decoded event while the feed is `connected`; `connections` counts the
+LISTEN sessions, so a watcher can tell when notifications may have been missed.
+"""
+import asyncio
+import asyncpg
+from collections import deque
+from core.config import (
+    CHANGES_BUFFER_SIZE, CHANGES_KEEPALIVE_SECONDS, CHANGES_LISTEN_URL, CHANGES_MAX_SUBSCRIBERS, CHANGES_QUEUE_SIZE
+)
+from core.db.exception import ApiHTTPException
+import json
+from sqlalchemy.engine import make_url
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+CHANNEL = "book_changes"
+CONNECT_TIMEOUT = 5.0
+RECONNECT_MAX_DELAY = 10.0
+# tells EventSource clients how long to wait before reconnecting (ms)
+RETRY_MS = 3000
+
+Event = Tuple[int, str]
+RESET = None
+
+def notify_sql(rows: str, op: str, borrowed: str, **fields: str) -> str:
+    """SQL expression publishing one event per row of `rows` (with `id` and `version` columns).
+
+    `rows` is what follows FROM, `borrowed` and the extra `fields` are SQL
+    expressions over it. Evaluates to the number of events published.
+    """
+    extra = "".join(f", '{name}', {expression}" for name, expression in fields.items())
+    return (
+        f"(SELECT count(pg_notify('{CHANNEL}', jsonb_build_object("
+        f"'id', id, 'version', version, 'op', '{op}', 'borrowed', {borrowed}{extra})::text)) FROM {rows})"
+    )
+
+def notify_bulk_sql(rows: str, op: str) -> str:
+    """SQL expression publishing one event for all rows of `rows` (with a `version` column), if any."""
+    return (
+        f"(SELECT count(pg_notify('{CHANNEL}', jsonb_build_object("
+        f"'op', '{op}', 'count', n, 'version', version)::text)) "
+        f"FROM (SELECT count(*) AS n, max(version) AS version FROM {rows} HAVING count(*) > 0) AS chunk)"
+    )
+
+def format_event(event: Event) -> str:
+    version, payload = event
+    return f"id: {version}\nevent: change\ndata: {payload}\n\n"
+
+RESET_EVENT = "event: reset\ndata: {}\n\n"
+
+class Subscription:
+    def __init__(self, size: int):
+        self.queue: "asyncio.Queue[Optional[Event]]" = asyncio.Queue(size)
+        self.overflowed = False
+
+    def put(self, item: Optional[Event]) -> None:
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # too slow to keep up; the stream ends and the client resumes from the buffer
+            self.overflowed = True
+
+class ChangeFeed:
+    def __init__(self, dsn: str, buffer_size: int, queue_size: int, max_subscribers: int):
+        self.dsn = dsn
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.buffer: Deque[Event] = deque(maxlen=buffer_size)
+        self.subscribers: Set[Subscription] = set()
+        self.dropped = 0
+        self.watchers: List[Callable[[Dict[str, Any]], None]] = []
+        # True while LISTEN is active; `connections` is bumped by every new LISTEN session
+        self.connected = False
+        self.connections = 0
+        self._task: Optional[asyncio.Task] = None
+        self._ready: Optional[asyncio.Event] = None
+
+    def listen(self) -> None:
+        """Start the LISTEN connection of this worker in the background."""
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._ready = asyncio.Event()
+            self._task = loop.create_task(self._listen(self._ready))
+
+    async def start(self) -> None:
+        """Run the LISTEN connection of this worker; waits until it listens."""
+        self.listen()
+        try:
+            await asyncio.wait_for(self._ready.wait(), CONNECT_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise ApiHTTPException(503, "Change feed is unavailable")
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _listen(self, ready: asyncio.Event) -> None:
+        delay = 0.5
+        listened = False
+        while True:
+            try:
+                conn = await asyncpg.connect(self.dsn, timeout=CONNECT_TIMEOUT)
+            except (OSError, asyncio.TimeoutError, asyncpg.PostgresError):
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+                continue
+            lost = asyncio.Event()
+            conn.add_termination_listener(lambda _conn: lost.set())
+            try:
+                await conn.add_listener(CHANNEL, self._on_notify)
+                if listened:
+                    # notifications sent while reconnecting are gone
+                    self._reset()
+                listened = True
+                delay = 0.5
+                self.connections += 1
+                self.connected = True
+                ready.set()
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), CHANGES_KEEPALIVE_SECONDS)
+                    except asyncio.TimeoutError:
+                        await conn.execute("SELECT 1", timeout=CONNECT_TIMEOUT)
+            except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError):
+                pass
+            finally:
+                self.connected = False
+                conn.terminate()
+
+    def _on_notify(self, conn, pid: int, channel: str, payload: str) -> None:
+        try:
+            event = json.loads(payload)
+            version = int(event["version"])
+        except (ValueError, KeyError, TypeError):
+            return
+        self.dispatch((version, payload))
+        for watcher in self.watchers:
+            watcher(event)
+
+    def dispatch(self, event: Event) -> None:
+        self.buffer.append(event)
+        for subscription in self.subscribers:
+            subscription.put(event)
+
+    def _reset(self) -> None:
+        self.buffer.clear()
+        for subscription in self.subscribers:
+            subscription.put(RESET)
+
+    def since(self, last_event_id: int) -> Optional[List[Event]]:
+        """Buffered events after `last_event_id`, None when it is not in the buffer."""
+        events = list(self.buffer)
+        for i, (version, _) in enumerate(events):
+            if version == last_event_id:
+                return events[i + 1:]
+        return None
+
+    async def open_stream(self, last_event_id: Optional[int] = None) -> AsyncIterator[str]:
+        """Return the SSE body for a new subscriber; events missed since `last_event_id` come first."""
+        await self.start()
+        if len(self.subscribers) >= self.max_subscribers:
+            raise ApiHTTPException(503, "Too many change feed subscribers")
+        return self._stream(last_event_id)
+
+    async def _stream(self, last_event_id: Optional[int]) -> AsyncIterator[str]:
+        # no await between subscribing and reading the buffer, so no event falls in between
+        subscription = Subscription(self.queue_size)
+        self.subscribers.add(subscription)
+        missed = self.since(last_event_id) if last_event_id is not None else []
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            if missed is None:
+                yield RESET_EVENT
+            for event in missed or ():
+                yield format_event(event)
+            while not subscription.overflowed:
+                try:
+                    item = await asyncio.wait_for(subscription.queue.get(), CHANGES_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield RESET_EVENT if item is RESET else format_event(item)
+            self.dropped += 1
+        finally:
+            self.subscribers.discard(subscription)
+
+    def stats(self) -> dict:
+        return {
+            "listening": self._task is not None and not self._task.done(),
+            "connected": self.connected,
+            "subscribers": len(self.subscribers),
+            "buffered": len(self.buffer),
+            "dropped": self.dropped,
+        }
+
+change_feed = ChangeFeed(
+    make_url(CHANGES_LISTEN_URL).set(drivername="postgresql").render_as_string(hide_password=False),
+    CHANGES_BUFFER_SIZE, CHANGES_QUEUE_SIZE, CHANGES_MAX_SUBSCRIBERS,
+)
@@ -1,2 +1,124 @@
 import os
-DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://postgres:postgres@db:5432/library")
\ No newline at end of file
+
+def _async_url(url: str) -> str:
+    return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+
+DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://postgres:postgres@db:5432/library")
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", _async_url(DATABASE_URL))
+
+# comma-separated read replicas used by GET endpoints; empty = everything goes to the primary
+DATABASE_REPLICA_URLS = [
+    _async_url(url.strip()) for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+]
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+# a replica that failed to connect is skipped for this long
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+# seconds to connect to a replica and to run its lag probe; a slower one is skipped like a failed one
+REPLICA_TIMEOUT_SECONDS = float(os.getenv("REPLICA_TIMEOUT_SECONDS", "2"))
+# after a successful write, the same client reads from the primary for this long
+READ_YOUR_WRITES_SECONDS = int(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+# how long the response to a request with an Idempotency-Key header is kept for replays
+IDEMPOTENCY_KEY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", "86400"))
+
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+def derive_pool_size(max_connections: int, workers: int, explicit: int, reserved: int = 0) -> int:
+    """Per-worker pool size: an explicit DB_POOL_SIZE wins, else split the connection budget.
+
+    `reserved` connections of every worker's share are opened outside its pool and
+    are taken out of the share first.
+    """
+    if explicit > 0:
+        return explicit
+    if max_connections > 0:
+        return max(1, max_connections // max(1, workers) - reserved)
+    return 10
+
+# number of server worker processes; every worker has its own pool
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# production server (serve.py)
+SERVER_BIND = os.getenv("SERVER_BIND", "0.0.0.0:8000")
+SERVER_BACKLOG = int(os.getenv("SERVER_BACKLOG", "2048"))  # pending connections the kernel queues
+SERVER_KEEPALIVE = int(os.getenv("SERVER_KEEPALIVE", "5"))  # seconds an idle keep-alive connection stays open
+# seconds a worker gets after SIGTERM to finish in-flight requests before it is killed
+SERVER_GRACEFUL_TIMEOUT = int(os.getenv("SERVER_GRACEFUL_TIMEOUT", "30"))
+# seconds without a heartbeat before the master restarts a worker
+SERVER_TIMEOUT = int(os.getenv("SERVER_TIMEOUT", "60"))
+
+# disable connection pooling for the async engine (needed when every request runs
+# on its own event loop, e.g. the TestClient used in tests)
+DB_NULL_POOL = _env_bool("DB_NULL_POOL", "false")
+# connections the whole app may open on the primary (all workers together); 0 = no budget,
+# use DB_POOL_SIZE or 10. Leave room for the migrate and cron commands (DB_SYNC_POOL_SIZE each).
+# Replica pools are sized like the primary pool but count against each replica's own limit.
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "0"))
+# connections every worker opens on the primary besides its pool: the change feed's LISTEN
+# connection and the outbox dispatcher's one-connection pool
+DB_WORKER_EXTRA_CONNECTIONS = int(os.getenv("DB_WORKER_EXTRA_CONNECTIONS", "2"))
+DB_POOL_SIZE = derive_pool_size(
+    DB_MAX_CONNECTIONS, WEB_CONCURRENCY, int(os.getenv("DB_POOL_SIZE", "0")), DB_WORKER_EXTRA_CONNECTIONS
+)
+# with a connection budget, overflow would exceed it, so it defaults to 0 then
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "0" if DB_MAX_CONNECTIONS > 0 else "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))  # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds; -1 disables
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", "true")
+# pool of the sync engine, used by init_data, the maintenance commands and tests, not by the workers
+DB_SYNC_POOL_SIZE = int(os.getenv("DB_SYNC_POOL_SIZE", "2"))
+# server-side limits in milliseconds, 0 = server default
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+DB_IDLE_IN_TRANSACTION_TIMEOUT_MS = int(os.getenv("DB_IDLE_IN_TRANSACTION_TIMEOUT_MS", "0"))
+# connecting through PgBouncer in transaction mode: no prepared statement cache and no
+# session settings at connect time (set the timeouts on the database role instead)
+DB_PGBOUNCER = _env_bool("DB_PGBOUNCER", "false")
+
+# admission control (core.admission), per worker process and per route class (reads / writes).
+# A class runs at most *_CONCURRENCY requests at once, by default as many as the pool can serve;
+# up to ADMISSION_QUEUE_DEPTH more wait ADMISSION_QUEUE_TIMEOUT seconds for a slot, the rest get a 503
+ADMISSION_READ_CONCURRENCY = int(os.getenv("ADMISSION_READ_CONCURRENCY", str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+ADMISSION_WRITE_CONCURRENCY = int(os.getenv("ADMISSION_WRITE_CONCURRENCY", str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+# both classes draw on the primary pool, so together they are capped at its size as well;
+# 0 = no overall cap (the default with replicas, whose pools serve most reads)
+ADMISSION_TOTAL_CONCURRENCY = int(os.getenv(
+    "ADMISSION_TOTAL_CONCURRENCY", "0" if DATABASE_REPLICA_URLS else str(DB_POOL_SIZE + DB_MAX_OVERFLOW)
+))
+ADMISSION_QUEUE_DEPTH = int(os.getenv("ADMISSION_QUEUE_DEPTH", "50"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "1"))
+# a class whose recent average pool wait (seconds) is above this sheds new requests; 0 disables
+ADMISSION_POOL_WAIT_BUDGET = float(os.getenv("ADMISSION_POOL_WAIT_BUDGET", "0.5"))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))  # seconds, sent with every 503
+# token bucket per library card on the borrow/return routes (429 when empty); 0 = no limit
+CARD_RATE_LIMIT = float(os.getenv("CARD_RATE_LIMIT", "0"))  # requests per second
+CARD_RATE_BURST = int(os.getenv("CARD_RATE_BURST", "10"))
+
+# read-through cache for GET /books/{book_id}; BOOK_CACHE_URL (redis://...) switches to a shared cache
+BOOK_CACHE_SIZE = int(os.getenv("BOOK_CACHE_SIZE", "10000"))
+BOOK_CACHE_TTL = float(os.getenv("BOOK_CACHE_TTL", "60"))
+BOOK_CACHE_URL = os.getenv("BOOK_CACHE_URL", "")
+
+# GET /books/changes (core.changes); LISTEN needs a session connection, so point
+# CHANGES_LISTEN_URL at Postgres directly when DATABASE_URL goes through PgBouncer
+CHANGES_LISTEN_URL = os.getenv("CHANGES_LISTEN_URL", DATABASE_URL)
+CHANGES_BUFFER_SIZE = int(os.getenv("CHANGES_BUFFER_SIZE", "10000"))  # recent events kept for Last-Event-ID
+CHANGES_QUEUE_SIZE = int(os.getenv("CHANGES_QUEUE_SIZE", "1000"))  # per subscriber, before a slow one is dropped
+CHANGES_MAX_SUBSCRIBERS = int(os.getenv("CHANGES_MAX_SUBSCRIBERS", "1000"))  # per worker
+CHANGES_KEEPALIVE_SECONDS = float(os.getenv("CHANGES_KEEPALIVE_SECONDS", "15"))
+
+# transactional outbox of loan events (core.outbox). OUTBOX_SINK: "file:<path>" appends NDJSON,
+# "log" prints every event to stdout (development only: the events count as delivered);
+# empty = no dispatcher in this process, events stay pending until a process with a sink runs
+OUTBOX_SINK = os.getenv("OUTBOX_SINK", "")
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1"))  # seconds between polls when idle
+OUTBOX_SINK_TIMEOUT = float(os.getenv("OUTBOX_SINK_TIMEOUT", "10"))  # a batch not delivered by then is retried
+# seconds a claimed batch is hidden from other dispatchers; must exceed OUTBOX_SINK_TIMEOUT
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", str(OUTBOX_SINK_TIMEOUT * 3)))
+OUTBOX_RETRY_MAX_DELAY = int(os.getenv("OUTBOX_RETRY_MAX_DELAY", "300"))  # seconds; retries back off exponentially
+OUTBOX_RETAIN_HOURS = int(os.getenv("OUTBOX_RETAIN_HOURS", "168"))  # dispatched events kept before purging
+
+# monthly partitions of borrowings created ahead of time; older ones are detached into
+# the "archive" schema once past the retention (0 = keep everything attached)
+BORROWINGS_PARTITIONS_AHEAD = int(os.getenv("BORROWINGS_PARTITIONS_AHEAD", "3"))
+BORROWINGS_RETAIN_MONTHS = int(os.getenv("BORROWINGS_RETAIN_MONTHS", "0"))
@@ -0,0 +1,28 @@
+"""The catalogue version: one counter for "any book changed", bumped in commit order.
+
+Books.version comes from a sequence, and sequence values are handed out in
+the order transactions ask for them, not the order they commit: a writer that
+took version N can commit after another writer's N+1, so max(version) would
+miss its change. Instead every transaction that changes books also increments
+the single row of `catalogue`. The row lock makes a second writer wait until
+the first one commits, so a reader never sees a version without the changes
+it stands for.
+
+The bump holds that lock until commit, so it must be the last thing a write
+transaction does to books.
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+BUMP_SQL = "UPDATE catalogue SET version = version + 1 WHERE id = 1"
+
+def bump_catalogue_sql(rows: str) -> str:
+    """Catalogue bump if `rows` is not empty; use it as a data-modifying CTE after the writes."""
+    return f"{BUMP_SQL} AND EXISTS (SELECT 1 FROM {rows})"
+
+async def bump_catalogue(db: AsyncSession) -> None:
+    await db.execute(text(BUMP_SQL))
+
+def bump_catalogue_sync(conn: Connection) -> None:
+    conn.execute(text(BUMP_SQL))
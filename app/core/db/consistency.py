@@ -0,0 +1,82 @@
+"""Check (and repair) the active loan kept on each book row against borrowings.
+
+The open borrowings rows are the source of truth; Books.active_* is a copy kept
+so reads need no join. Run after manual data fixes or restores:
+    python -m core.db.consistency           # report mismatches
+    python -m core.db.consistency --repair  # rewrite the book rows from borrowings
+"""
+import argparse
+from core.db.catalogue import bump_catalogue_sync
+from core.db.session import engine
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from typing import Dict, List, Optional
+
+# latest open borrowing per book; more than one open row per book is itself a mismatch
+_OPEN_LOANS = """
+    SELECT DISTINCT ON (book_id) book_id, id, card_id, borrowed_at, count(*) OVER (PARTITION BY book_id) AS open_count
+    FROM borrowings
+    WHERE returned_at IS NULL
+    ORDER BY book_id, borrowed_at DESC, id DESC
+"""
+
+def find_loan_mismatches(conn: Connection) -> List[Dict]:
+    """Books whose active_* columns disagree with their open borrowings."""
+    rows = conn.execute(text(f"""
+        SELECT coalesce(b.id, o.book_id) AS book_id,
+               b.active_card_id, b.active_borrowing_id,
+               o.card_id AS open_card_id, o.id AS open_borrowing_id, coalesce(o.open_count, 0) AS open_count
+        FROM books b
+        FULL JOIN ({_OPEN_LOANS}) o ON o.book_id = b.id
+        WHERE b.active_borrowing_id IS DISTINCT FROM o.id
+           OR b.active_card_id IS DISTINCT FROM o.card_id
+           OR o.open_count > 1
+        ORDER BY 1
+    """)).mappings().all()
+    return [dict(row) for row in rows]
+
+def repair_loans(conn: Connection) -> int:
+    """Rewrite Books.active_* from the latest open borrowing of each book; returns rows changed.
+
+    Extra open borrowings of a book are only reported by find_loan_mismatches,
+    closing them is a decision for a person.
+    """
+    set_rows = conn.execute(text(f"""
+        UPDATE books b SET
+            active_card_id = o.card_id, active_borrowing_id = o.id, active_borrowed_at = o.borrowed_at,
+            version = nextval('books_version_seq')
+        FROM ({_OPEN_LOANS}) o
+        WHERE o.book_id = b.id AND (b.active_borrowing_id, b.active_card_id) IS DISTINCT FROM (o.id, o.card_id)
+    """)).rowcount
+    cleared_rows = conn.execute(text("""
+        UPDATE books b SET
+            active_card_id = NULL, active_borrowing_id = NULL, active_borrowed_at = NULL,
+            version = nextval('books_version_seq')
+        WHERE b.active_card_id IS NOT NULL
+          AND NOT EXISTS (
+              SELECT 1 FROM borrowings br
+              WHERE br.id = b.active_borrowing_id AND br.borrowed_at = b.active_borrowed_at
+                AND br.returned_at IS NULL
+          )
+    """)).rowcount
+    if set_rows + cleared_rows:
+        bump_catalogue_sync(conn)
+    return set_rows + cleared_rows
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repair", action="store_true", help="rewrite the book rows from borrowings")
+    args = parser.parse_args(argv)
+
+    with engine.begin() as conn:
+        # keep borrow/return out while comparing (and repairing) the two tables
+        conn.execute(text("LOCK TABLE books IN SHARE ROW EXCLUSIVE MODE"))
+        mismatches = find_loan_mismatches(conn)
+        for mismatch in mismatches:
+            print(mismatch)
+        print(f"{len(mismatches)} mismatched books")
+        if args.repair and mismatches:
+            print(f"repaired {repair_loans(conn)} books")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Idempotency-Key support for the write endpoints.
+
+The key is claimed as the first statement of the write transaction and the
+response is stored before it commits, so a key row exists exactly when its
+write happened. A request that fails rolls the key back with it and may be
+retried with the same key.
+
+Expired keys are reclaimed on use; purge them periodically (e.g. daily from cron):
+    python -m core.db.idempotency
+"""
+from core.config import IDEMPOTENCY_KEY_TTL_SECONDS
+from core.db.exception import ApiHTTPException
+from core.db.models.idempotency import IdempotencyKey
+from core.db.session import engine
+from dataclasses import dataclass
+from sqlalchemy import text, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Optional
+
+@dataclass(frozen=True)
+class IdempotentRequest:
+    key: str
+    request_hash: str
+
+class IdempotentReplay(Exception):
+    """Raised inside the write transaction when the key already has a stored response."""
+    def __init__(self, status_code: int, response: Any):
+        self.status_code = status_code
+        self.response = response
+
+async def claim_key(db: AsyncSession, request: Optional[IdempotentRequest]) -> None:
+    """Reserve the key for this transaction or raise IdempotentReplay with the stored response.
+
+    A concurrent request with the same key waits on the INSERT until the first
+    transaction ends: after a commit it replays the stored response, after a
+    rollback it claims the key itself.
+    """
+    if request is None:
+        return
+    while True:
+        claimed = (await db.execute(
+            text("""
+                INSERT INTO idempotency_keys (key, request_hash, expires_at)
+                VALUES (:key, :request_hash, NOW() + make_interval(secs => :ttl))
+                ON CONFLICT (key) DO UPDATE SET
+                    request_hash = EXCLUDED.request_hash, expires_at = EXCLUDED.expires_at,
+                    status_code = NULL, response = NULL, created_at = NOW()
+                WHERE idempotency_keys.expires_at <= NOW()
+                RETURNING key
+            """),
+            {"key": request.key, "request_hash": request.request_hash, "ttl": IDEMPOTENCY_KEY_TTL_SECONDS},
+        )).scalar_one_or_none()
+        if claimed is not None:
+            return
+        stored = (await db.execute(
+            text("SELECT request_hash, status_code, response FROM idempotency_keys WHERE key = :key"),
+            {"key": request.key},
+        )).mappings().one_or_none()
+        if stored is None:
+            # purged between the two statements; claim it again
+            continue
+        if stored["request_hash"] != request.request_hash:
+            raise ApiHTTPException(422, "Idempotency-Key was already used for a different request")
+        raise IdempotentReplay(stored["status_code"], stored["response"])
+
+async def store_response(
+    db: AsyncSession, request: Optional[IdempotentRequest], status_code: int, response: Any
+) -> None:
+    """Save the response for replays; call inside the transaction that claimed the key."""
+    if request is None:
+        return
+    await db.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.key == request.key)
+        .values(status_code=status_code, response=response)
+    )
+
+def purge_expired(conn: Connection) -> int:
+    return conn.execute(text("DELETE FROM idempotency_keys WHERE expires_at <= NOW()")).rowcount
+
+def main() -> None:
+    with engine.begin() as conn:
+        print(f"purged {purge_expired(conn)} expired idempotency keys")
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,16 @@
+"""Seed the library cards. Run once after migrating, not on worker startup:
+    python -m core.db.init_data
+"""
 from core.db.session import engine
 from core.db.models.books import Cards
-from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+
+CARD_IDS = ["245781", "357192", "468230", "589314", "712538", "000001"]
 
 def init_db():
-    with Session(engine) as db:
-        if db.query(Cards).count() == 0:
-            cards_data = [
-                Cards(id="245781"),
-                Cards(id="357192"),
-                Cards(id="468230"),
-                Cards(id="589314"),
-                Cards(id="712538"),
-                Cards(id="000001")
-            ]
-            db.add_all(cards_data)
-            db.commit() 
\ No newline at end of file
+    # idempotent, so concurrent or repeated runs cannot fail or duplicate cards
+    with engine.begin() as conn:
+        conn.execute(insert(Cards).values([{"id": card_id} for card_id in CARD_IDS]).on_conflict_do_nothing())
+
+if __name__ == "__main__":
+    init_db()
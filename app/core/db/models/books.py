@@ -1,23 +1,35 @@
 from core.db.base_class import Base
-from sqlalchemy import Column, CheckConstraint, ForeignKey, DateTime, Index, Integer, String, text
+from sqlalchemy import (
+    BigInteger, Column, CheckConstraint, Computed, DateTime, ForeignKey, Index, Integer, Sequence, String, text)
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred
 
 class Borrowing(Base):
+    """Loan history, range-partitioned by month of `borrowed_at` (see core.db.partitions).
+
+    The migrations also create a default partition for rows outside every month.
+
+    A unique index on a partitioned table must contain the partition key, so the
+    "one active loan per book" rule is enforced on the book row (Books.active_*).
+    """
     __tablename__ = "borrowings"
     __table_args__ = (
         CheckConstraint("returned_at IS NULL OR borrowed_at <= returned_at", name="ck_borrow_time_order"),
-        Index(
-            "ux_borrowings_book_active",
-            "book_id",
-            unique=True,
-            postgresql_where="returned_at IS NULL"  # <--- partial unique index
-        ),
+        Index("idx_borrowings_book_history", "book_id", "borrowed_at", "id"),
+        # also serves the ON DELETE RESTRICT check of cards
+        Index("idx_borrowings_card_history", "card_id", "borrowed_at", "id"),
+        Index("idx_borrowings_card_active", "card_id", postgresql_where=text("returned_at IS NULL")),
+        {"postgresql_partition_by": "RANGE (borrowed_at)"},
     )
     id = Column(Integer, primary_key=True, autoincrement=True, nullable=False)
     book_id = Column(String(6), ForeignKey("books.id", ondelete="RESTRICT", onupdate="CASCADE"), nullable=False)
     card_id = Column(String(6), ForeignKey("cards.id", ondelete="RESTRICT"), nullable=False)
-    borrowed_at = Column(DateTime, nullable=False, server_default=text("NOW()"))
+    borrowed_at = Column(DateTime, primary_key=True, nullable=False, server_default=text("NOW()"))
     returned_at = Column(DateTime, nullable=True)
 
+# per-row versions of books; the catalogue as a whole is versioned by Catalogue
+BOOK_VERSION_SEQ = Sequence("books_version_seq")
+
 class Books(Base):
     __tablename__ = "books"
     __table_args__ = (
@@ -25,16 +37,53 @@ class Books(Base):
         CheckConstraint("deleted_at IS NULL OR created_at <= deleted_at", name="ck_book_time_order"),
         Index("idx_books_title", "title"),
         Index("idx_books_author", "author"),
+        Index("idx_books_search", "search_vector", postgresql_using="gin"),
+        # live books in id order with their loan flag: the list endpoint's id/borrowed
+        # projections and the exact count run as index-only scans
+        Index("idx_books_live", "id", postgresql_include=["active_card_id"], postgresql_where=text("deleted_at IS NULL")),
+        CheckConstraint(
+            "(active_card_id IS NULL) = (active_borrowing_id IS NULL)"
+            " AND (active_card_id IS NULL) = (active_borrowed_at IS NULL)",
+            name="ck_book_active_loan",
+        ),
     )
     id = Column(String(6), primary_key=True, index=True, nullable=False)
     title  = Column(String(255), nullable=False)
     author = Column(String(100), nullable=False)
     created_at = Column(DateTime, nullable=False, server_default=text("NOW()"))
     deleted_at = Column(DateTime, nullable=True)
+    # bumped from BOOK_VERSION_SEQ by every write to the row; backs the ETags
+    version = Column(BigInteger, BOOK_VERSION_SEQ, server_default=BOOK_VERSION_SEQ.next_value(), nullable=False)
+    # the open borrowing, kept on the row so reads need no join; the history row in
+    # borrowings is (active_borrowing_id, active_borrowed_at). Not a foreign key:
+    # the open borrowings row already ties the card to the book.
+    active_card_id = Column(String(6), nullable=True)
+    active_borrowing_id = Column(Integer, nullable=True)
+    active_borrowed_at = Column(DateTime, nullable=True)
+    # 'simple' config: no stemming or stop words, titles are not in a single language
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed("to_tsvector('simple', title || ' ' || author)", persisted=True),
+        nullable=False
+    ))
 
 class Cards(Base):
     __tablename__ = "cards"
     __table_args__ = (
         CheckConstraint("length(id) = 6 AND id ~ '^[0-9]+$'", name="ck_card_number_id_format"),
     )
-    id = Column(String(6), primary_key=True, index=True, nullable=False)
\ No newline at end of file
+    id = Column(String(6), primary_key=True, index=True, nullable=False)
+
+class Catalogue(Base):
+    """Single-row version of the whole catalogue, behind the list, search and export ETags.
+
+    Every transaction that changes books bumps it (core.db.catalogue). Writers
+    wait for each other's row lock, so the values follow commit order, which
+    sequence values (Books.version) do not.
+    """
+    __tablename__ = "catalogue"
+    __table_args__ = (
+        CheckConstraint("id = 1", name="ck_catalogue_single_row"),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=False, nullable=False)
+    version = Column(BigInteger, nullable=False)
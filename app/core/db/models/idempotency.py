@@ -0,0 +1,21 @@
+from core.db.base_class import Base
+from sqlalchemy import Column, DateTime, Index, Integer, String, text
+from sqlalchemy.dialects.postgresql import JSONB
+
+class IdempotencyKey(Base):
+    """First response of a write request sent with an Idempotency-Key header (see core.db.idempotency).
+
+    The row is written in the transaction of the write itself, so it exists
+    exactly when the write was committed.
+    """
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        Index("idx_idempotency_keys_expires_at", "expires_at"),
+    )
+    key = Column(String(255), primary_key=True)
+    # method, path and body of the first request; the key may not be reused for another one
+    request_hash = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=True)
+    response = Column(JSONB, nullable=True)
+    created_at = Column(DateTime, nullable=False, server_default=text("NOW()"))
+    expires_at = Column(DateTime, nullable=False)
@@ -0,0 +1,20 @@
+from core.db.base_class import Base
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, String, text
+from sqlalchemy.dialects.postgresql import JSONB
+
+class OutboxEvent(Base):
+    """Loan event for downstream systems, written with the loan and delivered by core.outbox."""
+    __tablename__ = "outbox"
+    __table_args__ = (
+        # the dispatcher's claim query; dispatched rows drop out of the index
+        Index("idx_outbox_pending", "id", postgresql_where=text("dispatched_at IS NULL")),
+    )
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    event_type = Column(String(20), nullable=False)
+    payload = Column(JSONB, nullable=False)
+    created_at = Column(DateTime, nullable=False, server_default=text("NOW()"))
+    # not claimed before this time; pushed back after a failed delivery
+    available_at = Column(DateTime, nullable=False, server_default=text("NOW()"))
+    attempts = Column(Integer, nullable=False, server_default=text("0"))
+    last_error = Column(String(500), nullable=True)
+    dispatched_at = Column(DateTime, nullable=True)
@@ -0,0 +1,115 @@
+"""Maintenance of the monthly range partitions of `borrowings`.
+
+The API workers do no DDL. Run this once per deployment (the `migrate`
+service in docker-compose does, right after `alembic upgrade head`) and
+periodically, e.g. daily from cron, so the upcoming months always exist:
+    python -m core.db.partitions --months-ahead 3 --retain-months 24
+"""
+import argparse
+from core.config import BORROWINGS_PARTITIONS_AHEAD, BORROWINGS_RETAIN_MONTHS
+from core.db.session import engine
+from datetime import date
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from typing import List, Optional
+
+ARCHIVE_SCHEMA = "archive"
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month: date) -> str:
+    return f"borrowings_{month:%Y_%m}"
+
+def _lock(conn: Connection) -> None:
+    # a deployment run and a scheduled run may overlap; serialize them for the transaction
+    conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('borrowings_partitions'))"))
+
+def create_partition(conn: Connection, month: date) -> bool:
+    """Attach the partition for `month` unless it exists; returns whether it was created.
+
+    Rows of that month already sitting in the default partition are moved into
+    the new table first, otherwise attaching it would fail.
+    """
+    name = partition_name(month)
+    if conn.execute(text("SELECT to_regclass(:name)"), {"name": f"public.{name}"}).scalar() is not None:
+        return False
+    bounds = {"start": month, "stop": add_months(month, 1)}
+    conn.execute(text(f"CREATE TABLE {name} (LIKE borrowings INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    conn.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM borrowings_default
+            WHERE borrowed_at >= :start AND borrowed_at < :stop
+            RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """), bounds)
+    conn.execute(text(
+        f"ALTER TABLE borrowings ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{bounds['start']}') TO ('{bounds['stop']}')"
+    ))
+    return True
+
+def ensure_partitions(conn: Connection, months_ahead: int = BORROWINGS_PARTITIONS_AHEAD,
+                      since: Optional[date] = None) -> List[str]:
+    """Create the partitions from `since` (default: this month) up to `months_ahead` months ahead."""
+    _lock(conn)
+    month = month_start(since or date.today())
+    last = add_months(month_start(date.today()), months_ahead)
+    created = []
+    while month <= last:
+        if create_partition(conn, month):
+            created.append(partition_name(month))
+        month = add_months(month, 1)
+    return created
+
+def attached_partitions(conn: Connection) -> List[str]:
+    return list(conn.execute(text("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'borrowings'::regclass AND c.relname <> 'borrowings_default'
+        ORDER BY c.relname
+    """)).scalars())
+
+def archive_partitions(conn: Connection, retain_months: int = BORROWINGS_RETAIN_MONTHS) -> List[str]:
+    """Detach the partitions older than `retain_months` and move them to the archive schema.
+
+    A partition that still holds an open loan stays attached, so active loans
+    are never hidden from the API.
+    """
+    if retain_months <= 0:
+        return []
+    _lock(conn)
+    cutoff = partition_name(add_months(month_start(date.today()), -retain_months))
+    archived = []
+    for name in attached_partitions(conn):
+        if name >= cutoff:
+            break
+        if conn.execute(text(f"SELECT EXISTS (SELECT 1 FROM {name} WHERE returned_at IS NULL)")).scalar():
+            continue
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+        conn.execute(text(f"ALTER TABLE borrowings DETACH PARTITION {name}"))
+        conn.execute(text(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}"))
+        archived.append(name)
+    return archived
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--months-ahead", type=int, default=BORROWINGS_PARTITIONS_AHEAD)
+    parser.add_argument("--retain-months", type=int, default=BORROWINGS_RETAIN_MONTHS,
+                        help="archive partitions older than this many months (0 = never)")
+    args = parser.parse_args(argv)
+
+    with engine.begin() as conn:
+        for name in ensure_partitions(conn, args.months_ahead):
+            print(f"created {name}")
+    with engine.begin() as conn:
+        for name in archive_partitions(conn, args.retain_months):
+            print(f"archived {name} to {ARCHIVE_SCHEMA}.{name}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Routing of read-only sessions to replicas, with lag and failure fallback to the primary."""
+import asyncio
+from contextlib import asynccontextmanager
+from core.config import DATABASE_REPLICA_URLS, REPLICA_MAX_LAG_SECONDS, REPLICA_RETRY_SECONDS, REPLICA_TIMEOUT_SECONDS
+from core.db.session import AsyncSessionLocal, async_engine, create_api_engine
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+import time
+from typing import AsyncIterator, Dict, List, Optional
+
+LAG_CHECK_INTERVAL = 1.0
+
+# 0 when a streaming replica has replayed everything it received (an idle primary produces no
+# new transactions, so the replay timestamp alone would look like growing lag). Without a
+# streaming WAL receiver nothing new arrives, and only the age of the last replayed transaction
+# bounds the staleness. Reading pg_stat_wal_receiver.status needs pg_read_all_stats (pg_monitor);
+# without it the replica is judged by that age too.
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming')
+            THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 'Infinity')
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+class ReplicaRouter:
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replicas: List[AsyncEngine],
+        max_lag: float,
+        retry_after: float,
+        probe_timeout: float = REPLICA_TIMEOUT_SECONDS,
+    ):
+        self.primary = primary
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.retry_after = retry_after
+        self.probe_timeout = probe_timeout
+        self._next = 0
+        self._down_until: Dict[AsyncEngine, float] = {}
+        self._lag: Dict[AsyncEngine, float] = {}
+        self._lag_checked: Dict[AsyncEngine, float] = {}
+
+    def mark_down(self, replica: AsyncEngine) -> None:
+        self._down_until[replica] = time.monotonic() + self.retry_after
+
+    def is_down(self, replica: AsyncEngine) -> bool:
+        return self._down_until.get(replica, 0.0) > time.monotonic()
+
+    def lag(self, replica: AsyncEngine) -> Optional[float]:
+        return self._lag.get(replica)
+
+    async def _lag_ok(self, replica: AsyncEngine) -> bool:
+        now = time.monotonic()
+        if now - self._lag_checked.get(replica, float("-inf")) >= LAG_CHECK_INTERVAL:
+            self._lag_checked[replica] = now
+            self._lag[replica] = await asyncio.wait_for(self._probe(replica), self.probe_timeout)
+        return self._lag.get(replica, 0.0) <= self.max_lag
+
+    async def _probe(self, replica: AsyncEngine) -> float:
+        async with replica.connect() as conn:
+            return float((await conn.execute(REPLICA_LAG_SQL)).scalar_one())
+
+    async def pick(self) -> AsyncEngine:
+        """Next healthy replica in round-robin order, or the primary if there is none."""
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[self._next % len(self.replicas)]
+            self._next += 1
+            if self.is_down(replica):
+                continue
+            try:
+                if await self._lag_ok(replica):
+                    return replica
+            except (SQLAlchemyError, OSError, asyncio.TimeoutError):
+                self.mark_down(replica)
+        return self.primary
+
+    async def open_session(self, prefer_primary: bool = False) -> AsyncSession:
+        """Unlike read_session, the caller closes the session."""
+        if not prefer_primary:
+            engine = await self.pick()
+            if engine is not self.primary:
+                session = AsyncSessionLocal(bind=engine, info={"replica": True})
+                try:
+                    await session.connection()
+                    return session
+                except (SQLAlchemyError, OSError):
+                    await session.close()
+                    self.mark_down(engine)
+        return AsyncSessionLocal()
+
+    @asynccontextmanager
+    async def read_session(self, prefer_primary: bool = False) -> AsyncIterator[AsyncSession]:
+        """Session for read-only work; `db.info["replica"]` is set when it is bound to a replica."""
+        session = await self.open_session(prefer_primary)
+        async with session:
+            yield session
+
+read_router = ReplicaRouter(
+    async_engine,
+    [
+        create_api_engine(url, f"replica{i}", connect_timeout=REPLICA_TIMEOUT_SECONDS)
+        for i, url in enumerate(DATABASE_REPLICA_URLS)
+    ],
+    max_lag=REPLICA_MAX_LAG_SECONDS,
+    retry_after=REPLICA_RETRY_SECONDS,
+)
@@ -1,226 +1,595 @@
-from core.db.models.books import Books, Borrowing, Cards
+from core.cache import book_cache
+from core.changes import notify_bulk_sql, notify_sql
+from core.db.catalogue import bump_catalogue, bump_catalogue_sql
+from core.db.models.books import BOOK_VERSION_SEQ, Books, Borrowing, Catalogue
 from core.db.exception import ApiHTTPException
-from datetime import datetime, timezone
+from core.db.idempotency import IdempotentRequest, claim_key, store_response
+from core.outbox import loan_event_sql
+import base64
+import csv
+from datetime import datetime
+import io
+import json
+import re
+from pydantic import ValidationError
 from schemas.books import (
-    BookItem, BookCreateResponse200, BookCreatePayload, BookDeleteResponse200, BookDetailResponse200, BookItem, 
-    BooksListResponse200, BookUpdatePayload, BorrowCreateResponse200
+    BookBorrowingsResponse200, BookBulkItem, BookBulkResponse200, BookItem, BookCreateResponse200, BookCreatePayload, BookDeleteResponse200, BookDetailResponse200, BookItem, 
+    BookSearchResponse200, BookUpdatePayload, BorrowCreateResponse200, BorrowingItem
 )
-from sqlalchemy import func, select, text, update
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy import Integer, and_, cast, func, or_, select, text, tuple_, update
+from sqlalchemy.dialects.postgresql import REAL
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional, Tuple, Union
 
 MAX_PAGE_SIZE = 1000
+MAX_SEARCH_PAGE_SIZE = 100
+MAX_HISTORY_PAGE_SIZE = 100
+BULK_CHUNK_SIZE = 1000
+# rejected records listed in a bulk import response; the counts always cover every record
+BULK_MAX_REPORTED = 1000
+EXPORT_BATCH_SIZE = 2000
+EXPORT_COLUMNS = ("id", "title", "author", "created_at", "borrowed", "borrowCardId")
 
-def add_book(payload:BookCreatePayload, db: Session):
-    with db.begin():
-        row = db.execute(
-            text("""
-                INSERT INTO books (id, title, author)
-                VALUES (:id, :title, :author)
-                ON CONFLICT (id) DO NOTHING
-                RETURNING id
+ExportFormat = Literal["ndjson", "csv"]
+
+TotalMode = Literal["exact", "estimated", "none"]
+
+# BookItem fields GET /books can project, with the column expression each one is read from
+LIST_FIELDS = {
+    "author": Books.author,
+    "borrowed": Books.active_card_id.is_not(None),
+    # BookItem declares borrowCardId as an integer
+    "borrowCardId": cast(Books.active_card_id, Integer),
+    "created_at": Books.created_at,
+    "id": Books.id,
+    "title": Books.title,
+}
+
+async def _count_live_books(db: AsyncSession, mode: TotalMode) -> Optional[int]:
+    live_books = select(func.count()).select_from(Books).where(Books.deleted_at.is_(None))
+    if mode == "exact":
+        return (await db.execute(live_books)).scalar_one()
+    if mode == "estimated":
+        # planner row estimate for the same filter; no table scan
+        plan = (await db.execute(
+            text("EXPLAIN (FORMAT JSON) SELECT 1 FROM books WHERE deleted_at IS NULL")
+        )).scalar_one()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+    return None
+
+async def add_book(payload:BookCreatePayload, db: AsyncSession, idempotency: Optional[IdempotentRequest] = None):
+    async with db.begin():
+        await claim_key(db, idempotency)
+        row = (await db.execute(
+            text(f"""
+                WITH added AS (
+                    INSERT INTO books (id, title, author)
+                    VALUES (:id, :title, :author)
+                    ON CONFLICT (id) DO NOTHING
+                    RETURNING id, version
+                ), bumped AS ({bump_catalogue_sql("added")})
+                SELECT id, {notify_sql("added", "add", "false")} AS notified FROM added
             """),
             {"id": payload.id, "title": payload.title, "author": payload.author},
-        ).mappings().one_or_none()
+        )).mappings().one_or_none()
         if row is None:
             raise ApiHTTPException(409, "Book with given id already exists")
 
-        book_id = row["id"]
-        return BookCreateResponse200(code=200, bookId=book_id)
+        response = BookCreateResponse200(code=200, bookId=row["id"])
+        await store_response(db, idempotency, 200, response.model_dump(mode="json"))
+        return response
 
-def borrow_book(book_id: str, card_id: str, db: Session) -> BorrowCreateResponse200:
-    with db.begin():
-        book = (
-            db.query(Books)
-              .filter(Books.id == book_id, Books.deleted_at.is_(None))
-              .with_for_update()
-              .one_or_none()
-        )
+class BulkBodyError(ValueError):
+    """The body of a bulk import turned out malformed after `created` books were committed."""
+    def __init__(self, error: str, created: int):
+        super().__init__(error)
+        self.error = error
+        self.created = created
 
-        if book is None:
-            raise ApiHTTPException(404, "Book not found")
-        
-        card_exists = db.query(Cards.id).filter(Cards.id == card_id).one_or_none()
-        if card_exists is None:
-            raise ApiHTTPException(404, "Library card not found")
-        
-        row = db.execute(
-            text("""
-                INSERT INTO borrowings (book_id, card_id, borrowed_at)
-                SELECT :book_id, :card_id, NOW()
-                WHERE NOT EXISTS (
-                    SELECT 1 FROM borrowings
-                    WHERE book_id = :book_id AND returned_at IS NULL
-                )
-                RETURNING id, borrowed_at
+def _report_rejected(rejected: List[BookBulkItem], item: BookBulkItem) -> None:
+    if len(rejected) < BULK_MAX_REPORTED:
+        rejected.append(item)
+
+async def _insert_books_chunk(
+    db: AsyncSession, chunk: List[BookCreatePayload], indexes: List[int], rejected: List[BookBulkItem]
+) -> Tuple[int, int]:
+    """Insert one chunk in its own transaction; returns the (created, duplicates) counts."""
+    async with db.begin():
+        inserted = set((await db.execute(
+            text(f"""
+                WITH added AS (
+                    INSERT INTO books (id, title, author)
+                    SELECT * FROM unnest(
+                        CAST(:ids AS VARCHAR[]), CAST(:titles AS VARCHAR[]), CAST(:authors AS VARCHAR[])
+                    )
+                    ON CONFLICT (id) DO NOTHING
+                    RETURNING id, version
+                ), bumped AS ({bump_catalogue_sql("added")})
+                SELECT id, {notify_bulk_sql("added", "bulk_add")} AS notified FROM added
+            """),
+            {
+                "ids": [p.id for p in chunk],
+                "titles": [p.title for p in chunk],
+                "authors": [p.author for p in chunk],
+            },
+        )).scalars())
+
+    created = len(inserted)
+    for index, payload in zip(indexes, chunk):
+        # the first occurrence of an id within the chunk is the one that got inserted
+        if payload.id in inserted:
+            inserted.discard(payload.id)
+        else:
+            _report_rejected(rejected, BookBulkItem(index=index, id=payload.id, status="duplicate"))
+    return created, len(chunk) - created
+
+async def add_books_bulk(records: AsyncIterator[Union[str, bytes]], db: AsyncSession) -> BookBulkResponse200:
+    """Validate and insert raw JSON book records in chunks of BULK_CHUNK_SIZE.
+
+    Each chunk is one multi-row INSERT in its own transaction, so rows from
+    earlier chunks stay committed if the stream is interrupted later on; a
+    malformed body raises BulkBodyError with the number of books committed so far.
+    Only counts and the first BULK_MAX_REPORTED rejected records are kept, so
+    memory use does not grow with the size of the import.
+    """
+    rejected: List[BookBulkItem] = []
+    chunk: List[BookCreatePayload] = []
+    indexes: List[int] = []
+    index = created = duplicates = invalid = 0
+
+    try:
+        async for raw in records:
+            try:
+                payload = BookCreatePayload.model_validate_json(raw)
+            except ValidationError as e:
+                error = e.errors()[0]
+                location = ".".join(str(part) for part in error["loc"])
+                invalid += 1
+                _report_rejected(rejected, BookBulkItem(
+                    index=index,
+                    status="invalid",
+                    error=f"{location}: {error['msg']}" if location else error["msg"],
+                ))
+            else:
+                chunk.append(payload)
+                indexes.append(index)
+                if len(chunk) >= BULK_CHUNK_SIZE:
+                    counts = await _insert_books_chunk(db, chunk, indexes, rejected)
+                    created, duplicates = created + counts[0], duplicates + counts[1]
+                    chunk, indexes = [], []
+            index += 1
+    except ValueError as e:
+        raise BulkBodyError(str(e), created)
+
+    if chunk:
+        counts = await _insert_books_chunk(db, chunk, indexes, rejected)
+        created, duplicates = created + counts[0], duplicates + counts[1]
+
+    rejected.sort(key=lambda item: item.index)
+    return BookBulkResponse200(
+        code=200,
+        created=created,
+        duplicates=duplicates,
+        invalid=invalid,
+        results=rejected,
+    )
+
+async def borrow_book(
+    book_id: str, card_id: str, db: AsyncSession, idempotency: Optional[IdempotentRequest] = None
+) -> BorrowCreateResponse200:
+    async with db.begin():
+        await claim_key(db, idempotency)
+        # one statement: check the card, mark the book as lent and insert the history row.
+        # The conditional UPDATE is re-checked against the latest row version after a
+        # concurrent borrow commits, so a second loan of the same book updates nothing.
+        row = (await db.execute(
+            text(f"""
+                WITH book AS (
+                    SELECT id FROM books WHERE id = :book_id AND deleted_at IS NULL
+                ), card AS (
+                    SELECT id FROM cards WHERE id = :card_id
+                ), loan AS (
+                    UPDATE books SET
+                        active_card_id = card.id,
+                        active_borrowing_id = nextval(pg_get_serial_sequence('borrowings', 'id')),
+                        active_borrowed_at = NOW(),
+                        version = nextval('books_version_seq')
+                    FROM card
+                    WHERE books.id = :book_id AND books.deleted_at IS NULL AND books.active_card_id IS NULL
+                    RETURNING books.id, version, active_card_id, active_borrowing_id, active_borrowed_at
+                ), borrowing AS (
+                    INSERT INTO borrowings (id, book_id, card_id, borrowed_at)
+                    SELECT active_borrowing_id, id, active_card_id, active_borrowed_at FROM loan
+                ), outboxed AS ({loan_event_sql("loan", "borrow")}
+                ), bumped AS ({bump_catalogue_sql("loan")})
+                SELECT
+                    EXISTS (SELECT 1 FROM book) AS book_found,
+                    EXISTS (SELECT 1 FROM card) AS card_found,
+                    (SELECT active_borrowed_at FROM loan) AS borrowed_at,
+                    {notify_sql("loan", "borrow", "true")} AS notified
             """),
             {"book_id": book_id, "card_id": card_id},
-        ).mappings().one_or_none()
-        if row is None:
+        )).mappings().one()
+
+        if not row["book_found"]:
+            raise ApiHTTPException(404, "Book not found")
+        if not row["card_found"]:
+            raise ApiHTTPException(404, "Library card not found")
+        if row["borrowed_at"] is None:
             raise ApiHTTPException(409, "Book is already borrowed")
 
-    return BorrowCreateResponse200(
-        bookId = book_id,
-        borrowed_at = row["borrowed_at"].isoformat(),
-        cardId = card_id,
-        code = 200
+        response = BorrowCreateResponse200(
+            bookId = book_id,
+            borrowed_at = row["borrowed_at"].isoformat(),
+            cardId = card_id,
+            code = 200
+        )
+        await store_response(db, idempotency, 200, response.model_dump(mode="json"))
+
+    await book_cache.invalidate(book_id)
+    return response
+
+async def _notify_book_change(db: AsyncSession, book_id: str, op: str, previous_id: Optional[str] = None) -> None:
+    """Publish the change event of a book row written by the ORM, read back in its new state."""
+    fields = {"previousId": "CAST(:previous_id AS VARCHAR)"} if previous_id is not None else {}
+    await db.execute(
+        text(f"SELECT {notify_sql('books WHERE id = :book_id', op, 'active_card_id IS NOT NULL', **fields)}"),
+        {"book_id": book_id, "previous_id": previous_id},
     )
 
-def delete_book(book_id: str, db:Session) -> BookDeleteResponse200:
-    with db.begin():
-        result = db.execute(
+async def delete_book(book_id: str, db: AsyncSession) -> BookDeleteResponse200:
+    async with db.begin():
+        result = (await db.execute(
             update(Books)
             .where(Books.id == book_id, Books.deleted_at.is_(None))
-            .values(deleted_at=datetime.utcnow())
+            .values(deleted_at=datetime.utcnow(), version=BOOK_VERSION_SEQ.next_value())
             .returning(Books.id)
-        ).scalar_one_or_none()
+        )).scalar_one_or_none()
 
         if result is None:
             raise ApiHTTPException(404, "Book not found")
+        await _notify_book_change(db, book_id, "delete")
+        await bump_catalogue(db)
 
+    await book_cache.invalidate(book_id)
     return BookDeleteResponse200(
         code=200,
         status="Success"
     )
 
-def get_book_by_id(book_id: str, db: Session) -> BookItem:
-    query = (
+async def export_books(db: AsyncSession, fmt: ExportFormat = "ndjson") -> AsyncIterator[str]:
+    """Stream all live books with their current borrow card as NDJSON or CSV.
+
+    Rows are read through a server-side cursor, EXPORT_BATCH_SIZE at a time, and
+    each batch is encoded and yielded on its own, so memory use does not depend
+    on the catalogue size.
+    """
+    stmt = (
         select(
-            Books,
-            Borrowing.id.label("borrow_id"),
-            Borrowing.card_id.label("card_id"),
+            Books.id,
+            Books.title,
+            Books.author,
+            Books.created_at,
+            Books.active_card_id,
         )
-        .outerjoin(
-            Borrowing,
-            (Borrowing.book_id == Books.id) & (Borrowing.returned_at.is_(None)),
-        )
-        .where((Books.id == book_id) & (Books.deleted_at is not None))
+        .where(Books.deleted_at.is_(None))
+        .order_by(Books.id.asc())
     )
-    row = db.execute(query).one_or_none()
-    if row is None:
-        raise ApiHTTPException(404, "Book not found")
 
-    book, borrow_id, card_id = row
+    if fmt == "csv":
+        yield ",".join(EXPORT_COLUMNS) + "\r\n"
+
+    async with db.begin():
+        result = await db.stream(stmt, execution_options={"yield_per": EXPORT_BATCH_SIZE})
+        async for rows in result.partitions():
+            records = [
+                # borrowCardId is an integer, as in BookItem
+                (book_id, title, author, created_at.isoformat(), card_id is not None,
+                 int(card_id) if card_id is not None else None)
+                for book_id, title, author, created_at, card_id in rows
+            ]
+            if fmt == "csv":
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(records)
+                yield buffer.getvalue()
+            else:
+                yield "".join(json.dumps(dict(zip(EXPORT_COLUMNS, record))) + "\n" for record in records)
+
+def encode_history_cursor(borrowed_at: datetime, borrowing_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([borrowed_at.isoformat(), borrowing_id]).encode()).decode()
+
+def decode_history_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        borrowed_at, borrowing_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(borrowed_at), int(borrowing_id)
+    except (ValueError, TypeError):
+        raise ApiHTTPException(422, "Invalid history cursor")
+
+async def get_book_borrowings(
+    db: AsyncSession, book_id: str, size: int = 20, cursor: Optional[str] = None
+) -> BookBorrowingsResponse200:
+    """Borrowing history of one book, newest first, paginated by (borrowed_at, id) keyset.
+
+    Served by idx_borrowings_book_history on every partition; the planner merges
+    the per-partition index scans, so a page costs the same however long the history.
+    """
+    size = max(1, min(size, MAX_HISTORY_PAGE_SIZE))
+    stmt = (
+        select(Borrowing.id, Borrowing.card_id, Borrowing.borrowed_at, Borrowing.returned_at)
+        .where(Borrowing.book_id == book_id)
+        .order_by(Borrowing.borrowed_at.desc(), Borrowing.id.desc())
+        .limit(size)
+    )
+    if cursor is not None:
+        stmt = stmt.where(tuple_(Borrowing.borrowed_at, Borrowing.id) < tuple_(*decode_history_cursor(cursor)))
+
+    rows = (await db.execute(stmt)).all()
+    if not rows and cursor is None:
+        book = (await db.execute(
+            select(Books.id).where(Books.id == book_id, Books.deleted_at.is_(None))
+        )).scalar_one_or_none()
+        if book is None:
+            raise ApiHTTPException(404, "Book not found")
+
+    items = [
+        BorrowingItem(
+            id=borrowing_id,
+            cardId=card_id,
+            borrowed_at=borrowed_at.isoformat(),
+            returned_at=returned_at.isoformat() if returned_at is not None else None,
+        )
+        for borrowing_id, card_id, borrowed_at, returned_at in rows
+    ]
+    next_cursor = encode_history_cursor(rows[-1].borrowed_at, rows[-1].id) if len(rows) == size else None
+    return BookBorrowingsResponse200(code=200, bookId=book_id, items=items, next_cursor=next_cursor)
+
+async def get_book_by_id(book_id: str, db: AsyncSession) -> Tuple[BookDetailResponse200, int]:
+    """Return the book and its row version (from the cache when possible)."""
+    cached = await book_cache.get(book_id)
+    if cached is not None:
+        return BookDetailResponse200(**cached["book"]), cached["version"]
 
-    return BookDetailResponse200(
+    token = book_cache.fill_token()
+    book = (await db.execute(
+        select(Books).where(Books.id == book_id, Books.deleted_at.is_(None))
+    )).scalar_one_or_none()
+    if book is None:
+        raise ApiHTTPException(404, "Book not found")
+
+    response = BookDetailResponse200(
         author=book.author,
-        borrowed=borrow_id is not None,
-        borrowId=borrow_id,
-        cardId=card_id,
+        borrowed=book.active_card_id is not None,
+        borrowCardId=book.active_card_id,
         code = 200,
         created_at=book.created_at.isoformat(),
         id=book.id,
         title=book.title
     )
+    # a lagging replica could repopulate an entry a write has just invalidated, and the cache
+    # would then serve it for the whole TTL; only primary reads fill the cache
+    if not db.info.get("replica"):
+        await book_cache.set(book_id, {"book": response.model_dump(), "version": book.version}, token)
+    return response, book.version
 
-def list_books(db: Session, page: int = 1, size: int = 50) -> BooksListResponse200:
-    page = max(1, page)
-    size = max(1, min(size, MAX_PAGE_SIZE))
-    offset = (page - 1) * size
+async def get_book_version(book_id: str, db: AsyncSession) -> Optional[int]:
+    """Row version of a live book, or None if there is no such book; one primary key lookup."""
+    cached = await book_cache.get(book_id)
+    if cached is not None:
+        return cached["version"]
+    return (await db.execute(
+        select(Books.version).where(Books.id == book_id, Books.deleted_at.is_(None))
+    )).scalar_one_or_none()
+
+async def catalogue_version(db: AsyncSession) -> int:
+    """Version of the whole catalogue (core.db.catalogue), one primary key lookup.
+
+    Every transaction that changes a book bumps it in commit order, so this
+    changes whenever any list, search or export result can change. Read it
+    before the data it describes: an ETag older than the body only costs a refetch,
+    a newer one would let clients keep a stale body.
+    """
+    return (await db.execute(select(Catalogue.version).where(Catalogue.id == 1))).scalar_one()
+
+def _search_query(q: str) -> str:
+    """Turn free text into a prefix-matching tsquery: 'sienk pust' -> 'sienk:* & pust:*'."""
+    words = re.findall(r"\w+", q.lower())
+    if not words:
+        raise ApiHTTPException(422, "Search query must contain at least one letter or digit")
+    return " & ".join(f"{word}:*" for word in words)
 
-    total = db.execute(
-        select(func.count()).select_from(Books).where(Books.deleted_at.is_(None))
-    ).scalar_one()
+def _encode_search_cursor(rank: float, book_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([rank, book_id]).encode()).decode()
+
+def _decode_search_cursor(cursor: str) -> Tuple[float, str]:
+    try:
+        rank, book_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(rank), str(book_id)
+    except (ValueError, TypeError):
+        raise ApiHTTPException(422, "Invalid search cursor")
+
+async def search_books(
+    db: AsyncSession, q: str, size: int = 20, cursor: Optional[str] = None
+) -> BookSearchResponse200:
+    """Ranked full-text search over title and author, paginated by (rank, id) keyset."""
+    size = max(1, min(size, MAX_SEARCH_PAGE_SIZE))
+    query = func.to_tsquery("simple", _search_query(q))
+    rank = func.ts_rank(Books.search_vector, query)
 
     stmt = (
         select(
-            Books,
-            Borrowing.card_id.label("card_id"),
+            Books.id,
+            Books.title,
+            Books.author,
+            Books.created_at,
+            Books.active_card_id,
+            rank.label("rank"),
         )
-        .outerjoin(
-            Borrowing,
-            (Borrowing.book_id == Books.id) & (Borrowing.returned_at.is_(None)),
+        .where(Books.deleted_at.is_(None), Books.search_vector.op("@@")(query))
+        .order_by(rank.desc(), Books.id.asc())
+        .limit(size)
+    )
+    if cursor is not None:
+        last_rank, last_id = _decode_search_cursor(cursor)
+        last_rank = cast(last_rank, REAL)
+        stmt = stmt.where(or_(rank < last_rank, and_(rank == last_rank, Books.id > last_id)))
+
+    rows = (await db.execute(stmt)).all()
+    items = [
+        BookItem(
+            id=book_id,
+            title=title,
+            author=author,
+            created_at=created_at.isoformat(),
+            borrowed=card_id is not None,
+            borrowCardId=card_id,
         )
+        for book_id, title, author, created_at, card_id, _ in rows
+    ]
+    next_cursor = _encode_search_cursor(rows[-1].rank, rows[-1].id) if len(rows) == size else None
+
+    return BookSearchResponse200(code=200, items=items, next_cursor=next_cursor)
+
+def list_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    """Parse the comma-separated `fields` of GET /books; None selects every field.
+
+    `id` is always included (it is the cursor) and the result keeps the BookItem
+    field order, so equal projections give equal ETags.
+    """
+    if fields is None:
+        return tuple(LIST_FIELDS)
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - LIST_FIELDS.keys()
+    if unknown:
+        raise ApiHTTPException(422, f"Unknown fields: {', '.join(sorted(unknown))}")
+    requested.add("id")
+    return tuple(name for name in LIST_FIELDS if name in requested)
+
+async def list_books(
+    db: AsyncSession,
+    page: int = 1,
+    size: int = 50,
+    after: Optional[str] = None,
+    total_mode: TotalMode = "exact",
+    fields: Tuple[str, ...] = tuple(LIST_FIELDS),
+) -> Dict[str, Any]:
+    """Return a BooksListResponse200-shaped dict built straight from row tuples.
+
+    Large pages are the hot path here, so rows are not turned into ORM entities or
+    BookItem models; the endpoint encodes the dict without revalidating it. Only
+    the columns behind `fields` are selected: id with borrowed/borrowCardId is
+    answered by an index-only scan of idx_books_live.
+    """
+    page = max(1, page)
+    size = max(1, min(size, MAX_PAGE_SIZE))
+    offset = (page - 1) * size
+
+    total = await _count_live_books(db, total_mode)
+
+    stmt = (
+        select(*(LIST_FIELDS[name].label(name) for name in fields))
         .where(Books.deleted_at.is_(None))
         .order_by(Books.id.asc())
         .limit(size)
-        .offset(offset)
     )
-    rows = db.execute(stmt).all()
-    items: List[BookItem] = []
-    for book, card_id in rows:
-        items.append(
-            BookItem(
-                id=book.id,
-                title=book.title,
-                author=book.author,
-                created_at=book.created_at.isoformat(),
-                borrowed=card_id is not None,
-                borrowCardId=card_id,
-            )
-        )
+    if after is not None:
+        # keyset mode: seek on the primary key instead of skipping `offset` rows
+        stmt = stmt.where(Books.id > after)
+    else:
+        stmt = stmt.offset(offset)
+    rows = (await db.execute(stmt)).all()
+    items = [dict(zip(fields, row)) for row in rows]
 
-    total_pages = (total + size - 1) // size if size > 0 else 0
+    total_pages = (total + size - 1) // size if total is not None else None
 
-    return BooksListResponse200(
-        code = 200,
-        items=items,
-        page=page,
-        size=size,
-        total=total,
-        total_pages=total_pages        
-    )
+    return {
+        "code": 200,
+        "items": items,
+        "next_cursor": items[-1]["id"] if len(items) == size else None,
+        "page": page,
+        "size": size,
+        "total": total,
+        "total_exact": total_mode == "exact",
+        "total_pages": total_pages,
+    }
 
-def return_book(book_id: str, card_id: str, db: Session):
-    with db.begin():
-        book = (
-            db.query(Books)
-            .filter(Books.id == book_id, Books.deleted_at.is_(None))
-            .one_or_none()
-        )
-        if book is None:
-            raise ApiHTTPException(404,"Book not found")
+async def return_book(book_id: str, card_id: str, db: AsyncSession, idempotency: Optional[IdempotentRequest] = None):
+    async with db.begin():
+        await claim_key(db, idempotency)
+        # one statement: lock the book and find the card; when the book is lent to this
+        # card, clear the loan on the book row and close its history row
+        row = (await db.execute(
+            text(f"""
+                WITH book AS (
+                    SELECT id, active_card_id, active_borrowing_id, active_borrowed_at FROM books
+                    WHERE id = :book_id AND deleted_at IS NULL
+                    FOR UPDATE
+                ), card AS (
+                    SELECT id FROM cards WHERE id = :card_id
+                ), ended AS (
+                    UPDATE books SET
+                        active_card_id = NULL, active_borrowing_id = NULL, active_borrowed_at = NULL,
+                        version = nextval('books_version_seq')
+                    FROM book, card
+                    WHERE books.id = book.id AND book.active_card_id = card.id
+                    RETURNING books.id, books.version, book.active_card_id, book.active_borrowing_id, book.active_borrowed_at
+                ), returned AS (
+                    UPDATE borrowings SET returned_at = NOW()
+                    FROM ended
+                    WHERE borrowings.id = ended.active_borrowing_id AND borrowings.borrowed_at = ended.active_borrowed_at
+                    RETURNING borrowings.id
+                ), outboxed AS ({loan_event_sql("ended", "return")}
+                ), bumped AS ({bump_catalogue_sql("ended")})
+                SELECT
+                    EXISTS (SELECT 1 FROM book) AS book_found,
+                    EXISTS (SELECT 1 FROM card) AS card_found,
+                    (SELECT active_card_id FROM book) AS borrower,
+                    EXISTS (SELECT 1 FROM returned) AS returned,
+                    {notify_sql("ended", "return", "false")} AS notified
+            """),
+            {"book_id": book_id, "card_id": card_id},
+        )).mappings().one()
 
-        card = db.query(Cards).filter(Cards.id == card_id).one_or_none()
-        if card is None:
+        if not row["book_found"]:
+            raise ApiHTTPException(404,"Book not found")
+        if not row["card_found"]:
             raise ApiHTTPException(404, "Library card not found")
-        
-        borrowing = (
-            db.query(Borrowing)
-            .filter(Borrowing.book_id == book_id, Borrowing.returned_at.is_(None))
-            .with_for_update()  # block active record for update
-            .one_or_none()
-        )
-        if borrowing is None:
+        if row["borrower"] is None:
             raise ApiHTTPException(409, "Book is not borrowed")
-        
-        if borrowing.card_id != card_id:
+        if row["borrower"] != card_id:
             raise ApiHTTPException(409, "Book is borrowed by a different card")
-        
-        now = datetime.now(timezone.utc)
-        borrowing.returned_at = now
-        borrowing.returned_by = card_id
+        if not row["returned"]:
+            # the book row points at a history row that is missing or already closed;
+            # raising rolls back the cleared loan
+            raise ApiHTTPException(409, f"Borrowing record of book {book_id} is not open")
 
-        return {
+        response = {
             "code": 200,
             "status": 'Success'
         }
+        await store_response(db, idempotency, 200, response)
 
-def update_book(db: Session, book_id: int, payload: BookUpdatePayload) -> BookItem:
-    with db.begin():
-        row = (
-            db.query(Books, Borrowing.card_id)
-            .outerjoin(
-                Borrowing,
-                (Borrowing.book_id == Books.id) & (Borrowing.returned_at.is_(None))
-            )
-            .filter(Books.id == book_id, Books.deleted_at.is_(None))
-            .one_or_none()
-        )
-        if row is None:
+    await book_cache.invalidate(book_id)
+    return response
+
+async def update_book(db: AsyncSession, book_id: str, payload: BookUpdatePayload) -> BookItem:
+    async with db.begin():
+        book: Optional[Books] = (await db.execute(
+            select(Books).where(Books.id == book_id, Books.deleted_at.is_(None))
+        )).scalar_one_or_none()
+        if book is None:
             raise ApiHTTPException(404, "Book not found")
 
-        book: Books = row[0]
-        card_id: Optional[str] = row[1]
+        card_id: Optional[str] = book.active_card_id
 
         new_id = payload.id.strip() if getattr(payload, "id", None) else None
         if new_id and new_id != book_id:
-            exists = (
-                db.query(func.count())
+            exists = (await db.execute(
+                select(func.count())
                 .select_from(Books)
-                .filter(Books.id == new_id)  # use also deleted books (it must be unique)
-                .scalar()
-            )
+                .where(Books.id == new_id)  # use also deleted books (it must be unique)
+            )).scalar()
             if exists:
                 raise ApiHTTPException(409, "Book with given id already exists")
             book.id = new_id
@@ -231,9 +600,12 @@ def update_book(db: Session, book_id: int, payload: BookUpdatePayload) -> BookIt
         if getattr(payload, "title", None) is not None:
             book.title = payload.title
 
-        db.flush()
+        book.version = BOOK_VERSION_SEQ.next_value()
+        await db.flush()
+        await _notify_book_change(db, book.id, "update", previous_id=book_id if book.id != book_id else None)
+        await bump_catalogue(db)
 
-        return BookItem(
+        response = BookItem(
             author = book.author,
             borrowed = card_id is not None,
             borrowCardId = card_id,
@@ -241,4 +613,7 @@ def update_book(db: Session, book_id: int, payload: BookUpdatePayload) -> BookIt
             created_at=book.created_at.isoformat(),
             id=book.id,
             title=book.title
-        )
\ No newline at end of file
+        )
+
+    await book_cache.invalidate(book_id, response.id)
+    return response
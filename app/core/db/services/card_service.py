@@ -0,0 +1,200 @@
+from core.cache import book_cache
+from core.changes import notify_sql
+from core.db.catalogue import bump_catalogue_sql
+from core.db.exception import ApiHTTPException
+from core.outbox import loan_event_sql
+from core.db.models.books import Books, Borrowing
+from core.db.services.book_service import MAX_HISTORY_PAGE_SIZE, decode_history_cursor, encode_history_cursor
+from schemas.books import (
+    CardBatchItem, CardBatchResponse200, CardHistoryItem, CardHistoryResponse200, CardLoanItem, CardLoansResponse200
+)
+from sqlalchemy import select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional
+
+async def _check_card(db: AsyncSession, card_id: str) -> None:
+    card = (await db.execute(
+        text("SELECT id FROM cards WHERE id = :card_id"), {"card_id": card_id}
+    )).one_or_none()
+    if card is None:
+        raise ApiHTTPException(404, "Library card not found")
+
+async def _lock_books(db: AsyncSession, book_ids: List[str]) -> Dict[str, Optional[str]]:
+    """Lock the live books among `book_ids` in id order; map each to its active borrower card."""
+    rows = (await db.execute(
+        text("""
+            SELECT id, active_card_id
+            FROM books
+            WHERE id = ANY(CAST(:book_ids AS VARCHAR[])) AND deleted_at IS NULL
+            ORDER BY id
+            FOR UPDATE
+        """),
+        {"book_ids": sorted(set(book_ids))},
+    )).all()
+    return {book_id: card_id for book_id, card_id in rows}
+
+async def borrow_books(card_id: str, book_ids: List[str], db: AsyncSession) -> CardBatchResponse200:
+    """Borrow several books for one card in a single transaction.
+
+    The card is checked once, all books are locked by one statement in a fixed
+    order (so concurrent batches cannot deadlock) and all loans are inserted
+    by one statement.
+    """
+    results: List[CardBatchItem] = []
+    async with db.begin():
+        await _check_card(db, card_id)
+        books = await _lock_books(db, book_ids)
+
+        available = [book_id for book_id, borrower in books.items() if borrower is None]
+        borrowed_at = {}
+        if available:
+            rows = (await db.execute(
+                text(f"""
+                    WITH loan AS (
+                        UPDATE books SET
+                            active_card_id = :card_id,
+                            active_borrowing_id = nextval(pg_get_serial_sequence('borrowings', 'id')),
+                            active_borrowed_at = NOW(),
+                            version = nextval('books_version_seq')
+                        WHERE id = ANY(CAST(:book_ids AS VARCHAR[])) AND active_card_id IS NULL
+                        RETURNING id, version, active_card_id, active_borrowing_id, active_borrowed_at
+                    ), borrowing AS (
+                        INSERT INTO borrowings (id, book_id, card_id, borrowed_at)
+                        SELECT active_borrowing_id, id, active_card_id, active_borrowed_at FROM loan
+                    ), outboxed AS ({loan_event_sql("loan", "borrow")}
+                    ), bumped AS ({bump_catalogue_sql("loan")})
+                    SELECT id, active_borrowed_at, {notify_sql("loan", "borrow", "true")} AS notified FROM loan
+                """),
+                {"card_id": card_id, "book_ids": available},
+            )).all()
+            borrowed_at = {book_id: at.isoformat() for book_id, at, _ in rows}
+
+        for book_id in book_ids:
+            if book_id not in books:
+                results.append(CardBatchItem(bookId=book_id, code=404, error="Book not found"))
+            elif book_id in borrowed_at:
+                # a repeated id in the request reports the loan once, then as already borrowed
+                results.append(CardBatchItem(bookId=book_id, code=200, borrowed_at=borrowed_at.pop(book_id)))
+            else:
+                results.append(CardBatchItem(bookId=book_id, code=409, error="Book is already borrowed"))
+
+    await book_cache.invalidate(*(r.bookId for r in results if r.code == 200))
+    return CardBatchResponse200(code=200, cardId=card_id, results=results)
+
+async def return_books(card_id: str, book_ids: List[str], db: AsyncSession) -> CardBatchResponse200:
+    """Return several books borrowed by one card in a single transaction."""
+    results: List[CardBatchItem] = []
+    async with db.begin():
+        await _check_card(db, card_id)
+        books = await _lock_books(db, book_ids)
+
+        mine = [book_id for book_id, borrower in books.items() if borrower == card_id]
+        returned = set()
+        if mine:
+            rows = (await db.execute(
+                text(f"""
+                    WITH active AS (
+                        SELECT id, active_card_id, active_borrowing_id, active_borrowed_at FROM books
+                        WHERE id = ANY(CAST(:book_ids AS VARCHAR[])) AND active_card_id = :card_id
+                    ), ended AS (
+                        UPDATE books SET
+                            active_card_id = NULL, active_borrowing_id = NULL, active_borrowed_at = NULL,
+                            version = nextval('books_version_seq')
+                        FROM active
+                        WHERE books.id = active.id
+                        RETURNING active.id, books.version, active.active_card_id, active.active_borrowing_id,
+                                  active.active_borrowed_at
+                    ), returned AS (
+                        UPDATE borrowings SET returned_at = NOW()
+                        FROM ended
+                        WHERE borrowings.id = ended.active_borrowing_id
+                          AND borrowings.borrowed_at = ended.active_borrowed_at
+                        RETURNING borrowings.id
+                    ), outboxed AS ({loan_event_sql("ended", "return")}
+                    ), bumped AS ({bump_catalogue_sql("ended")})
+                    SELECT id, active_borrowing_id IN (SELECT id FROM returned) AS closed,
+                           {notify_sql("ended", "return", "false")} AS notified
+                    FROM ended
+                """),
+                {"card_id": card_id, "book_ids": mine},
+            )).all()
+            # like return_book: a loan is only returned together with its history row
+            for book_id, closed, _ in rows:
+                if not closed:
+                    raise ApiHTTPException(409, f"Borrowing record of book {book_id} is not open")
+            returned = {book_id for book_id, _, _ in rows}
+
+        for book_id in book_ids:
+            if book_id not in books:
+                results.append(CardBatchItem(bookId=book_id, code=404, error="Book not found"))
+            elif book_id in returned:
+                returned.discard(book_id)
+                results.append(CardBatchItem(bookId=book_id, code=200))
+            elif books[book_id] is not None and books[book_id] != card_id:
+                results.append(CardBatchItem(bookId=book_id, code=409, error="Book is borrowed by a different card"))
+            else:
+                results.append(CardBatchItem(bookId=book_id, code=409, error="Book is not borrowed"))
+
+    await book_cache.invalidate(*(r.bookId for r in results if r.code == 200))
+    return CardBatchResponse200(code=200, cardId=card_id, results=results)
+
+async def get_card_loans(db: AsyncSession, card_id: str) -> CardLoansResponse200:
+    """Books currently borrowed on a card, with titles, in one join.
+
+    Open borrowings are found through idx_borrowings_card_active, so the book rows
+    do not need an index on active_card_id.
+    """
+    rows = (await db.execute(
+        select(Borrowing.book_id, Books.title, Books.author, Borrowing.borrowed_at)
+        .join(Books, Books.id == Borrowing.book_id)
+        .where(Borrowing.card_id == card_id, Borrowing.returned_at.is_(None))
+        .order_by(Borrowing.borrowed_at.asc(), Borrowing.book_id.asc())
+    )).all()
+    if not rows:
+        await _check_card(db, card_id)
+
+    items = [
+        CardLoanItem(bookId=book_id, title=title, author=author, borrowed_at=borrowed_at.isoformat())
+        for book_id, title, author, borrowed_at in rows
+    ]
+    return CardLoansResponse200(code=200, cardId=card_id, items=items)
+
+async def get_card_history(
+    db: AsyncSession, card_id: str, size: int = 20, cursor: Optional[str] = None
+) -> CardHistoryResponse200:
+    """Borrowing history of a card, newest first, paginated by (borrowed_at, id) keyset."""
+    size = max(1, min(size, MAX_HISTORY_PAGE_SIZE))
+    stmt = (
+        select(
+            Borrowing.id,
+            Borrowing.book_id,
+            Books.title,
+            Books.author,
+            Borrowing.borrowed_at,
+            Borrowing.returned_at,
+        )
+        .join(Books, Books.id == Borrowing.book_id)
+        .where(Borrowing.card_id == card_id)
+        .order_by(Borrowing.borrowed_at.desc(), Borrowing.id.desc())
+        .limit(size)
+    )
+    if cursor is not None:
+        stmt = stmt.where(tuple_(Borrowing.borrowed_at, Borrowing.id) < tuple_(*decode_history_cursor(cursor)))
+
+    rows = (await db.execute(stmt)).all()
+    if not rows and cursor is None:
+        await _check_card(db, card_id)
+
+    items = [
+        CardHistoryItem(
+            id=borrowing_id,
+            bookId=book_id,
+            title=title,
+            author=author,
+            borrowed_at=borrowed_at.isoformat(),
+            returned_at=returned_at.isoformat() if returned_at is not None else None,
+        )
+        for borrowing_id, book_id, title, author, borrowed_at, returned_at in rows
+    ]
+    next_cursor = encode_history_cursor(rows[-1].borrowed_at, rows[-1].id) if len(rows) == size else None
+    return CardHistoryResponse200(code=200, cardId=card_id, items=items, next_cursor=next_cursor)
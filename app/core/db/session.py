@@ -1,10 +1,104 @@
-from core.config import DATABASE_URL
+from core.config import (
+    ASYNC_DATABASE_URL, DATABASE_URL, DB_IDLE_IN_TRANSACTION_TIMEOUT_MS, DB_MAX_OVERFLOW, DB_NULL_POOL,
+    DB_PGBOUNCER, DB_POOL_PRE_PING, DB_POOL_RECYCLE, DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_STATEMENT_TIMEOUT_MS,
+    DB_SYNC_POOL_SIZE
+)
+from core.metrics import TimedAsyncAdaptedQueuePool, instrument_engine
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
 
 engine = create_engine(
     DATABASE_URL,
     connect_args={'application_name': 'Library API'},
-    pool_size=10
+    pool_size=DB_SYNC_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING
 )
-SessionLocal = sessionmaker(autocommit=False, autoflush=True, bind=engine, future=True)
\ No newline at end of file
+SessionLocal = sessionmaker(autocommit=False, autoflush=True, bind=engine, future=True)
+
+def _async_engine_options() -> Dict[str, Any]:
+    server_settings = {'application_name': 'Library API'}
+    connect_args: Dict[str, Any] = {'server_settings': server_settings}
+    if DB_PGBOUNCER:
+        # transaction pooling may hand every transaction a different server connection
+        connect_args['statement_cache_size'] = 0
+        connect_args['prepared_statement_cache_size'] = 0
+        connect_args['prepared_statement_name_func'] = lambda: f"__asyncpg_{uuid4()}__"
+    else:
+        if DB_STATEMENT_TIMEOUT_MS:
+            server_settings['statement_timeout'] = str(DB_STATEMENT_TIMEOUT_MS)
+        if DB_IDLE_IN_TRANSACTION_TIMEOUT_MS:
+            server_settings['idle_in_transaction_session_timeout'] = str(DB_IDLE_IN_TRANSACTION_TIMEOUT_MS)
+
+    options: Dict[str, Any] = {'connect_args': connect_args, 'pool_pre_ping': DB_POOL_PRE_PING}
+    if DB_NULL_POOL:
+        options['poolclass'] = NullPool
+    else:
+        options.update(
+            poolclass=TimedAsyncAdaptedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+    return options
+
+# every engine created by create_api_engine, so server hooks can reach the replica pools too
+api_engines: List[AsyncEngine] = []
+
+def create_api_engine(
+    url: str, name: str, connect_timeout: Optional[float] = None, pool_size: Optional[int] = None
+) -> AsyncEngine:
+    """Create an instrumented async engine with the pool settings from core.config.
+
+    `pool_size` gives the engine a fixed pool of its own size, e.g. for a background task.
+    """
+    options = _async_engine_options()
+    if connect_timeout is not None:
+        options['connect_args']['timeout'] = connect_timeout
+    if pool_size is not None and not DB_NULL_POOL:
+        options.update(pool_size=pool_size, max_overflow=0)
+    api_engine = create_async_engine(url, **options)
+    instrument_engine(api_engine.sync_engine, name)
+    api_engines.append(api_engine)
+    return api_engine
+
+def reset_pools_after_fork() -> None:
+    """Give a forked worker process fresh, empty pools.
+
+    The connections inherited from the parent are dropped without being closed,
+    they still belong to the parent (close=False leaves their sockets alone).
+    """
+    engine.dispose(close=False)
+    for api_engine in api_engines:
+        api_engine.sync_engine.dispose(close=False)
+
+async def dispose_engines() -> None:
+    """Close the pooled connections of this process, e.g. when a worker shuts down."""
+    for api_engine in api_engines:
+        await api_engine.dispose()
+    engine.dispose()
+
+def pool_status(api_engine: AsyncEngine) -> Dict[str, Any]:
+    pool = api_engine.pool
+    if isinstance(pool, NullPool):
+        return {'pooling': False}
+    return {
+        'pooling': True,
+        'size': pool.size(),
+        'checked_in': pool.checkedin(),
+        'checked_out': pool.checkedout(),
+        'overflow': max(0, pool.overflow()),
+        'max_overflow': DB_MAX_OVERFLOW,
+        'timeout': DB_POOL_TIMEOUT,
+    }
+
+# used by the API; the sync engine above is kept for init_db and tests
+async_engine = create_api_engine(ASYNC_DATABASE_URL, "primary")
+AsyncSessionLocal = async_sessionmaker(autoflush=True, bind=async_engine, expire_on_commit=False)
@@ -0,0 +1,183 @@
+"""Per-request database instrumentation and Prometheus-format aggregates.
+
+`instrument_engine` hooks SQLAlchemy cursor and pool events; the numbers land
+in the RequestStats of the request being served (found through a context
+variable), and `finish_request` folds them into per-route totals that
+`render_prometheus` exposes.
+"""
+from collections import defaultdict
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class RequestStats:
+    __slots__ = ("started", "queries", "db_time", "pool_wait")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.pool_wait = 0.0
+
+class RouteStats:
+    __slots__ = ("count", "duration_sum", "buckets", "queries", "db_time", "pool_wait")
+
+    def __init__(self):
+        self.count = 0
+        self.duration_sum = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.queries = 0
+        self.db_time = 0.0
+        self.pool_wait = 0.0
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+_routes: Dict[Tuple[str, str], RouteStats] = defaultdict(RouteStats)
+_responses: Dict[Tuple[str, str, int], int] = defaultdict(int)
+_api_errors: Dict[int, int] = defaultdict(int)
+_pools: List[Tuple[str, Pool]] = []
+_connections_in_use: Dict[str, int] = defaultdict(int)
+
+class TimedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that charges the time spent waiting for a connection to the current request."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            stats = _current.get()
+            if stats is not None:
+                stats.pool_wait += time.perf_counter() - start
+
+def instrument_engine(engine: Engine, name: str) -> None:
+    """Count queries/DB time per request and connections in use for `engine` (a sync Engine)."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        stats = _current.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += time.perf_counter() - started
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(context):
+        # after_cursor_execute does not fire for failed statements
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+    @event.listens_for(engine.pool, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        _connections_in_use[name] += 1
+
+    @event.listens_for(engine.pool, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        _connections_in_use[name] -= 1
+
+    _pools.append((name, engine.pool))
+
+def start_request() -> RequestStats:
+    stats = RequestStats()
+    _current.set(stats)
+    return stats
+
+def current_request() -> Optional[RequestStats]:
+    return _current.get()
+
+def finish_request(method: str, route: str, status: int, stats: RequestStats) -> str:
+    """Record a finished request and return its Server-Timing header value."""
+    duration = time.perf_counter() - stats.started
+    route_stats = _routes[(method, route)]
+    route_stats.count += 1
+    route_stats.duration_sum += duration
+    for i, bound in enumerate(LATENCY_BUCKETS):
+        if duration <= bound:
+            route_stats.buckets[i] += 1
+            break
+    route_stats.queries += stats.queries
+    route_stats.db_time += stats.db_time
+    route_stats.pool_wait += stats.pool_wait
+    _responses[(method, route, status)] += 1
+
+    app_time = max(0.0, duration - stats.db_time - stats.pool_wait)
+    return ", ".join((
+        f'db;dur={stats.db_time * 1000:.2f};desc="{stats.queries} queries"',
+        f"pool;dur={stats.pool_wait * 1000:.2f}",
+        f"app;dur={app_time * 1000:.2f}",
+        f"total;dur={duration * 1000:.2f}",
+    ))
+
+def record_api_error(code: int) -> None:
+    _api_errors[code] += 1
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+def render_prometheus(extra: Optional[List[Tuple[str, str, str, Any]]] = None) -> str:
+    """Render all metrics; `extra` adds (name, type, help, value) samples from other components.
+
+    `value` is a number or a list of (labels, number) pairs.
+    """
+    lines: List[str] = []
+
+    def metric(name: str, kind: str, help_text: str) -> None:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    metric("library_http_requests_total", "counter", "Finished HTTP requests")
+    for (method, route, status), count in sorted(_responses.items()):
+        lines.append(f"library_http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+
+    metric("library_http_request_duration_seconds", "histogram", "Request latency")
+    for (method, route), stats in sorted(_routes.items()):
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+            cumulative += count
+            lines.append(
+                f"library_http_request_duration_seconds_bucket{_labels(method=method, route=route, le=bound)} {cumulative}"
+            )
+        lines.append(
+            f"library_http_request_duration_seconds_bucket{_labels(method=method, route=route, le='+Inf')} {stats.count}"
+        )
+        lines.append(f"library_http_request_duration_seconds_sum{_labels(method=method, route=route)} {stats.duration_sum:.6f}")
+        lines.append(f"library_http_request_duration_seconds_count{_labels(method=method, route=route)} {stats.count}")
+
+    for name, attr, help_text in (
+        ("library_db_queries_total", "queries", "SQL statements executed"),
+        ("library_db_time_seconds_total", "db_time", "Time spent executing SQL"),
+        ("library_db_pool_wait_seconds_total", "pool_wait", "Time spent waiting for a pool connection"),
+    ):
+        metric(name, "counter", help_text)
+        for (method, route), stats in sorted(_routes.items()):
+            lines.append(f"{name}{_labels(method=method, route=route)} {getattr(stats, attr)}")
+
+    metric("library_api_errors_total", "counter", "Responses produced by the ApiHTTPException handler")
+    for code, count in sorted(_api_errors.items()):
+        lines.append(f"library_api_errors_total{_labels(code=code)} {count}")
+
+    metric("library_db_pool_connections_in_use", "gauge", "Connections checked out of the pool")
+    for name, _ in _pools:
+        lines.append(f"library_db_pool_connections_in_use{_labels(engine=name)} {_connections_in_use[name]}")
+    metric("library_db_pool_size", "gauge", "Configured pool size (0 when pooling is disabled)")
+    for name, pool in _pools:
+        size = pool.size() if hasattr(pool, "size") else 0
+        lines.append(f"library_db_pool_size{_labels(engine=name)} {size}")
+
+    for name, kind, help_text, value in extra or ():
+        metric(name, kind, help_text)
+        if isinstance(value, list):
+            lines.extend(f"{name}{_labels(**labels)} {sample}" for labels, sample in value)
+        else:
+            lines.append(f"{name} {value}")
+
+    return "\n".join(lines) + "\n"
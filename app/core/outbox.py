@@ -0,0 +1,239 @@
+"""Transactional outbox of loan events and the background dispatcher delivering them.
+
+Borrow and return insert their event into `outbox` from the statement that
+writes the borrowing row, so an event exists exactly when the loan was
+committed and checkout never waits for downstream systems.
+
+The dispatcher claims pending events in batches (every worker may run one):
+a short transaction takes them with FOR UPDATE SKIP LOCKED and moves their
+`available_at` OUTBOX_LEASE_SECONDS ahead, which hides them from the other
+dispatchers. The sink is called with no transaction open, and a second short
+transaction marks the batch dispatched. A crash in between leaves the lease to
+run out and the batch is delivered again: delivery is at-least-once, consumers
+dedupe by `eventId`. A batch the sink rejects is retried with exponential backoff.
+
+The dispatcher uses a one-connection pool of its own, so a slow sink never
+holds a connection that requests need. It runs only where OUTBOX_SINK names a
+sink; without one, events wait in the outbox instead of being marked dispatched.
+
+Dispatched events are kept OUTBOX_RETAIN_HOURS; purge them periodically:
+    python -m core.outbox
+"""
+from abc import ABC, abstractmethod
+import asyncio
+from core.config import (
+    ASYNC_DATABASE_URL, OUTBOX_BATCH_SIZE, OUTBOX_LEASE_SECONDS, OUTBOX_POLL_INTERVAL, OUTBOX_RETAIN_HOURS,
+    OUTBOX_RETRY_MAX_DELAY, OUTBOX_SINK, OUTBOX_SINK_TIMEOUT
+)
+from core.db.models.outbox import OutboxEvent
+from core.db.session import AsyncSessionLocal, create_api_engine, engine
+import json
+import logging
+import os
+from sqlalchemy import func, literal_column, text, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+import sys
+from typing import Any, Dict, List, Optional, TextIO
+
+logger = logging.getLogger(__name__)
+
+# backoff of the dispatcher loop after an unexpected error
+ERROR_MIN_DELAY = 0.5
+ERROR_MAX_DELAY = 30.0
+
+def loan_event_sql(rows: str, event_type: str) -> str:
+    """INSERT of one loan event per row of `rows`; use it as a data-modifying CTE.
+
+    `rows` needs the book row columns id, active_card_id, active_borrowing_id and
+    active_borrowed_at (their values before a return).
+    """
+    returned_at = ", 'returnedAt', NOW()" if event_type == "return" else ""
+    return f"""
+        INSERT INTO outbox (event_type, payload)
+        SELECT '{event_type}', jsonb_build_object(
+            'borrowingId', active_borrowing_id, 'bookId', id, 'cardId', active_card_id,
+            'borrowedAt', active_borrowed_at{returned_at}
+        ) FROM {rows}
+    """
+
+class OutboxSink(ABC):
+    """Where the dispatcher delivers events. Raise to have the batch retried later."""
+
+    @abstractmethod
+    async def send(self, events: List[Dict[str, Any]]) -> None:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+class LogSink(OutboxSink):
+    """Prints every event to stdout (the container log).
+
+    Written directly rather than through `logging`, which drops records when
+    logging is not configured; a failed write fails the batch.
+    """
+
+    def __init__(self, stream: Optional[TextIO] = None):
+        self.stream = stream
+
+    async def send(self, events: List[Dict[str, Any]]) -> None:
+        stream = self.stream or sys.stdout
+        stream.write("".join(f"outbox event {json.dumps(event)}\n" for event in events))
+        stream.flush()
+
+class FileSink(OutboxSink):
+    """Appends NDJSON and fsyncs before the batch is marked dispatched; a stand-in for a broker."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _write(self, lines: str) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def send(self, events: List[Dict[str, Any]]) -> None:
+        await asyncio.to_thread(self._write, "".join(json.dumps(event) + "\n" for event in events))
+
+class QueueSink(OutboxSink):
+    """In-process asyncio queue, for consumers living in the same process (and tests)."""
+
+    def __init__(self):
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+
+    async def send(self, events: List[Dict[str, Any]]) -> None:
+        for event in events:
+            self.queue.put_nowait(event)
+
+def create_sink(spec: str) -> Optional[OutboxSink]:
+    if not spec:
+        return None
+    if spec == "log":
+        return LogSink()
+    if spec.startswith("file:"):
+        return FileSink(spec[len("file:"):])
+    raise ValueError(f"Unknown OUTBOX_SINK: {spec!r}")
+
+async def dispatch_batch(
+    db: AsyncSession, sink: OutboxSink, batch_size: int = OUTBOX_BATCH_SIZE, lease: float = OUTBOX_LEASE_SECONDS
+) -> int:
+    """Deliver one batch of pending events; returns how many were delivered."""
+    async with db.begin():
+        rows = (await db.execute(
+            text("""
+                UPDATE outbox SET available_at = NOW() + make_interval(secs => :lease), attempts = attempts + 1
+                WHERE id IN (
+                    SELECT id FROM outbox
+                    WHERE dispatched_at IS NULL AND available_at <= NOW()
+                    ORDER BY id
+                    LIMIT :batch_size
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, event_type, payload, created_at
+            """),
+            {"batch_size": batch_size, "lease": lease},
+        )).mappings().all()
+    if not rows:
+        return 0
+
+    # RETURNING does not keep the claim order
+    rows = sorted(rows, key=lambda row: row["id"])
+    ids = [row["id"] for row in rows]
+    events = [
+        {"eventId": row["id"], "type": row["event_type"], "createdAt": row["created_at"].isoformat(), **row["payload"]}
+        for row in rows
+    ]
+    try:
+        await asyncio.wait_for(sink.send(events), OUTBOX_SINK_TIMEOUT)
+    except Exception as exc:
+        logger.warning("outbox delivery of %d events failed: %r", len(ids), exc)
+        async with db.begin():
+            await db.execute(
+                update(OutboxEvent)
+                .where(OutboxEvent.id.in_(ids))
+                .values(
+                    last_error=repr(exc)[:500],
+                    available_at=func.now() + literal_column("interval '1 second'") * func.least(
+                        OUTBOX_RETRY_MAX_DELAY, func.power(2, OutboxEvent.attempts - 1)
+                    ),
+                )
+            )
+        return 0
+
+    async with db.begin():
+        await db.execute(
+            update(OutboxEvent)
+            .where(OutboxEvent.id.in_(ids))
+            .values(dispatched_at=func.now())
+        )
+    return len(ids)
+
+class OutboxDispatcher:
+    """Background task of one worker: delivers full batches back to back, polls when idle."""
+
+    def __init__(
+        self,
+        sink: OutboxSink,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        poll_interval: float = OUTBOX_POLL_INTERVAL,
+        sessions: async_sessionmaker = AsyncSessionLocal,
+    ):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.sessions = sessions
+        self.delivered = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        # a batch interrupted here is delivered again once its lease runs out
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        await self.sink.close()
+
+    async def _run(self) -> None:
+        delay = ERROR_MIN_DELAY
+        while True:
+            try:
+                async with self.sessions() as db:
+                    delivered = await dispatch_batch(db, self.sink, self.batch_size)
+            except Exception:
+                # an outage or a bug must not end the loop; the events wait in the outbox
+                logger.exception("outbox dispatcher failed, retrying in %.1fs", delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, ERROR_MAX_DELAY)
+                continue
+            delay = ERROR_MIN_DELAY
+            self.delivered += delivered
+            if delivered < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+def purge_dispatched(conn: Connection, retain_hours: int = OUTBOX_RETAIN_HOURS) -> int:
+    return conn.execute(
+        text("DELETE FROM outbox WHERE dispatched_at < NOW() - make_interval(hours => :hours)"),
+        {"hours": retain_hours},
+    ).rowcount
+
+def main() -> None:
+    with engine.begin() as conn:
+        print(f"purged {purge_dispatched(conn)} dispatched outbox events")
+
+_sink = create_sink(OUTBOX_SINK)
+outbox_dispatcher = OutboxDispatcher(
+    _sink,
+    sessions=async_sessionmaker(bind=create_api_engine(ASYNC_DATABASE_URL, "outbox", pool_size=1), expire_on_commit=False),
+) if _sink is not None else None
+
+if __name__ == "__main__":
+    main()
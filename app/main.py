@@ -1,16 +1,79 @@
-from core.db.base_class import Base
-from core.db.init_data import init_db
+from core import metrics
+from core.admission import AdmissionControl
+from core.changes import change_feed
+from core.outbox import outbox_dispatcher
 from core.db.exception import ApiHTTPException
-from core.db.session import engine
-from api.endpoints import books
+from core.db.idempotency import IdempotentReplay
+from api.deps import READ_YOUR_WRITES_COOKIE, read_your_writes_cookie
+from api.endpoints import books, cards, monitoring
+from core.config import ADMISSION_RETRY_AFTER, READ_YOUR_WRITES_SECONDS
+from core.db.routing import read_router
+from core.db.session import dispose_engines
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+import logging
+
+logger = logging.getLogger(__name__)
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
 
 app = FastAPI(title='Library API')
 app.include_router(books.router)
+app.include_router(cards.router)
+app.include_router(monitoring.router)
+# added first, so it runs inside instrument_requests and shed requests show up in the metrics
+app.add_middleware(AdmissionControl)
+
+@app.on_event("startup")
+async def startup_event() -> None:
+    # no database work here; the dispatcher only polls once the worker serves
+    if outbox_dispatcher is not None:
+        outbox_dispatcher.start()
+    else:
+        logger.warning("OUTBOX_SINK is not set, loan events stay pending in the outbox")
+    # the book cache serves entries only while this worker hears about other workers' writes
+    change_feed.listen()
+
+@app.on_event("shutdown")
+async def shutdown_event() -> None:
+    # runs after the server stopped accepting and in-flight requests finished
+    if outbox_dispatcher is not None:
+        await outbox_dispatcher.stop()
+    await change_feed.stop()
+    await dispose_engines()
+
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    stats = metrics.start_request()
+    try:
+        response = await call_next(request)
+    except Exception:
+        metrics.finish_request(request.method, _route_path(request), 500, stats)
+        raise
+    response.headers["Server-Timing"] = metrics.finish_request(
+        request.method, _route_path(request), response.status_code, stats
+    )
+    return response
+
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    response = await call_next(request)
+    # pin the client's reads to the primary until replicas have caught up with its write
+    if read_router.replicas and request.method in WRITE_METHODS and response.status_code < 400:
+        response.set_cookie(
+            READ_YOUR_WRITES_COOKIE, read_your_writes_cookie(),
+            max_age=READ_YOUR_WRITES_SECONDS, httponly=True, samesite="lax",
+        )
+    return response
+
+def _route_path(request: Request) -> str:
+    route = request.scope.get("route")
+    return route.path if route is not None else "unmatched"
 
 @app.exception_handler(ApiHTTPException)
 async def api_http_exception_handler(request: Request, exc: ApiHTTPException):
+    metrics.record_api_error(exc.code)
     content={"code": exc.code, "error": exc.error}
     response = JSONResponse(
         status_code=exc.code,
@@ -18,7 +81,20 @@ async def api_http_exception_handler(request: Request, exc: ApiHTTPException):
     )
     return response
 
-@app.on_event("startup")
-def startup_event() -> None:
-    Base.metadata.create_all(bind=engine)
-    init_db()
\ No newline at end of file
+@app.exception_handler(IdempotentReplay)
+async def idempotent_replay_handler(request: Request, exc: IdempotentReplay):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content=exc.response,
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    # no connection became free within DB_POOL_TIMEOUT; the client should back off, not see a 500
+    metrics.record_api_error(503)
+    return JSONResponse(
+        status_code=503,
+        content={"code": 503, "error": "Database is busy, retry later"},
+        headers={"Retry-After": str(ADMISSION_RETRY_AFTER)},
+    )
@@ -0,0 +1,52 @@
+from alembic import context
+from core.config import DATABASE_URL
+from core.db.base_class import Base
+import core.db.models.books  # noqa: F401 (registers the tables on Base.metadata)
+import core.db.models.idempotency  # noqa: F401
+import core.db.models.outbox  # noqa: F401
+from logging.config import fileConfig
+from sqlalchemy import create_engine
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+def include_object(obj, name, type_, reflected, compare_to):
+    # monthly partitions and their indexes are managed by core.db.partitions
+    if type_ == "table" and name.startswith("borrowings_"):
+        return False
+    return True
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def _run_migrations(connection) -> None:
+    context.configure(connection=connection, target_metadata=target_metadata, include_object=include_object)
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online() -> None:
+    # a caller running alembic.command in-process (the tests) may hand over its own connection
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run_migrations(connection)
+        return
+    connectable = create_engine(DATABASE_URL)
+    with connectable.connect() as connection:
+        _run_migrations(connection)
+    connectable.dispose()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
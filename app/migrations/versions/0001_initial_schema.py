@@ -0,0 +1,60 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 14:43:06.441245
+
+The schema the API created with Base.metadata.create_all before it moved to
+migrations. A database built that way already has it; mark it as migrated with
+`alembic stamp 0001`, then `alembic upgrade head`.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table('books',
+    sa.Column('id', sa.String(length=6), nullable=False),
+    sa.Column('title', sa.String(length=255), nullable=False),
+    sa.Column('author', sa.String(length=100), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('NOW()'), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.CheckConstraint("length(id) = 6 AND id ~ '^[0-9]+$'", name='ck_book_id_format'),
+    sa.CheckConstraint('deleted_at IS NULL OR created_at <= deleted_at', name='ck_book_time_order'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_books_author', 'books', ['author'], unique=False)
+    op.create_index('idx_books_title', 'books', ['title'], unique=False)
+    op.create_index(op.f('ix_books_id'), 'books', ['id'], unique=False)
+    op.create_table('cards',
+    sa.Column('id', sa.String(length=6), nullable=False),
+    sa.CheckConstraint("length(id) = 6 AND id ~ '^[0-9]+$'", name='ck_card_number_id_format'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_cards_id'), 'cards', ['id'], unique=False)
+    op.create_table('borrowings',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('book_id', sa.String(length=6), nullable=False),
+    sa.Column('card_id', sa.String(length=6), nullable=False),
+    sa.Column('borrowed_at', sa.DateTime(), server_default=sa.text('NOW()'), nullable=False),
+    sa.Column('returned_at', sa.DateTime(), nullable=True),
+    sa.CheckConstraint('returned_at IS NULL OR borrowed_at <= returned_at', name='ck_borrow_time_order'),
+    sa.ForeignKeyConstraint(['book_id'], ['books.id'], onupdate='CASCADE', ondelete='RESTRICT'),
+    sa.ForeignKeyConstraint(['card_id'], ['cards.id'], ondelete='RESTRICT'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ux_borrowings_book_active', 'borrowings', ['book_id'], unique=True, postgresql_where=sa.text('returned_at IS NULL'))
+
+def downgrade() -> None:
+    op.drop_index('ux_borrowings_book_active', table_name='borrowings', postgresql_where=sa.text('returned_at IS NULL'))
+    op.drop_table('borrowings')
+    op.drop_index(op.f('ix_cards_id'), table_name='cards')
+    op.drop_table('cards')
+    op.drop_index(op.f('ix_books_id'), table_name='books')
+    op.drop_index('idx_books_title', table_name='books')
+    op.drop_index('idx_books_author', table_name='books')
+    op.drop_table('books')
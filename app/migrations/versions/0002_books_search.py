@@ -0,0 +1,25 @@
+"""books search
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 16:05:12.734518
+
+Generated full-text search vector of books for GET /books/search. Adding the
+column rewrites books and computes the vector of every existing row.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('books', sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed("to_tsvector('simple', title || ' ' || author)", persisted=True), nullable=False))
+    op.create_index('idx_books_search', 'books', ['search_vector'], unique=False, postgresql_using='gin')
+
+def downgrade() -> None:
+    op.drop_index('idx_books_search', table_name='books', postgresql_using='gin')
+    op.drop_column('books', 'search_vector')
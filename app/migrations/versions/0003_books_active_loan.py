@@ -0,0 +1,38 @@
+"""books active loan
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 16:05:48.120374
+
+The open borrowing of a book, kept on the book row (Books.active_*), filled
+in from the open borrowings of existing loans. Runs before borrowings is
+partitioned, while ux_borrowings_book_active still guarantees at most one open
+borrowing per book.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('books', sa.Column('active_card_id', sa.String(length=6), nullable=True))
+    op.add_column('books', sa.Column('active_borrowing_id', sa.Integer(), nullable=True))
+    op.add_column('books', sa.Column('active_borrowed_at', sa.DateTime(), nullable=True))
+    op.execute("""
+        UPDATE books SET
+            active_card_id = borrowings.card_id,
+            active_borrowing_id = borrowings.id,
+            active_borrowed_at = borrowings.borrowed_at
+        FROM borrowings
+        WHERE borrowings.book_id = books.id AND borrowings.returned_at IS NULL
+    """)
+    op.create_check_constraint('ck_book_active_loan', 'books', '(active_card_id IS NULL) = (active_borrowing_id IS NULL) AND (active_card_id IS NULL) = (active_borrowed_at IS NULL)')
+
+def downgrade() -> None:
+    op.drop_constraint('ck_book_active_loan', 'books', type_='check')
+    op.drop_column('books', 'active_borrowed_at')
+    op.drop_column('books', 'active_borrowing_id')
+    op.drop_column('books', 'active_card_id')
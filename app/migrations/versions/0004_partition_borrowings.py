@@ -0,0 +1,83 @@
+"""partition borrowings
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 16:06:30.557902
+
+Replaces borrowings with a table range-partitioned by month of borrowed_at.
+The existing table is renamed, a monthly partition (named as core.db.partitions
+names them) is created for every month it has rows in, the rows are copied
+into the new table and the old one is dropped; ids keep coming from
+borrowings_id_seq. The new table also has a default partition for rows
+outside every month; `python -m core.db.partitions` creates the months ahead.
+
+The one-open-loan-per-book index cannot exist on the partitioned table (it
+would have to include borrowed_at); the rule lives on the book row since 0003.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+COLUMNS = "id, book_id, card_id, borrowed_at, returned_at"
+
+def _borrowings_table(*args, **kwargs) -> None:
+    op.create_table('borrowings',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('borrowings_id_seq')"), nullable=False),
+    sa.Column('book_id', sa.String(length=6), nullable=False),
+    sa.Column('card_id', sa.String(length=6), nullable=False),
+    sa.Column('borrowed_at', sa.DateTime(), server_default=sa.text('NOW()'), nullable=False),
+    sa.Column('returned_at', sa.DateTime(), nullable=True),
+    sa.CheckConstraint('returned_at IS NULL OR borrowed_at <= returned_at', name='ck_borrow_time_order'),
+    # named like the old table's: generated names would dodge those and get a suffix
+    sa.ForeignKeyConstraint(['book_id'], ['books.id'], name='borrowings_book_id_fkey', onupdate='CASCADE', ondelete='RESTRICT'),
+    sa.ForeignKeyConstraint(['card_id'], ['cards.id'], name='borrowings_card_id_fkey', ondelete='RESTRICT'),
+    *args,
+    **kwargs
+    )
+
+def _swap_in_new_table() -> None:
+    # the old table keeps its rows until they are copied; its primary key index is
+    # renamed so the new table can take the name
+    op.rename_table('borrowings', 'borrowings_old')
+    op.execute("ALTER INDEX borrowings_pkey RENAME TO borrowings_old_pkey")
+
+def _drop_old_table() -> None:
+    # the sequence belongs to the new table first, dropping the old one would drop it too
+    op.execute("ALTER SEQUENCE borrowings_id_seq OWNED BY borrowings.id")
+    op.drop_table('borrowings_old')
+
+def upgrade() -> None:
+    _swap_in_new_table()
+    _borrowings_table(sa.PrimaryKeyConstraint('id', 'borrowed_at'), postgresql_partition_by='RANGE (borrowed_at)')
+    op.execute("CREATE TABLE borrowings_default PARTITION OF borrowings DEFAULT")
+    op.execute("""
+        DO $$
+        DECLARE month date;
+        BEGIN
+            FOR month IN SELECT DISTINCT date_trunc('month', borrowed_at)::date FROM borrowings_old LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF borrowings FOR VALUES FROM (%L) TO (%L)',
+                    'borrowings_' || to_char(month, 'YYYY_MM'), month, (month + interval '1 month')::date
+                );
+            END LOOP;
+        END $$
+    """)
+    op.execute(f"INSERT INTO borrowings ({COLUMNS}) SELECT {COLUMNS} FROM borrowings_old")
+    _drop_old_table()
+    # built after the copy, once per partition
+    op.create_index('idx_borrowings_book_history', 'borrowings', ['book_id', 'borrowed_at', 'id'], unique=False)
+    op.create_index('idx_borrowings_card_active', 'borrowings', ['card_id'], unique=False, postgresql_where=sa.text('returned_at IS NULL'))
+    op.create_index('idx_borrowings_card_history', 'borrowings', ['card_id', 'borrowed_at', 'id'], unique=False)
+
+def downgrade() -> None:
+    # every partition, monthly ones included, goes back into one plain table;
+    # partitions detached into the archive schema are left where they are
+    _swap_in_new_table()
+    _borrowings_table(sa.PrimaryKeyConstraint('id'))
+    op.execute(f"INSERT INTO borrowings ({COLUMNS}) SELECT {COLUMNS} FROM borrowings_old")
+    _drop_old_table()
+    op.create_index('ux_borrowings_book_active', 'borrowings', ['book_id'], unique=True, postgresql_where=sa.text('returned_at IS NULL'))
@@ -0,0 +1,27 @@
+"""books version
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 16:07:02.981466
+
+Row version of books, bumped from books_version_seq by every write; backs the
+ETags. The column default is volatile, so adding it rewrites books and gives
+every existing row its own version.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.execute(sa.schema.CreateSequence(sa.Sequence('books_version_seq')))
+    op.add_column('books', sa.Column('version', sa.BigInteger(), server_default=sa.text("nextval('books_version_seq')"), nullable=False))
+    op.create_index('idx_books_version', 'books', ['version'], unique=False)
+
+def downgrade() -> None:
+    op.drop_index('idx_books_version', table_name='books')
+    op.drop_column('books', 'version')
+    op.execute(sa.schema.DropSequence(sa.Sequence('books_version_seq')))
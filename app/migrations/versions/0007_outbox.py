@@ -0,0 +1,34 @@
+"""outbox
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 15:41:27.902113
+
+Transactional outbox of borrow/return events, delivered by core.outbox.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table('outbox',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('event_type', sa.String(length=20), nullable=False),
+    sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('NOW()'), nullable=False),
+    sa.Column('available_at', sa.DateTime(), server_default=sa.text('NOW()'), nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default=sa.text('0'), nullable=False),
+    sa.Column('last_error', sa.String(length=500), nullable=True),
+    sa.Column('dispatched_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_outbox_pending', 'outbox', ['id'], unique=False, postgresql_where=sa.text('dispatched_at IS NULL'))
+
+def downgrade() -> None:
+    op.drop_index('idx_outbox_pending', table_name='outbox', postgresql_where=sa.text('dispatched_at IS NULL'))
+    op.drop_table('outbox')
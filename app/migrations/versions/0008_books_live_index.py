@@ -0,0 +1,21 @@
+"""books live index
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 17:02:45.318207
+
+Covering partial index of live books for index-only scans of GET /books?fields=id,borrowed.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_index('idx_books_live', 'books', ['id'], unique=False, postgresql_include=['active_card_id'], postgresql_where=sa.text('deleted_at IS NULL'))
+
+def downgrade() -> None:
+    op.drop_index('idx_books_live', table_name='books', postgresql_include=['active_card_id'], postgresql_where=sa.text('deleted_at IS NULL'))
@@ -0,0 +1,31 @@
+"""catalogue version
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 18:12:40.264813
+
+Single-row catalogue version for the list, search and export ETags (see
+core.db.catalogue), replacing max(books.version) and its index. It starts
+above every book version, so no ETag issued before can match a later one.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table('catalogue',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.CheckConstraint('id = 1', name='ck_catalogue_single_row'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("INSERT INTO catalogue (id, version) SELECT 1, COALESCE(max(version), 0) + 1 FROM books")
+    op.drop_index('idx_books_version', table_name='books')
+
+def downgrade() -> None:
+    op.create_index('idx_books_version', 'books', ['version'], unique=False)
+    op.drop_table('catalogue')
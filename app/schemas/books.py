@@ -1,9 +1,17 @@
-from pydantic import BaseModel, Field
+from pydantic import AfterValidator, BaseModel, Field
 from typing import List, Literal, Optional
 from typing_extensions import Annotated
 
 SixDigits = Annotated[str, Field(pattern=r"^\d{6}$")]
 
+def _reject_nul(value: str) -> str:
+    # Postgres text columns cannot store NUL characters
+    if "\x00" in value:
+        raise ValueError("must not contain NUL characters")
+    return value
+
+DbText = Annotated[str, AfterValidator(_reject_nul)]
+
 class Response200(BaseModel):
     code: Literal[200] = Field(
         ...,
@@ -11,6 +19,13 @@ class Response200(BaseModel):
         example=200
     )
 
+class Response400(BaseModel):
+    code: Literal[400] = Field(
+        ...,
+        description="HTTP status code indicating a malformed request",
+        example=400
+    )
+
 class Response404(BaseModel):
     code: Literal[404] = Field(
         ...,
@@ -34,21 +49,42 @@ class BookCreatePayload(BaseModel):
         description="Six-digit unique serial number of the book. Leading zeros allowed",
         example="000001"
     )
-    title: str = Field(
+    title: DbText = Field(
         ..., 
         min_length=1, 
         max_length=255, 
         description="Title of the book",
         example="W pustyni i w puszczy"
     )
-    author: str = Field(
+    author: DbText = Field(
         ..., 
         min_length=1, 
-        max_length=255, 
+        max_length=100, 
         description="Author of the book",
         example="Henryk Sienkiewicz" 
     )
 
+class BookBulkItem(BaseModel):
+    index: int = Field(..., ge=0, description="Position of the record in the request body", example=0)
+    id: Optional[str] = Field(None, description="Book id, if the record had one", example="000001")
+    status: Literal["created", "duplicate", "invalid"] = Field(..., description="Outcome for this record")
+    error: Optional[str] = Field(None, description="Validation error for invalid records")
+
+class BookBulkResponse200(Response200):
+    created: int = Field(..., ge=0, description="Number of books inserted", example=998)
+    duplicates: int = Field(..., ge=0, description="Records skipped because the id already exists", example=1)
+    invalid: int = Field(..., ge=0, description="Records rejected by validation", example=1)
+    results: List[BookBulkItem] = Field(
+        default_factory=list,
+        description="Duplicate and invalid records in request order, at most the first 1000 of them",
+    )
+
+class BookBulkResponse400(Response400):
+    error: str = Field(..., example="Request body must be a JSON array")
+    created: int = Field(
+        ..., ge=0, description="Books inserted and committed before the malformed part of the body", example=0
+    )
+
 class BookCreateResponse200(Response200):
     bookId: str = Field(
         ...,
@@ -84,21 +120,61 @@ class BookDetailResponse200(BookItem, Response200):
 class BookNotFound404(Response404):
     error: str = Field(..., example="Book not found")
 
+class BookListItem(BaseModel):
+    """BookItem narrowed by the `fields` parameter of GET /books: fields not selected are omitted."""
+    author: Optional[str] = Field(None, description="Author of the book", example="Henryk Sienkiewicz")
+    borrowed: Optional[bool] = Field(None, description="Is the book currently borrowed?")
+    borrowCardId: Optional[int] = Field(None, description="Active Card id, if borrowed")
+    created_at: Optional[str] = Field(None, description="Creation timestamp (ISO 8601)", example="2025-08-09T12:34:56+00:00")
+    id: str = Field(..., pattern=r"^\d{6}$", description="Six-digit book ID (always present)", example="000123")
+    title: Optional[str] = Field(None, description="Title of the book", example="W pustyni i w puszczy")
+
 class BooksListResponse200(Response200):
-    items: List[BookItem] = Field(default_factory=list, description="Page items")
+    items: List[BookListItem] = Field(
+        default_factory=list, description="Page items; all BookItem fields unless `fields` narrows them"
+    )
+    next_cursor: Optional[str] = Field(
+        None,
+        description="Pass as `after` to fetch the next page; null on the last page",
+        example="000050"
+    )
     page: int = Field(..., ge=1, description="Current page number", example=1)
     size: int = Field(..., ge=1, le=1000, description="Page size (max 1000)", example=50)
-    total: int = Field(..., ge=0, description="Total number of matching books", example=1234)
-    total_pages: int = Field(..., ge=0, description="Total pages", example=25)
+    total: Optional[int] = Field(
+        None, ge=0, description="Total number of matching books (null when count=none)", example=1234
+    )
+    total_exact: bool = Field(
+        True, description="False when `total`/`total_pages` are planner estimates or omitted"
+    )
+    total_pages: Optional[int] = Field(None, ge=0, description="Total pages", example=25)
+
+class BookSearchResponse200(Response200):
+    items: List[BookItem] = Field(default_factory=list, description="Matching books, best match first")
+    next_cursor: Optional[str] = Field(
+        None, description="Opaque cursor for the next page; null on the last page"
+    )
+
+class BorrowingItem(BaseModel):
+    id: int = Field(..., description="Borrowing id", example=1042)
+    cardId: str = Field(..., pattern=r"^\d{6}$", description="6-digit card id", example="000456")
+    borrowed_at: str = Field(..., description="Borrow timestamp (ISO 8601)", example="2025-08-09T12:34:56")
+    returned_at: Optional[str] = Field(None, description="Return timestamp (ISO 8601); null while borrowed")
+
+class BookBorrowingsResponse200(Response200):
+    bookId: str = Field(..., pattern=r"^\d{6}$", description="6-digit book id", example="000123")
+    items: List[BorrowingItem] = Field(default_factory=list, description="Borrowings, newest first")
+    next_cursor: Optional[str] = Field(
+        None, description="Opaque cursor for the next page; null on the last page"
+    )
 
 class BookUpdatePayload(BaseModel):
     class Config:
         extra = "forbid"
 
-    author: Optional[str] = Field(
+    author: Optional[DbText] = Field(
         None,
         min_length=1, 
-        max_length=255, 
+        max_length=100, 
         description="Author of the book",
         example="Henryk Sienkiewicz" 
     )
@@ -107,7 +183,7 @@ class BookUpdatePayload(BaseModel):
         description="Six-digit unique serial number of the book. Leading zeros allowed",
         example="000001"
     )
-    title: Optional[str] = Field(
+    title: Optional[DbText] = Field(
         None,
         min_length=1, 
         max_length=255, 
@@ -127,4 +203,50 @@ class BorrowCreateResponse200(Response200):
     borrowed_at: str = Field(..., description="Borrow timestamp (ISO 8601)", example="2025-08-09T12:34:56+00:00")
 
 class BorrowCreateResponse409(Response409):
-    error: str = Field(..., example="Book is already borrowed")
\ No newline at end of file
+    error: str = Field(..., example="Book is already borrowed")
+
+class CardBooksPayload(BaseModel):
+    class Config:
+        extra = "forbid"
+
+    bookIds: List[SixDigits] = Field(
+        ...,
+        min_length=1,
+        max_length=50,
+        description="6-digit ids of the books to process (max 50)",
+        example=["000001", "000002"]
+    )
+
+class CardBatchItem(BaseModel):
+    bookId: str = Field(..., description="6-digit book id", example="000001")
+    code: Literal[200, 404, 409] = Field(..., description="Outcome for this book, same codes as the single-book endpoint")
+    error: Optional[str] = Field(None, description="Error details for 404/409", example="Book is already borrowed")
+    borrowed_at: Optional[str] = Field(None, description="Borrow timestamp (ISO 8601), for borrowed books")
+
+class CardBatchResponse200(Response200):
+    cardId: SixDigits = Field(..., description="6-digit card id", example="000456")
+    results: List[CardBatchItem] = Field(default_factory=list, description="Per-book outcomes, in request order")
+
+class CardNotFound404(Response404):
+    error: str = Field(..., example="Library card not found")
+
+class CardLoanItem(BaseModel):
+    bookId: str = Field(..., description="6-digit book id", example="000001")
+    title: str = Field(..., description="Title of the book", example="W pustyni i w puszczy")
+    author: str = Field(..., description="Author of the book", example="Henryk Sienkiewicz")
+    borrowed_at: str = Field(..., description="Borrow timestamp (ISO 8601)", example="2025-08-09T12:34:56")
+
+class CardLoansResponse200(Response200):
+    cardId: SixDigits = Field(..., description="6-digit card id", example="000456")
+    items: List[CardLoanItem] = Field(default_factory=list, description="Books currently out, oldest loan first")
+
+class CardHistoryItem(CardLoanItem):
+    id: int = Field(..., description="Borrowing id", example=1042)
+    returned_at: Optional[str] = Field(None, description="Return timestamp (ISO 8601); null while borrowed")
+
+class CardHistoryResponse200(Response200):
+    cardId: SixDigits = Field(..., description="6-digit card id", example="000456")
+    items: List[CardHistoryItem] = Field(default_factory=list, description="Borrowings, newest first")
+    next_cursor: Optional[str] = Field(
+        None, description="Opaque cursor for the next page; null on the last page"
+    )
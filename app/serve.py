@@ -0,0 +1,59 @@
+"""Production server: a gunicorn master managing WEB_CONCURRENCY uvicorn worker processes.
+
+Run from the app directory against a migrated database:
+    python serve.py
+
+The app is imported once in the master (preload) and the workers are forked
+from it; each worker then starts with empty connection pools. On SIGTERM the
+workers stop accepting, finish their in-flight requests (up to
+SERVER_GRACEFUL_TIMEOUT seconds) and close their pools. Tune with the SERVER_*
+settings and WEB_CONCURRENCY in core.config.
+"""
+import os
+from core.config import (
+    SERVER_BACKLOG, SERVER_BIND, SERVER_GRACEFUL_TIMEOUT, SERVER_KEEPALIVE, SERVER_TIMEOUT, WEB_CONCURRENCY
+)
+from core.db.session import reset_pools_after_fork
+from gunicorn.app.base import BaseApplication
+from typing import Any, Dict, Optional
+
+WORKER_CLASS = "uvicorn_worker.UvicornWorker"
+
+def post_fork(server, worker) -> None:
+    # the engines were created by the preloaded app in the master; never share its pools
+    reset_pools_after_fork()
+
+def server_options(**overrides: Any) -> Dict[str, Any]:
+    options = {
+        "bind": SERVER_BIND,
+        "workers": WEB_CONCURRENCY,
+        "worker_class": WORKER_CLASS,
+        "preload_app": True,
+        "backlog": SERVER_BACKLOG,
+        "keepalive": SERVER_KEEPALIVE,
+        "graceful_timeout": SERVER_GRACEFUL_TIMEOUT,
+        "timeout": SERVER_TIMEOUT,
+        "post_fork": post_fork,
+        "accesslog": "-",
+    }
+    # worker heartbeats on a tmpfs; /tmp may be a slow disk in containers
+    if os.path.isdir("/dev/shm"):
+        options["worker_tmp_dir"] = "/dev/shm"
+    options.update(overrides)
+    return options
+
+class Server(BaseApplication):
+    def __init__(self, options: Optional[Dict[str, Any]] = None):
+        self.options = options if options is not None else server_options()
+        super().__init__()
+
+    def load_config(self) -> None:
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from main import app
+        return app
+
+if __name__ == "__main__":
+    Server().run()
@@ -0,0 +1,90 @@
+from core.db.models.books import Books
+from core.db.services import book_service
+from core.db.session import SessionLocal
+from fastapi.testclient import TestClient
+from main import app
+
+client = TestClient(app)
+
+def test_add_books_bulk_ndjson():
+    assert client.post("/books", json={"id": "660001", "title": "Existing", "author": "Someone"}).status_code == 200
+
+    body = "\n".join([
+        '{"id": "660002", "title": "Bulk One", "author": "Author A"}',
+        '{"id": "660001", "title": "Duplicate", "author": "Author B"}',
+        '{"id": "66x", "title": "Bad id", "author": "Author C"}',
+        '{"id": "660003", "title": "Bulk Two", "author": "Author D"}',
+        '{"id": "660003", "title": "Repeated in body", "author": "Author D"}',
+        "",
+    ])
+    response = client.post("/books/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data["created"] == 2
+    assert data["duplicates"] == 2
+    assert data["invalid"] == 1
+    # only rejected records are listed
+    assert [(r["index"], r["status"]) for r in data["results"]] == [(1, "duplicate"), (2, "invalid"), (4, "duplicate")]
+    assert data["results"][1]["error"].startswith("id")
+
+    db = SessionLocal()
+    try:
+        book = db.query(Books).filter_by(id="660003").one()
+        assert book.title == "Bulk Two"
+    finally:
+        db.close()
+
+def test_add_books_bulk_json_array():
+    payload = [
+        {"id": "660011", "title": "Array One", "author": "Author A"},
+        {"id": "660012", "title": "Array Two, with [brackets]", "author": "Author \"B\""},
+        {"id": "660013", "title": "Extra field", "author": "Author C", "isbn": "123"},
+    ]
+    response = client.post("/books/bulk", json=payload)
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data["created"] == 2
+    assert [(r["index"], r["status"]) for r in data["results"]] == [(2, "invalid")]
+    assert client.get("/books/660012").json()["title"] == "Array Two, with [brackets]"
+
+    bad = client.post("/books/bulk", json={"id": "660014"})
+    assert bad.status_code == 400
+    assert bad.json() == {"code": 400, "error": "Request body must be a JSON array", "created": 0}
+
+def test_add_books_bulk_rejects_values_the_columns_cannot_store():
+    payload = [
+        {"id": "660021", "title": "Long author", "author": "A" * 101},
+        {"id": "660022", "title": "Nul\u0000title", "author": "Author B"},
+        {"id": "660023", "title": "Fine", "author": "A" * 100},
+    ]
+    response = client.post("/books/bulk", json=payload)
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data["created"] == 1
+    assert [r["status"] for r in data["results"]] == ["invalid", "invalid"]
+    assert data["results"][0]["error"].startswith("author")
+    assert data["results"][1]["error"].startswith("title")
+
+    trailing = client.post(
+        "/books/bulk",
+        content='[{"id": "660024", "title": "Trailing", "author": "Author C"},]',
+        headers={"Content-Type": "application/json"},
+    )
+    assert trailing.status_code == 400
+
+def test_add_books_bulk_reports_rows_committed_before_a_malformed_body(monkeypatch):
+    monkeypatch.setattr(book_service, "BULK_CHUNK_SIZE", 2)
+    body = (
+        '[{"id": "660031", "title": "First", "author": "Author A"},'
+        ' {"id": "660032", "title": "Second", "author": "Author B"},'
+        ' {"id": "660033", "title": "Third", "author": "Author C"}'
+    )
+    response = client.post("/books/bulk", content=body, headers={"Content-Type": "application/json"})
+    assert response.status_code == 400
+    # the first chunk was committed before the missing "]" showed up; the rest was not
+    assert response.json() == {"code": 400, "error": "Request body must be a JSON array", "created": 2}
+    assert client.get("/books/660032").status_code == 200
+    assert client.get("/books/660033").status_code == 404
@@ -0,0 +1,115 @@
+import asyncio
+from core.admission import AdmissionControl, CardRateLimiter, ClassLimiter, loan_card
+from fastapi.testclient import TestClient
+import httpx
+from main import app
+import time
+
+client = TestClient(app)
+
+SERVICE_TIME = 0.05
+
+def _database(connections):
+    """ASGI app standing in for the API: every request holds one of `connections` for SERVICE_TIME."""
+    pool = asyncio.Semaphore(connections)
+
+    async def inner(scope, receive, send):
+        async with pool:
+            await asyncio.sleep(SERVICE_TIME)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    return inner
+
+async def _burst(asgi_app, requests):
+    async def one(http):
+        started = time.perf_counter()
+        response = await http.get("/books/")
+        return response, time.perf_counter() - started
+
+    transport = httpx.ASGITransport(app=asgi_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        return await asyncio.gather(*(one(http) for _ in range(requests)))
+
+def _limiters(concurrency, queue_depth, queue_timeout):
+    return {name: ClassLimiter(name, concurrency, queue_depth, queue_timeout, 0) for name in ("read", "write")}
+
+def test_overload_is_shed_and_tail_latency_stays_bounded():
+    async def run():
+        # 80 requests at once against 4 connections: without admission control the last waits ~1s
+        unlimited = await _burst(_database(4), 80)
+        limited_app = AdmissionControl(_database(4), limiters=_limiters(4, 4, 0.1))
+        limited = await _burst(limited_app, 80)
+        return unlimited, limited
+
+    unlimited, limited = asyncio.run(run())
+    assert max(duration for _, duration in unlimited) > 0.8
+
+    admitted = [duration for response, duration in limited if response.status_code == 200]
+    shed = [response for response, _ in limited if response.status_code == 503]
+    assert 8 <= len(admitted) < 80
+    assert len(admitted) + len(shed) == 80
+    assert all(response.headers["Retry-After"] == "1" for response in shed)
+    # queue timeout + one service time, plus scheduling slack
+    assert max(duration for _, duration in limited) < 0.5
+
+def test_card_token_bucket_limits_borrow_and_return():
+    limited_app = AdmissionControl(
+        _database(10), limiters=_limiters(10, 10, 1), card_limiter=CardRateLimiter(rate=0.01, burst=2)
+    )
+
+    async def run():
+        transport = httpx.ASGITransport(app=limited_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return [
+                (await http.post("/books/000001/borrow/245781")).status_code,
+                (await http.post("/books/000001/return/245781")).status_code,
+                (await http.post("/cards/245781/borrow")),
+                (await http.post("/books/000001/borrow/357192")).status_code,
+                (await http.get("/cards/245781/loans")).status_code,
+            ]
+
+    first, second, third, other_card, read = asyncio.run(run())
+    assert (first, second, other_card, read) == (200, 200, 200, 200)
+    assert third.status_code == 429
+    assert int(third.headers["Retry-After"]) >= 1
+
+def test_loan_card_matches_borrow_and_return_routes():
+    assert loan_card("POST", "/books/000001/borrow/245781") == "245781"
+    assert loan_card("POST", "/cards/245781/return") == "245781"
+    assert loan_card("GET", "/cards/245781/loans") is None
+    assert loan_card("POST", "/books/") is None
+
+def test_admission_stats():
+    assert client.get("/books/?size=1").status_code == 200
+    data = client.get("/admission/stats").json()
+    assert data["read"]["in_flight"] == 0
+    assert data["write"]["queued"] == 0
+    assert "library_admission_in_flight" in client.get("/metrics").text
+
+def test_total_limiter_caps_reads_and_writes_together():
+    in_flight = peak = 0
+
+    async def inner(scope, receive, send):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(SERVICE_TIME)
+        in_flight -= 1
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    limiters = _limiters(4, 20, 1)
+    limiters["total"] = ClassLimiter("total", 4, 20, 1, 0)
+
+    async def run():
+        transport = httpx.ASGITransport(app=AdmissionControl(inner, limiters=limiters))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            requests = [http.get("/books/") for _ in range(8)] + [http.post("/books/") for _ in range(8)]
+            return await asyncio.gather(*requests)
+
+    responses = asyncio.run(run())
+    assert all(response.status_code == 200 for response in responses)
+    # each class alone would admit 4, together they stay within the pool
+    assert peak == 4
+    assert all(limiter.in_flight == 0 for limiter in limiters.values())
@@ -0,0 +1,56 @@
+from core.db.partitions import archive_partitions, attached_partitions, create_partition, ensure_partitions, partition_name
+from core.db.session import engine
+from datetime import date
+from fastapi.testclient import TestClient
+from main import app
+from sqlalchemy import text
+
+client = TestClient(app)
+
+def test_book_borrowings_history():
+    payload = {"author": "Boleslaw Prus", "id": "550001", "title": "Lalka"}
+    assert client.post("/books", json=payload).status_code == 200
+
+    for card_id in ("245781", "357192", "468230"):
+        assert client.post(f"/books/550001/borrow/{card_id}").status_code == 200
+        assert client.post(f"/books/550001/borrow/{card_id}").status_code == 409
+        assert client.post(f"/books/550001/return/{card_id}").status_code == 200
+    assert client.post("/books/550001/borrow/589314").status_code == 200
+
+    first = client.get("/books/550001/borrowings?size=3").json()
+    assert [item["cardId"] for item in first["items"]] == ["589314", "468230", "357192"]
+    assert first["items"][0]["returned_at"] is None
+    assert first["items"][1]["returned_at"] is not None
+
+    second = client.get(f"/books/550001/borrowings?size=3&cursor={first['next_cursor']}").json()
+    assert [item["cardId"] for item in second["items"]] == ["245781"]
+    assert second["next_cursor"] is None
+
+    assert client.get("/books/550002/borrowings").status_code == 404
+    assert client.get("/books/550001/borrowings?cursor=xyz").status_code == 422
+
+def test_partition_maintenance():
+    payload = {"author": "Stanislaw Lem", "id": "550003", "title": "Solaris"}
+    assert client.post("/books", json=payload).status_code == 200
+    with engine.begin() as conn:
+        ensure_partitions(conn, months_ahead=1)
+        assert partition_name(date.today().replace(day=1)) in attached_partitions(conn)
+        conn.execute(text("""
+            INSERT INTO borrowings (book_id, card_id, borrowed_at, returned_at)
+            VALUES ('550003', '245781', '2001-01-10', '2001-01-20'),
+                   ('550003', '245781', '2001-02-10', NULL)
+        """))
+        # rows of a month that was in the default partition move into the new one
+        assert create_partition(conn, date(2001, 1, 1)) is True
+        assert create_partition(conn, date(2001, 2, 1)) is True
+        assert create_partition(conn, date(2001, 1, 1)) is False
+        assert conn.execute(text("SELECT count(*) FROM borrowings_2001_01")).scalar() == 1
+
+        # the partition with an open borrowing stays attached
+        archived = archive_partitions(conn, retain_months=12)
+        assert "borrowings_2001_01" in archived
+        assert "borrowings_2001_02" not in archived
+        assert conn.execute(text("SELECT count(*) FROM archive.borrowings_2001_01")).scalar() == 1
+        assert conn.execute(text(
+            "SELECT count(*) FROM borrowings WHERE book_id = '550003'"
+        )).scalar() == 1
@@ -0,0 +1,105 @@
+import asyncio
+from core.cache import LocalLRUBackend, ResponseCache, book_cache
+from core.changes import CHANNEL, ChangeFeed, change_feed, notify_sql
+from core.db.session import engine
+from fastapi.testclient import TestClient
+import json
+from main import app
+from sqlalchemy import text
+import time
+
+client = TestClient(app)
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+
+def test_book_cache_hits_and_invalidation():
+    book_id = "330001"
+    assert client.post("/books", json={"id": book_id, "title": "Cached", "author": "Cache Author"}).status_code == 200
+
+    # the lifespan starts the change feed; the cache serves only while it is connected
+    with TestClient(app) as live:
+        _wait_for(lambda: change_feed.connected)
+        hits = book_cache.hits
+        _wait_for(lambda: live.get(f"/books/{book_id}").json()["title"] == "Cached" and book_cache.hits > hits)
+
+        # a write handled by another worker only reaches this one through the feed
+        with engine.begin() as conn:
+            conn.execute(text(f"""
+                WITH changed AS (
+                    UPDATE books SET title = 'Elsewhere', version = nextval('books_version_seq')
+                    WHERE id = :id RETURNING id, version
+                )
+                SELECT {notify_sql("changed", "update", "false")}
+            """), {"id": book_id})
+        _wait_for(lambda: live.get(f"/books/{book_id}").json()["title"] == "Elsewhere")
+
+        assert live.post(f"/books/{book_id}/borrow/589314").status_code == 200
+        assert live.get(f"/books/{book_id}").json()["borrowed"] is True
+
+        assert live.put(f"/books/{book_id}", json={"title": "Renamed"}).status_code == 200
+        assert live.get(f"/books/{book_id}").json()["title"] == "Renamed"
+
+        assert live.delete(f"/books/{book_id}").status_code == 200
+        assert live.get(f"/books/{book_id}").status_code == 404
+
+        stats = live.get("/cache/stats").json()["books"]
+        assert stats["hits"] >= 1
+        assert stats["misses"] >= 1
+
+def test_local_lru_backend_evicts_and_expires():
+    backend = LocalLRUBackend(maxsize=2, ttl=60)
+
+    async def scenario():
+        await backend.set("a", {"v": 1})
+        await backend.set("b", {"v": 2})
+        assert await backend.get("a") == {"v": 1}
+        await backend.set("c", {"v": 3})  # evicts "b", the least recently used
+        assert await backend.get("b") is None
+        assert await backend.get("a") == {"v": 1}
+
+        backend.ttl = -1
+        await backend.set("d", {"v": 4})
+        assert await backend.get("d") is None
+
+    asyncio.run(scenario())
+    assert backend.evictions == 2
+
+def test_response_cache_follows_the_change_feed():
+    feed = ChangeFeed("", buffer_size=10, queue_size=10, max_subscribers=1)
+    cache = ResponseCache(LocalLRUBackend(maxsize=10, ttl=60), prefix="t:", feed=feed)
+
+    def announce(book_id, version):
+        feed._on_notify(None, 0, CHANNEL, json.dumps({"id": book_id, "version": version, "op": "update"}))
+
+    async def scenario():
+        assert cache.fill_token() is None  # not listening
+        feed.connected, feed.connections = True, 1
+        assert cache.fill_token() is None  # entries from before the connection are dropped first
+        await asyncio.sleep(0)
+        token = cache.fill_token()
+        assert token == 1
+
+        # a read that started before version 5 was announced does not store its result
+        announce("000001", 5)
+        await cache.set("000001", {"version": 4}, token)
+        assert await cache.get("000001") is None
+        await cache.set("000001", {"version": 5}, token)
+        assert await cache.get("000001") == {"version": 5}
+
+        announce("000001", 6)
+        assert await cache.get("000001") is None
+
+        # reconnected: notifications may have been missed, so nothing is trusted until cleared
+        await cache.set("000002", {"version": 1}, token)
+        feed.connections = 2
+        assert await cache.get("000002") is None
+        await cache.set("000002", {"version": 1}, token)
+        await asyncio.sleep(0)
+        assert cache.fill_token() == 2
+        assert await cache.get("000002") is None
+
+    asyncio.run(scenario())
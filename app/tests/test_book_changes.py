@@ -0,0 +1,112 @@
+import asyncio
+from core.changes import RESET_EVENT, ChangeFeed, change_feed
+from core.db.exception import ApiHTTPException
+from core.db.services import book_service
+from core.db.session import AsyncSessionLocal
+import json
+from schemas.books import BookCreatePayload, BookUpdatePayload
+
+CARD_ID = "357192"
+
+def _changes(chunks):
+    events = []
+    for chunk in chunks:
+        if chunk.startswith("id: "):
+            lines = chunk.strip().split("\n")
+            events.append((int(lines[0][4:]), json.loads(lines[2][6:])))
+    return events
+
+def test_writes_publish_change_events_on_commit():
+    async def write(action):
+        async with AsyncSessionLocal() as db:
+            await action(db)
+
+    async def run():
+        body = await change_feed.open_stream()
+        assert (await body.__anext__()).startswith("retry:")
+        await write(lambda db: book_service.add_book(
+            BookCreatePayload(id="160001", title="Eden", author="Stanislaw Lem"), db))
+        await write(lambda db: book_service.borrow_book("160001", CARD_ID, db))
+        try:
+            # rolled back: nothing is published
+            await write(lambda db: book_service.borrow_book("160001", CARD_ID, db))
+        except ApiHTTPException:
+            pass
+        await write(lambda db: book_service.return_book("160001", CARD_ID, db))
+        await write(lambda db: book_service.update_book(db, "160001", BookUpdatePayload(id="160002")))
+        await write(lambda db: book_service.delete_book("160002", db))
+        chunks = [await asyncio.wait_for(body.__anext__(), 5) for _ in range(5)]
+        await body.aclose()
+        await change_feed.stop()
+        return chunks
+
+    events = _changes(asyncio.run(run()))
+    assert [(e["op"], e["id"], e["borrowed"]) for _, e in events] == [
+        ("add", "160001", False),
+        ("borrow", "160001", True),
+        ("return", "160001", False),
+        ("update", "160002", False),
+        ("delete", "160002", False),
+    ]
+    assert events[3][1]["previousId"] == "160001"
+    versions = [version for version, _ in events]
+    assert versions == sorted(versions) and versions == [e["version"] for _, e in events]
+    assert not change_feed.subscribers
+
+def test_bulk_import_publishes_one_event_per_chunk():
+    async def records():
+        for book_id in ("160011", "160012", "160013"):
+            yield json.dumps({"id": book_id, "title": "Solaris", "author": "Stanislaw Lem"})
+
+    async def run():
+        body = await change_feed.open_stream()
+        assert (await body.__anext__()).startswith("retry:")
+        async with AsyncSessionLocal() as db:
+            result = await book_service.add_books_bulk(records(), db)
+        chunk = await asyncio.wait_for(body.__anext__(), 5)
+        await body.aclose()
+        await change_feed.stop()
+        return result, chunk
+
+    result, chunk = asyncio.run(run())
+    assert result.created == 3
+    [(version, event)] = _changes([chunk])
+    assert event == {"op": "bulk_add", "count": 3, "version": version}
+
+def _feed(**sizes):
+    options = {"buffer_size": 3, "queue_size": 10, "max_subscribers": 10}
+    options.update(sizes)
+    return ChangeFeed("postgresql://unused", **options)
+
+def _event(version):
+    return version, json.dumps({"id": "160003", "version": version, "op": "update", "borrowed": False})
+
+def test_resume_from_buffer_or_reset():
+    feed = _feed()
+    for version in (1, 2, 3, 4):
+        feed.dispatch(_event(version))
+
+    async def first_chunks(last_event_id, count):
+        body = feed._stream(last_event_id)
+        chunks = [await body.__anext__() for _ in range(count)]
+        await body.aclose()
+        return chunks
+
+    resumed = asyncio.run(first_chunks(2, 3))
+    assert [version for version, _ in _changes(resumed)] == [3, 4]
+    # event 1 fell out of the buffer
+    assert asyncio.run(first_chunks(1, 2))[1] == RESET_EVENT
+
+def test_slow_subscriber_is_disconnected():
+    feed = _feed(queue_size=2)
+
+    async def run():
+        body = feed._stream(None)
+        await body.__anext__()
+        for version in (1, 2, 3):
+            feed.dispatch(_event(version))
+        return [chunk async for chunk in body]
+
+    assert asyncio.run(run()) == []
+    assert feed.dropped == 1
+    assert not feed.subscribers
@@ -0,0 +1,57 @@
+from core.db.session import engine
+from fastapi.testclient import TestClient
+from main import app
+from sqlalchemy import text
+
+client = TestClient(app)
+
+def test_borrow_and_return_batch():
+    card_id = "468230"
+    for book_id in ("110001", "110002", "110003"):
+        payload = {"id": book_id, "title": "Batch", "author": "Batch Author"}
+        assert client.post("/books", json=payload).status_code == 200
+    assert client.post("/books/110003/borrow/245781").status_code == 200
+
+    resp = client.post(f"/cards/{card_id}/borrow", json={"bookIds": ["110002", "110001", "110003", "110999"]})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["cardId"] == card_id
+    assert [(r["bookId"], r["code"]) for r in data["results"]] == [
+        ("110002", 200), ("110001", 200), ("110003", 409), ("110999", 404)
+    ]
+    assert data["results"][0]["borrowed_at"] is not None
+    assert data["results"][2]["error"] == "Book is already borrowed"
+    assert data["results"][3]["error"] == "Book not found"
+    assert client.get("/books/110001").json()["borrowed"] is True
+
+    resp = client.post(f"/cards/{card_id}/return", json={"bookIds": ["110001", "110003", "110002", "110001"]})
+    assert resp.status_code == 200
+    assert [(r["code"], r["error"]) for r in resp.json()["results"]] == [
+        (200, None),
+        (409, "Book is borrowed by a different card"),
+        (200, None),
+        (409, "Book is not borrowed"),
+    ]
+    assert client.get("/books/110001").json()["borrowed"] is False
+
+def test_batch_card_not_found():
+    resp = client.post("/cards/000999/borrow", json={"bookIds": ["110001"]})
+    assert resp.status_code == 404
+    assert resp.json()["error"] == "Library card not found"
+
+    assert client.post("/cards/468230/borrow", json={"bookIds": []}).status_code == 422
+
+def test_return_batch_keeps_loan_without_open_borrowing():
+    card_id = "468230"
+    for book_id in ("110011", "110012"):
+        assert client.post("/books", json={"id": book_id, "title": "Batch", "author": "Batch Author"}).status_code == 200
+    assert client.post(f"/cards/{card_id}/borrow", json={"bookIds": ["110011", "110012"]}).status_code == 200
+    # the book row points at a borrowing that does not exist
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE books SET active_borrowing_id = -1 WHERE id = '110012'"))
+
+    resp = client.post(f"/cards/{card_id}/return", json={"bookIds": ["110011", "110012"]})
+    assert resp.status_code == 409
+    # the whole batch is rolled back
+    assert client.get("/books/110011").json()["borrowed"] is True
+    assert client.get("/books/110012").json()["borrowed"] is True
@@ -0,0 +1,29 @@
+from fastapi.testclient import TestClient
+from main import app
+
+client = TestClient(app)
+
+def test_card_loans_and_history():
+    card_id = "000001"
+    for book_id, title in (("120001", "Faraon"), ("120002", "Granica"), ("120003", "Chlopi")):
+        payload = {"id": book_id, "title": title, "author": "Loans Author"}
+        assert client.post("/books", json=payload).status_code == 200
+
+    assert client.get(f"/cards/{card_id}/loans").json()["items"] == []
+    for book_id in ("120001", "120002", "120003"):
+        assert client.post(f"/books/{book_id}/borrow/{card_id}").status_code == 200
+    assert client.post(f"/books/120002/return/{card_id}").status_code == 200
+
+    loans = client.get(f"/cards/{card_id}/loans").json()
+    assert [(item["bookId"], item["title"]) for item in loans["items"]] == [("120001", "Faraon"), ("120003", "Chlopi")]
+
+    first = client.get(f"/cards/{card_id}/history?size=2").json()
+    assert [item["bookId"] for item in first["items"]] == ["120003", "120002"]
+    assert first["items"][0]["returned_at"] is None
+    assert first["items"][1]["returned_at"] is not None
+    second = client.get(f"/cards/{card_id}/history?size=2&cursor={first['next_cursor']}").json()
+    assert [item["title"] for item in second["items"]] == ["Faraon"]
+    assert second["next_cursor"] is None
+
+    assert client.get("/cards/999999/loans").status_code == 404
+    assert client.get("/cards/999999/history").status_code == 404
@@ -0,0 +1,80 @@
+from core.db.catalogue import bump_catalogue_sync
+from core.db.session import engine
+from fastapi.testclient import TestClient
+from main import app
+from sqlalchemy import text
+import threading
+
+client = TestClient(app)
+
+def _revalidate(url, etag):
+    return client.get(url, headers={"If-None-Match": etag})
+
+def test_book_etag_changes_on_every_write():
+    payload = {"id": "140001", "title": "Wesele", "author": "Stanislaw Wyspianski"}
+    assert client.post("/books", json=payload).status_code == 200
+
+    first = client.get("/books/140001")
+    etag = first.headers["ETag"]
+    not_modified = _revalidate("/books/140001", etag)
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["ETag"] == etag
+
+    for write in (
+        lambda: client.post("/books/140001/borrow/245781"),
+        lambda: client.post("/books/140001/return/245781"),
+        lambda: client.put("/books/140001", json={"title": "Wesele II"}),
+    ):
+        assert write().status_code == 200
+        assert _revalidate("/books/140001", etag).status_code == 200
+        etag = client.get("/books/140001").headers["ETag"]
+
+    assert client.delete("/books/140001").status_code == 200
+    assert _revalidate("/books/140001", etag).status_code == 404
+
+def test_list_and_search_etags_follow_the_catalogue():
+    payload = {"id": "140002", "title": "Dziady", "author": "Adam Mickiewicz"}
+    assert client.post("/books", json=payload).status_code == 200
+
+    page = client.get("/books?size=5&count=none")
+    search = client.get("/books/search?q=dziady")
+    export = client.get("/books/export")
+    assert _revalidate("/books?size=5&count=none", page.headers["ETag"]).status_code == 304
+    assert _revalidate("/books/search?q=dziady", search.headers["ETag"]).status_code == 304
+    assert _revalidate("/books/export", export.headers["ETag"]).status_code == 304
+    # other query parameters are a different resource
+    assert _revalidate("/books?size=6&count=none", page.headers["ETag"]).status_code == 200
+
+    assert client.post("/books/140002/borrow/245781").status_code == 200
+    assert _revalidate("/books?size=5&count=none", page.headers["ETag"]).status_code == 200
+    assert _revalidate("/books/search?q=dziady", search.headers["ETag"]).status_code == 200
+    assert _revalidate("/books/export", export.headers["ETag"]).status_code == 200
+
+def test_catalogue_etag_follows_commit_order():
+    for book_id in ("140011", "140012"):
+        assert client.post("/books", json={"id": book_id, "title": "Nad Niemnem", "author": "Eliza Orzeszkowa"}).status_code == 200
+    url = "/books?after=140010&size=2&count=none"
+    etag = client.get(url).headers["ETag"]
+
+    fast_writer = threading.Thread(
+        target=lambda: TestClient(app).put("/books/140012", json={"title": "Fast writer"})
+    )
+    with engine.connect() as slow_writer:
+        # a write that has taken its book version but not committed yet
+        slow_writer.execute(text(
+            "UPDATE books SET title = 'Slow writer', version = nextval('books_version_seq') WHERE id = '140011'"
+        ))
+        bump_catalogue_sync(slow_writer)
+        fast_writer.start()
+        fast_writer.join(1)
+        # the later write cannot commit first, so the catalogue version cannot skip the slow one
+        assert fast_writer.is_alive()
+        assert _revalidate(url, etag).status_code == 304
+        slow_writer.commit()
+    fast_writer.join(10)
+
+    after = _revalidate(url, etag)
+    assert after.status_code == 200
+    assert [item["title"] for item in after.json()["items"]] == ["Slow writer", "Fast writer"]
+    assert _revalidate(url, after.headers["ETag"]).status_code == 304
@@ -0,0 +1,39 @@
+import csv
+import io
+import json
+from fastapi.testclient import TestClient
+from main import app
+
+client = TestClient(app)
+
+def test_export_books_ndjson():
+    book_id = "440001"
+    assert client.post("/books", json={"id": book_id, "title": "Exported", "author": "Export Author"}).status_code == 200
+    assert client.post(f"/books/{book_id}/borrow/245781").status_code == 200
+
+    response = client.get("/books/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    found = next(row for row in rows if row["id"] == book_id)
+    assert found["title"] == "Exported"
+    assert found["borrowed"] is True
+    assert found["borrowCardId"] == 245781
+    assert [row["id"] for row in rows] == sorted(row["id"] for row in rows)
+
+def test_export_books_csv():
+    book_id = "440002"
+    assert client.post("/books", json={"id": book_id, "title": "Comma, in title", "author": "Export Author"}).status_code == 200
+
+    response = client.get("/books/export?format=csv")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    found = next(row for row in rows if row["id"] == book_id)
+    assert found["title"] == "Comma, in title"
+    assert found["borrowed"] == "False"
+    assert found["borrowCardId"] == ""
+
+    assert client.get("/books/export?format=xml").status_code == 422
@@ -1,5 +1,6 @@
 from fastapi.testclient import TestClient
 from main import app
+from schemas.books import BooksListResponse200
 
 client = TestClient(app)
 
@@ -29,4 +30,75 @@ def test_get_books_list():
     found = next((b for b in items if b["id"] == book_id), None)
     assert found is not None
     assert found["title"] == title
-    assert found["author"] == author
\ No newline at end of file
+    assert found["author"] == author
+
+def test_get_books_cursor():
+    for book_id in ("880001", "880002", "880003"):
+        payload = {"author": "Cursor Author", "id": book_id, "title": "Cursor Book"}
+        assert client.post("/books", json=payload).status_code == 200
+
+    resp = client.get("/books/?size=2&after=880000")
+    assert resp.status_code == 200
+    data = resp.json()
+    assert [b["id"] for b in data["items"]] == ["880001", "880002"]
+    assert data["next_cursor"] == "880002"
+
+    resp = client.get(f"/books/?size=2&after={data['next_cursor']}")
+    assert resp.status_code == 200
+    assert resp.json()["items"][0]["id"] == "880003"
+
+    bad = client.get("/books/?after=abc")
+    assert bad.status_code == 422
+
+
+def test_get_books_count_modes():
+    exact = client.get("/books/?size=10").json()
+    assert exact["total_exact"] is True
+    assert exact["total"] >= 1
+
+    estimated = client.get("/books/?size=10&count=estimated").json()
+    assert estimated["total_exact"] is False
+    assert estimated["total"] >= 0
+
+    skipped = client.get("/books/?size=10&count=none").json()
+    assert skipped["total"] is None
+    assert skipped["total_pages"] is None
+    assert skipped["total_exact"] is False
+
+
+def test_get_books_matches_schema():
+    book_id = "880010"
+    payload = {"author": "Schema Author", "id": book_id, "title": "Schema Book"}
+    assert client.post("/books", json=payload).status_code == 200
+    assert client.post(f"/books/{book_id}/borrow/245781").status_code == 200
+
+    resp = client.get("/books/?size=1&after=880009")
+    data = BooksListResponse200.model_validate(resp.json())
+    assert data.items[0].id == book_id
+    assert data.items[0].borrowed is True
+    assert data.items[0].borrowCardId == 245781
+    assert resp.json()["items"][0]["created_at"] == client.get(f"/books/{book_id}").json()["created_at"]
+
+
+def test_get_books_fields():
+    for book_id in ("880020", "880021"):
+        payload = {"author": "Fields Author", "id": book_id, "title": "Fields Book"}
+        assert client.post("/books", json=payload).status_code == 200
+    assert client.post("/books/880021/borrow/245781").status_code == 200
+
+    resp = client.get("/books/?size=2&after=880019&fields=borrowed")
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["items"] == [{"borrowed": False, "id": "880020"}, {"borrowed": True, "id": "880021"}]
+    assert data["next_cursor"] == "880021"
+    # the documented response model covers projected items too
+    assert BooksListResponse200.model_validate(data).items[1].borrowed is True
+
+    resp = client.get("/books/?size=1&after=880020&fields=title, borrowCardId")
+    assert resp.json()["items"] == [{"borrowCardId": 245781, "id": "880021", "title": "Fields Book"}]
+
+    full = client.get("/books/?size=1&after=880020")
+    assert full.headers["ETag"] != resp.headers["ETag"]
+
+    bad = client.get("/books/?fields=id,isbn")
+    assert bad.status_code == 422
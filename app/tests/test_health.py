@@ -0,0 +1,22 @@
+from core.config import derive_pool_size
+from fastapi.testclient import TestClient
+from main import app
+
+client = TestClient(app)
+
+def test_health():
+    resp = client.get("/health")
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["status"] == "ok"
+    assert data["databases"]["primary"]["reachable"] is True
+    assert "pooling" in data["databases"]["primary"]["pool"]
+
+def test_derive_pool_size():
+    assert derive_pool_size(max_connections=0, workers=4, explicit=0) == 10
+    assert derive_pool_size(max_connections=100, workers=4, explicit=0) == 25
+    assert derive_pool_size(max_connections=3, workers=8, explicit=0) == 1
+    assert derive_pool_size(max_connections=100, workers=4, explicit=7) == 7
+    # the LISTEN connection and the outbox dispatcher come out of every worker's share
+    assert derive_pool_size(max_connections=100, workers=4, explicit=0, reserved=2) == 23
+    assert derive_pool_size(max_connections=100, workers=4, explicit=7, reserved=2) == 7
@@ -0,0 +1,88 @@
+import asyncio
+from core.db.idempotency import IdempotentReplay, IdempotentRequest, purge_expired
+from core.db.services import book_service
+from core.db.session import AsyncSessionLocal, SessionLocal, engine
+from fastapi.testclient import TestClient
+from main import app
+from sqlalchemy import text
+
+client = TestClient(app)
+
+CARD_ID = "357192"
+
+def _add_book(book_id):
+    response = client.post("/books", json={"id": book_id, "title": "Solaris", "author": "Stanislaw Lem"})
+    assert response.status_code == 200
+
+def _borrowings(book_id):
+    with SessionLocal() as db:
+        return db.execute(text("SELECT count(*) FROM borrowings WHERE book_id = :id"), {"id": book_id}).scalar()
+
+def test_retried_writes_replay_the_first_response():
+    book_id = "150001"
+    payload = {"id": book_id, "title": "Solaris", "author": "Stanislaw Lem"}
+    first = client.post("/books", json=payload, headers={"Idempotency-Key": "test-150001-add"})
+    retry = client.post("/books", json=payload, headers={"Idempotency-Key": "test-150001-add"})
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+
+    headers = {"Idempotency-Key": "test-150001-borrow"}
+    first = client.post(f"/books/{book_id}/borrow/{CARD_ID}", headers=headers)
+    retry = client.post(f"/books/{book_id}/borrow/{CARD_ID}", headers=headers)
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json()
+    assert _borrowings(book_id) == 1
+    # without a key the same request is a new borrow attempt
+    assert client.post(f"/books/{book_id}/borrow/{CARD_ID}").status_code == 409
+
+    headers = {"Idempotency-Key": "test-150001-return"}
+    assert client.post(f"/books/{book_id}/return/{CARD_ID}", headers=headers).status_code == 200
+    retry = client.post(f"/books/{book_id}/return/{CARD_ID}", headers=headers)
+    assert retry.status_code == 200
+    assert retry.json() == {"code": 200, "status": "Success"}
+
+def test_key_reused_for_another_request_is_rejected():
+    _add_book("150002")
+    headers = {"Idempotency-Key": "test-150002"}
+    assert client.post(f"/books/150002/borrow/{CARD_ID}", headers=headers).status_code == 200
+    response = client.post(f"/books/150002/return/{CARD_ID}", headers=headers)
+    assert response.status_code == 422
+    assert "Idempotency-Key" in response.json()["error"]
+
+def test_failed_request_leaves_no_key_behind():
+    _add_book("150003")
+    headers = {"Idempotency-Key": "test-150003"}
+    assert client.post("/books/150003/borrow/999999", headers=headers).status_code == 404
+    with SessionLocal() as db:
+        assert db.execute(text("SELECT count(*) FROM idempotency_keys WHERE key = 'test-150003'")).scalar() == 0
+
+def test_concurrent_duplicates_wait_for_the_first():
+    _add_book("150004")
+    request = IdempotentRequest("test-150004", "same-request")
+
+    async def borrow():
+        async with AsyncSessionLocal() as db:
+            try:
+                return await book_service.borrow_book("150004", CARD_ID, db, request)
+            except IdempotentReplay as replay:
+                return replay
+
+    async def run():
+        return await asyncio.gather(*(borrow() for _ in range(4)))
+
+    results = asyncio.run(run())
+    replays = [r for r in results if isinstance(r, IdempotentReplay)]
+    assert len(replays) == 3
+    first = next(r for r in results if not isinstance(r, IdempotentReplay))
+    assert all(r.status_code == 200 and r.response == first.model_dump(mode="json") for r in replays)
+    assert _borrowings("150004") == 1
+
+def test_expired_keys_are_purged():
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO idempotency_keys (key, request_hash, status_code, response, expires_at)
+            VALUES ('test-expired', 'x', 200, '{}', NOW() - interval '1 second')
+        """))
+        assert purge_expired(conn) >= 1
+        assert conn.execute(text("SELECT count(*) FROM idempotency_keys WHERE key = 'test-expired'")).scalar() == 0
@@ -0,0 +1,35 @@
+from core.db.consistency import find_loan_mismatches, repair_loans
+from core.db.session import engine
+from fastapi.testclient import TestClient
+from main import app
+from sqlalchemy import text
+
+client = TestClient(app)
+
+def _mismatched_ids(conn):
+    return {row["book_id"] for row in find_loan_mismatches(conn)}
+
+def test_loan_consistency_check_and_repair():
+    for book_id in ("130001", "130002"):
+        payload = {"id": book_id, "title": "Consistency", "author": "Check Author"}
+        assert client.post("/books", json=payload).status_code == 200
+    assert client.post("/books/130001/borrow/245781").status_code == 200
+    assert client.post("/books/130002/borrow/357192").status_code == 200
+    assert client.post("/books/130002/return/357192").status_code == 200
+
+    with engine.begin() as conn:
+        assert not _mismatched_ids(conn) & {"130001", "130002"}
+        conn.execute(text("""
+            UPDATE books SET active_card_id = NULL, active_borrowing_id = NULL, active_borrowed_at = NULL
+            WHERE id = '130001'
+        """))
+        conn.execute(text("""
+            UPDATE books SET active_card_id = '468230', active_borrowing_id = -1, active_borrowed_at = NOW()
+            WHERE id = '130002'
+        """))
+        assert {"130001", "130002"} <= _mismatched_ids(conn)
+        assert repair_loans(conn) >= 2
+        assert not _mismatched_ids(conn) & {"130001", "130002"}
+
+    assert client.get("/books/130001").json()["borrowCardId"] == 245781
+    assert client.get("/books/130002").json()["borrowed"] is False
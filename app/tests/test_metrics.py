@@ -0,0 +1,24 @@
+from fastapi.testclient import TestClient
+from main import app
+
+client = TestClient(app)
+
+def test_server_timing_and_metrics():
+    book_id = "770001"
+    assert client.post("/books", json={"id": book_id, "title": "Timed", "author": "Metrics"}).status_code == 200
+
+    resp = client.get("/books/?size=5")
+    assert resp.status_code == 200
+    timing = resp.headers["Server-Timing"]
+    assert 'db;dur=' in timing
+    assert 'desc="3 queries"' in timing  # catalogue version, count, page
+    assert "total;dur=" in timing
+
+    assert client.get("/books/770999").status_code == 404
+
+    body = client.get("/metrics").text
+    assert 'library_http_requests_total{method="GET",route="/books/",status="200"}' in body
+    assert 'library_http_request_duration_seconds_count{method="GET",route="/books/{book_id}"}' in body
+    assert 'library_api_errors_total{code="404"}' in body
+    assert 'library_db_queries_total{method="GET",route="/books/"}' in body
+    assert "library_db_pool_connections_in_use" in body
@@ -0,0 +1,89 @@
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from contextlib import contextmanager
+from core.db.base_class import Base
+from core.db.session import engine
+import os
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from typing import Iterator
+import warnings
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRATCH_DATABASE = "library_migrations_test"
+
+def test_migrations_match_models():
+    # the suite runs against a database built by `alembic upgrade head`
+    with engine.connect() as conn, warnings.catch_warnings():
+        # alembic cannot compare the expression of computed columns and says so
+        warnings.simplefilter("ignore", UserWarning)
+        context = MigrationContext.configure(
+            conn,
+            opts={"include_object": lambda obj, name, type_, *_: not (type_ == "table" and name.startswith("borrowings_"))},
+        )
+        diff = compare_metadata(context, Base.metadata)
+    assert diff == []
+
+def _drop_scratch_database() -> None:
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f"DROP DATABASE IF EXISTS {SCRATCH_DATABASE} WITH (FORCE)"))
+
+@contextmanager
+def scratch_database() -> Iterator[Engine]:
+    _drop_scratch_database()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f"CREATE DATABASE {SCRATCH_DATABASE}"))
+    scratch = create_engine(engine.url.set(database=SCRATCH_DATABASE))
+    try:
+        yield scratch
+    finally:
+        scratch.dispose()
+        _drop_scratch_database()
+
+def migrate(scratch: Engine, revision: str) -> None:
+    config = Config()
+    config.set_main_option("script_location", os.path.join(APP_DIR, "migrations"))
+    with scratch.connect() as conn:
+        config.attributes["connection"] = conn
+        command.upgrade(config, revision)
+
+def test_upgrade_keeps_the_data_of_a_baseline_database():
+    with scratch_database() as scratch:
+        # 0001 is the schema the API used to create itself; `alembic stamp 0001` adopts such a database
+        migrate(scratch, "0001")
+        with scratch.begin() as conn:
+            conn.execute(text("""
+                INSERT INTO books (id, title, author) VALUES
+                    ('000001', 'Lalka', 'Boleslaw Prus'), ('000002', 'Potop', 'Henryk Sienkiewicz');
+                INSERT INTO cards (id) VALUES ('100001'), ('100002');
+                INSERT INTO borrowings (book_id, card_id, borrowed_at, returned_at) VALUES
+                    ('000001', '100001', '2024-01-10', '2024-01-20'),
+                    ('000002', '100001', '2024-03-05', '2024-04-02'),
+                    ('000001', '100002', '2025-06-01', NULL);
+            """))
+
+        migrate(scratch, "head")
+        with scratch.connect() as conn:
+            rows = conn.execute(text(
+                "SELECT id, book_id, card_id, returned_at IS NULL FROM borrowings ORDER BY id"
+            )).all()
+            assert rows == [(1, "000001", "100001", False), (2, "000002", "100001", False), (3, "000001", "100002", True)]
+            partitions = conn.execute(text(
+                "SELECT tableoid::regclass::text, count(*) FROM borrowings GROUP BY 1 ORDER BY 1"
+            )).all()
+            assert partitions == [("borrowings_2024_01", 1), ("borrowings_2024_03", 1), ("borrowings_2025_06", 1)]
+            # new borrowings continue the old ids
+            assert conn.execute(text("SELECT nextval('borrowings_id_seq')")).scalar() == 4
+            search = conn.execute(text(
+                "SELECT id FROM books WHERE search_vector @@ to_tsquery('simple', 'potop')"
+            )).scalars().all()
+            assert search == ["000002"]
+            # the open loan is on the book row, pointing at its history row
+            loans = conn.execute(text(
+                "SELECT id, active_card_id, active_borrowing_id, active_borrowed_at::date::text FROM books ORDER BY id"
+            )).all()
+            assert loans == [("000001", "100002", 3, "2025-06-01"), ("000002", None, None, None)]
+            versions = conn.execute(text("SELECT count(DISTINCT version) FROM books")).scalar()
+            assert versions == 2
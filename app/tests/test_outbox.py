@@ -0,0 +1,154 @@
+import asyncio
+from core.db.session import AsyncSessionLocal, engine
+from core.outbox import LogSink, OutboxDispatcher, OutboxSink, QueueSink, dispatch_batch, purge_dispatched
+from fastapi.testclient import TestClient
+import io
+from main import app
+from sqlalchemy import text
+
+client = TestClient(app)
+
+CARD_ID = "357192"
+
+class FailingSink(OutboxSink):
+    async def send(self, events):
+        raise ConnectionError("downstream is down")
+
+class SlowSink(QueueSink):
+    async def send(self, events):
+        await asyncio.sleep(0.2)
+        await super().send(events)
+
+def _drain(sink, batch_size=100):
+    """Dispatch until nothing is pending; returns the delivered events."""
+    async def run():
+        while True:
+            async with AsyncSessionLocal() as db:
+                if await dispatch_batch(db, sink, batch_size) == 0:
+                    break
+        events = []
+        while not sink.queue.empty():
+            events.append(sink.queue.get_nowait())
+        return events
+    return asyncio.run(run())
+
+def _loan(book_id):
+    assert client.post("/books", json={"id": book_id, "title": "Fiasko", "author": "Stanislaw Lem"}).status_code == 200
+    assert client.post(f"/books/{book_id}/borrow/{CARD_ID}").status_code == 200
+    assert client.post(f"/books/{book_id}/return/{CARD_ID}").status_code == 200
+
+def test_loans_are_delivered_once_from_the_outbox():
+    _drain(QueueSink())
+    _loan("170001")
+    assert client.post("/cards/" + CARD_ID + "/borrow", json={"bookIds": ["170001"]}).status_code == 200
+
+    events = [e for e in _drain(QueueSink()) if e["bookId"] == "170001"]
+    assert [e["type"] for e in events] == ["borrow", "return", "borrow"]
+    assert events[0]["cardId"] == CARD_ID
+    assert events[0]["borrowingId"] == events[1]["borrowingId"]
+    assert events[1]["returnedAt"] >= events[1]["borrowedAt"]
+    assert len({e["eventId"] for e in events}) == 3
+    # marked dispatched, nothing left to deliver
+    assert _drain(QueueSink()) == []
+
+def test_failed_delivery_is_retried_later():
+    _drain(QueueSink())
+    _loan("170002")
+
+    async def fail_once():
+        async with AsyncSessionLocal() as db:
+            return await dispatch_batch(db, FailingSink())
+
+    assert asyncio.run(fail_once()) == 0
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT attempts, last_error, available_at > NOW() FROM outbox WHERE payload->>'bookId' = '170002'"
+        )).all()
+    assert len(rows) == 2
+    assert all(attempts == 1 and "downstream is down" in error and later for attempts, error, later in rows)
+    # backed off: not claimed again right away
+    assert _drain(QueueSink()) == []
+
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE outbox SET available_at = NOW() WHERE payload->>'bookId' = '170002'"))
+    assert [e["type"] for e in _drain(QueueSink())] == ["borrow", "return"]
+
+def test_concurrent_dispatchers_skip_each_others_batches():
+    _drain(QueueSink())
+    for book_id in ("170003", "170004", "170005"):
+        _loan(book_id)
+    sinks = [SlowSink(), SlowSink()]
+
+    async def run():
+        async def dispatch(sink):
+            async with AsyncSessionLocal() as db:
+                return await dispatch_batch(db, sink, batch_size=3)
+        return await asyncio.gather(*(dispatch(sink) for sink in sinks))
+
+    assert asyncio.run(run()) == [3, 3]
+    delivered = [sinks[i].queue.get_nowait()["eventId"] for i in (0, 1) for _ in range(3)]
+    assert len(set(delivered)) == 6
+
+def test_sink_runs_without_locks_and_the_lease_hides_the_batch():
+    _drain(QueueSink())
+    _loan("170006")
+    sink = SlowSink()
+
+    def pending_locked():
+        # NOWAIT fails on rows another transaction holds
+        with engine.begin() as conn:
+            conn.execute(text("SET LOCAL lock_timeout = '50ms'"))
+            conn.execute(text("SELECT id FROM outbox WHERE payload->>'bookId' = '170006' FOR UPDATE NOWAIT")).all()
+
+    async def run():
+        async def dispatch():
+            async with AsyncSessionLocal() as db:
+                return await dispatch_batch(db, sink)
+        task = asyncio.ensure_future(dispatch())
+        await asyncio.sleep(0.1)
+        # mid-delivery: no row lock is held, and another dispatcher finds nothing to claim
+        await asyncio.to_thread(pending_locked)
+        async with AsyncSessionLocal() as db:
+            assert await dispatch_batch(db, QueueSink()) == 0
+        return await task
+
+    assert asyncio.run(run()) == 2
+
+def test_dispatcher_survives_unexpected_errors():
+    _drain(QueueSink())
+    _loan("170007")
+    calls = 0
+
+    def sessions():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise RuntimeError("bug")
+        return AsyncSessionLocal()
+
+    dispatcher = OutboxDispatcher(QueueSink(), poll_interval=0.05, sessions=sessions)
+
+    async def run():
+        dispatcher.start()
+        for _ in range(100):
+            if dispatcher.delivered:
+                break
+            await asyncio.sleep(0.05)
+        await dispatcher.stop()
+
+    asyncio.run(run())
+    assert dispatcher.delivered == 2
+
+def test_log_sink_writes_every_event():
+    stream = io.StringIO()
+    asyncio.run(LogSink(stream).send([{"eventId": 1, "type": "borrow"}, {"eventId": 2, "type": "return"}]))
+    assert stream.getvalue().splitlines() == [
+        'outbox event {"eventId": 1, "type": "borrow"}',
+        'outbox event {"eventId": 2, "type": "return"}',
+    ]
+
+def test_purge_dispatched_events():
+    _drain(QueueSink())
+    with engine.begin() as conn:
+        assert purge_dispatched(conn, retain_hours=0) > 0
+        assert conn.execute(text("SELECT count(*) FROM outbox WHERE dispatched_at IS NOT NULL")).scalar() == 0
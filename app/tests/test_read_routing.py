@@ -0,0 +1,61 @@
+import asyncio
+from core.config import ASYNC_DATABASE_URL
+from core.db.routing import ReplicaRouter
+from core.db.session import async_engine, create_api_engine
+from sqlalchemy import text
+import time
+
+def _router(*replica_urls):
+    replicas = [create_api_engine(url, f"test-replica{i}") for i, url in enumerate(replica_urls)]
+    return ReplicaRouter(async_engine, replicas, max_lag=5, retry_after=30)
+
+def test_reads_go_to_healthy_replica():
+    router = _router(ASYNC_DATABASE_URL)
+
+    async def run():
+        async with router.read_session() as db:
+            assert db.info.get("replica") is True
+            assert (await db.execute(text("SELECT 1"))).scalar_one() == 1
+        async with router.read_session(prefer_primary=True) as db:
+            assert not db.info.get("replica")
+
+    asyncio.run(run())
+    assert router.lag(router.replicas[0]) == 0
+
+def test_unreachable_replica_falls_back_to_primary():
+    router = _router("postgresql+asyncpg://postgres@127.0.0.1:1/library")
+
+    async def run():
+        async with router.read_session() as db:
+            assert not db.info.get("replica")
+            assert (await db.execute(text("SELECT 1"))).scalar_one() == 1
+
+    asyncio.run(run())
+    assert router.is_down(router.replicas[0])
+
+def test_lagging_replica_is_skipped():
+    router = _router(ASYNC_DATABASE_URL)
+    router.max_lag = -1
+
+    async def run():
+        return await router.pick()
+
+    assert asyncio.run(run()) is async_engine
+
+def test_unresponsive_replica_times_out():
+    async def run():
+        # accepts connections but never answers the startup message
+        server = await asyncio.start_server(lambda reader, writer: None, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        replica = create_api_engine(f"postgresql+asyncpg://postgres@127.0.0.1:{port}/library", "test-hung", connect_timeout=0.2)
+        router = ReplicaRouter(async_engine, [replica], max_lag=5, retry_after=30, probe_timeout=0.3)
+        started = time.monotonic()
+        try:
+            assert await router.pick() is async_engine
+        finally:
+            server.close()
+        return router, time.monotonic() - started
+
+    router, elapsed = asyncio.run(run())
+    assert elapsed < 2
+    assert router.is_down(router.replicas[0])
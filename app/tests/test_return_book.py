@@ -1,7 +1,8 @@
 from core.db.models.books import Books
-from core.db.session import SessionLocal
+from core.db.session import SessionLocal, engine
 from fastapi.testclient import TestClient
 from main import app
+from sqlalchemy import text
 
 client = TestClient(app)
 
@@ -32,4 +33,35 @@ def test_return_book():
     return_book2 = client.post(f"/books/000007/return/712538", json=payload)
     assert return_book2.status_code == 200
     data = return_book2.json()
-    assert data["status"] == "Success"
\ No newline at end of file
+    assert data["status"] == "Success"
+
+
+def test_return_book_errors():
+    payload = {"author": "Henryk Sienkiewicz", "id": "000008", "title": "Potop"}
+    assert client.post("/books", json=payload).status_code == 200
+    assert client.post("/books/000008/borrow/712538").status_code == 200
+
+    other_card = client.post("/books/000008/return/245781")
+    assert other_card.status_code == 409
+    assert other_card.json()["error"] == "Book is borrowed by a different card"
+
+    no_card = client.post("/books/000008/return/000999")
+    assert no_card.status_code == 404
+    assert no_card.json()["error"] == "Library card not found"
+
+    no_book = client.post("/books/000999/return/712538")
+    assert no_book.status_code == 404
+    assert no_book.json()["error"] == "Book not found"
+
+def test_return_book_without_open_borrowing():
+    payload = {"author": "Henryk Sienkiewicz", "id": "000009", "title": "Pan Wolodyjowski"}
+    assert client.post("/books", json=payload).status_code == 200
+    assert client.post("/books/000009/borrow/712538").status_code == 200
+    # the book row points at a borrowing that does not exist
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE books SET active_borrowing_id = -1 WHERE id = '000009'"))
+
+    response = client.post("/books/000009/return/712538")
+    assert response.status_code == 409
+    assert response.json()["error"] == "Borrowing record of book 000009 is not open"
+    assert client.get("/books/000009").json()["borrowed"] is True
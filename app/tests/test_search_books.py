@@ -0,0 +1,38 @@
+from fastapi.testclient import TestClient
+from main import app
+
+client = TestClient(app)
+
+def test_search_books():
+    books = [
+        ("220001", "Krzyzacy", "Zygfryd Qwertowski"),
+        ("220002", "Qwertowski i morze", "Jan Kowalski"),
+        ("220003", "Qwertowskiego listy", "Anna Nowak"),
+        ("220004", "Usunieta Qwertowska", "Ktos"),
+    ]
+    for book_id, title, author in books:
+        payload = {"id": book_id, "title": title, "author": author}
+        assert client.post("/books", json=payload).status_code == 200
+    assert client.delete("/books/220004").status_code == 200
+    assert client.post("/books/220002/borrow/468230").status_code == 200
+
+    resp = client.get("/books/search?q=QWERTOW&size=2")
+    assert resp.status_code == 200
+    data = resp.json()
+    assert len(data["items"]) == 2
+    assert data["next_cursor"] is not None
+
+    rest = client.get(f"/books/search?q=qwertow&size=2&cursor={data['next_cursor']}").json()
+    ids = {item["id"] for item in data["items"] + rest["items"]}
+    assert ids == {"220001", "220002", "220003"}
+    assert rest["next_cursor"] is None
+
+    borrowed = next(item for item in data["items"] + rest["items"] if item["id"] == "220002")
+    assert borrowed["borrowed"] is True
+
+    both = client.get("/books/search?q=qwertowski kowal").json()
+    assert [item["id"] for item in both["items"]] == ["220002"]
+
+def test_search_books_invalid_query():
+    assert client.get("/books/search?q=%20%21%21").status_code == 422
+    assert client.get("/books/search?q=abc&cursor=not-a-cursor").status_code == 422
@@ -0,0 +1,19 @@
+from core.config import SERVER_BACKLOG, SERVER_KEEPALIVE, WEB_CONCURRENCY
+from core.db.session import api_engines, async_engine, engine, reset_pools_after_fork
+from serve import Server, post_fork
+
+def test_server_preloads_app_and_resets_pools_in_workers():
+    cfg = Server().cfg
+    assert cfg.preload_app is True
+    assert cfg.workers == WEB_CONCURRENCY
+    assert cfg.backlog == SERVER_BACKLOG
+    assert cfg.keepalive == SERVER_KEEPALIVE
+    assert cfg.worker_class_str == "uvicorn_worker.UvicornWorker"
+    assert cfg.post_fork is post_fork
+
+def test_reset_pools_after_fork_replaces_every_pool():
+    assert async_engine in api_engines
+    pools = [engine.pool] + [api_engine.sync_engine.pool for api_engine in api_engines]
+    reset_pools_after_fork()
+    new_pools = [engine.pool] + [api_engine.sync_engine.pool for api_engine in api_engines]
+    assert all(new is not old for new, old in zip(new_pools, pools))